@@ -6,16 +6,20 @@ Integrates with the WebSocket system to broadcast agent status changes.
 import asyncio
 import logging
 import json
+import time
+import uuid
 from typing import Optional, Dict, Any
 from datetime import datetime
 
 from backend.agui.protocol import agui_handler, MessageType
+from backend.client_outbox import STATUS, conflation_key
 
 logger = logging.getLogger(__name__)
 
 class AgentStatusBroadcaster:
     """
-    Broadcasts agent status updates to connected WebSocket clients.
+    Broadcasts agent status updates to the WebSocket clients subscribed to
+    each update's session.
     Provides real-time progress tracking and agent state management.
     """
     
@@ -80,12 +84,14 @@ class AgentStatusBroadcaster:
             metadata: Additional status metadata
         """
         
+        now = datetime.now().isoformat()  # One timestamp for state and message
+
         # Update internal state
         self.agent_states[agent_name] = {
             "name": agent_name,
             "status": status,
             "task": task,
-            "last_update": datetime.now().isoformat(),
+            "last_update": now,
             "session_id": session_id,
             "metadata": metadata or {}
         }
@@ -93,7 +99,7 @@ class AgentStatusBroadcaster:
         # Create status message
         status_message = {
             "type": "agent_status",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now,
             "data": {
                 "agent_name": agent_name,
                 "status": status,
@@ -105,9 +111,12 @@ class AgentStatusBroadcaster:
         
         logger.info(f"Broadcasting status update for {agent_name}: {status}")
         
-        # Broadcast to all connected clients
+        # Send to the clients subscribed to this session
         if self.connection_manager:
-            await self.connection_manager.broadcast_to_all(json.dumps(status_message))
+            await self.connection_manager.send_to_session(
+                session_id, json.dumps(status_message), lane=STATUS,
+                key=conflation_key(session_id, agent_name, "status")
+            )
         else:
             logger.warning("No connection manager available for broadcasting")
     
@@ -128,13 +137,15 @@ class AgentStatusBroadcaster:
             metadata: Additional completion metadata
         """
         
+        now = datetime.now().isoformat()
+
         # Update internal state
         self.agent_states[agent_name] = {
             "name": agent_name,
             "status": "completed",
             "task": f"Completed: {result[:100]}...",  # Truncate long results
             "result": result,
-            "last_update": datetime.now().isoformat(),
+            "last_update": now,
             "session_id": session_id,
             "metadata": metadata or {}
         }
@@ -142,7 +153,7 @@ class AgentStatusBroadcaster:
         # Create completion message
         completion_message = {
             "type": "agent_completed",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now,
             "data": {
                 "agent_name": agent_name,
                 "result": result,
@@ -154,9 +165,9 @@ class AgentStatusBroadcaster:
         
         logger.info(f"Broadcasting completion for {agent_name}: Task completed")
         
-        # Broadcast to all connected clients
+        # Send to the clients subscribed to this session
         if self.connection_manager:
-            await self.connection_manager.broadcast_to_all(json.dumps(completion_message))
+            await self.connection_manager.send_to_session(session_id, json.dumps(completion_message), lane=STATUS)
         else:
             logger.warning("No connection manager available for completion broadcasting")
     
@@ -183,6 +194,8 @@ class AgentStatusBroadcaster:
         
         progress_percentage = (current / total * 100) if total > 0 else 0
         
+        now = datetime.now().isoformat()
+
         # Update agent state with progress
         if agent_name not in self.agent_states:
             self.agent_states[agent_name] = {}
@@ -193,13 +206,13 @@ class AgentStatusBroadcaster:
             "progress_total": total,
             "progress_percentage": progress_percentage,
             "estimated_time_remaining": estimated_time_remaining,
-            "last_progress_update": datetime.now().isoformat()
+            "last_progress_update": now
         })
         
         # Create progress message
         progress_message = {
             "type": "agent_progress",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now,
             "data": {
                 "agent_name": agent_name,
                 "stage": stage,
@@ -213,9 +226,12 @@ class AgentStatusBroadcaster:
         
         logger.info(f"Broadcasting progress for {agent_name}: {stage} ({current}/{total})")
         
-        # Broadcast to all connected clients
+        # Send to the clients subscribed to this session
         if self.connection_manager:
-            await self.connection_manager.broadcast_to_all(json.dumps(progress_message))
+            await self.connection_manager.send_to_session(
+                session_id, json.dumps(progress_message), lane=STATUS,
+                key=conflation_key(session_id, agent_name, "progress")
+            )
         else:
             logger.warning("No connection manager available for progress broadcasting")
     
@@ -236,20 +252,22 @@ class AgentStatusBroadcaster:
             error_details: Additional error details
         """
         
+        now = datetime.now().isoformat()
+
         # Update agent state with error
         self.agent_states[agent_name] = {
             "name": agent_name,
             "status": "error",
             "error_message": error_message,
             "error_details": error_details or {},
-            "last_update": datetime.now().isoformat(),
+            "last_update": now,
             "session_id": session_id
         }
         
         # Create error message
         error_message_data = {
             "type": "agent_error",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now,
             "data": {
                 "agent_name": agent_name,
                 "error_message": error_message,
@@ -260,9 +278,9 @@ class AgentStatusBroadcaster:
         
         logger.error(f"Broadcasting error for {agent_name}: {error_message}")
         
-        # Broadcast to all connected clients
+        # Send to the clients subscribed to this session
         if self.connection_manager:
-            await self.connection_manager.broadcast_to_all(json.dumps(error_message_data))
+            await self.connection_manager.send_to_session(session_id, json.dumps(error_message_data), lane=STATUS)
         else:
             logger.warning("No connection manager available for error broadcasting")
     
@@ -290,11 +308,111 @@ class AgentStatusBroadcaster:
             agent_name=agent_name,
             session_id=session_id
         )
-        await self.connection_manager.broadcast_to_all(
-            agui_handler.serialize_message(message)
+        await self.connection_manager.send_to_session(
+            session_id, agui_handler.serialize_message(message)
         )
         logger.info(f"Broadcasted agent response from {agent_name}")
 
+    async def broadcast_agent_stream_delta(
+        self,
+        agent_name: str,
+        delta: str,
+        stream_id: str,
+        sequence: int,
+        session_id: str = "global_session",
+        done: bool = False,
+    ):
+        """
+        Broadcast a partial agent response while the LLM is still generating.
+
+        Frames are regular agent_response messages flagged as partial in their
+        metadata; clients append deltas sharing a stream_id in sequence order.
+        They are sent at "stream" priority so a long response does not use up
+        the per-client message limit and push the agent's final status into
+        the reconnect queue.
+        """
+        if not self.connection_manager:
+            return
+
+        message = agui_handler.create_agent_message(
+            content=delta,
+            agent_name=agent_name,
+            session_id=session_id,
+            metadata={
+                "partial": not done,
+                "stream_id": stream_id,
+                "sequence": sequence,
+                "done": done,
+            }
+        )
+        await self.connection_manager.send_to_session(
+            session_id, agui_handler.serialize_message(message), priority="stream"
+        )
+
+
+class AgentStreamForwarder:
+    """
+    Forwards LLM stream deltas to clients through an AgentStatusBroadcaster.
+    Deltas are coalesced so clients receive a frame every min_chars characters
+    or min_interval seconds rather than one frame per token.
+    """
+
+    def __init__(
+        self,
+        broadcaster: Optional[AgentStatusBroadcaster],
+        agent_name: str,
+        session_id: str = "global_session",
+        min_chars: int = 512,
+        min_interval: float = 0.5,
+    ):
+        self.broadcaster = broadcaster
+        self.agent_name = agent_name
+        self.session_id = session_id
+        self.min_chars = min_chars
+        self.min_interval = min_interval
+        self.stream_id = str(uuid.uuid4())
+        self.sequence = 0
+        self._buffer: list = []
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+
+    async def on_delta(self, delta: str):
+        """Callback for LLMService.generate_response(on_delta=...)."""
+        self._buffer.append(delta)
+        self._buffered_chars += len(delta)
+        if (self.sequence == 0
+                or self._buffered_chars >= self.min_chars
+                or time.monotonic() - self._last_flush >= self.min_interval):
+            await self._flush()
+
+    async def close(self):
+        """Flush any remaining text and mark the stream as finished."""
+        if self.sequence == 0 and not self._buffer:
+            # Nothing reached clients, so there is no stream to finish
+            return
+        await self._flush(done=True)
+
+    async def _flush(self, done: bool = False):
+        if not self.broadcaster or (not self._buffer and not done):
+            return
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_chars = 0
+        self._last_flush = time.monotonic()
+        try:
+            await self.broadcaster.broadcast_agent_stream_delta(
+                agent_name=self.agent_name,
+                delta=text,
+                stream_id=self.stream_id,
+                sequence=self.sequence,
+                session_id=self.session_id,
+                done=done,
+            )
+            self.sequence += 1
+        except Exception as e:
+            # Streaming is best effort, the final response is still delivered
+            logger.warning(f"Failed to forward stream delta for {self.agent_name}: {e}")
+
 # Convenience functions for easier integration
 async def broadcast_agent_thinking(broadcaster, agent_name: str, task: str, session_id: str = "global_session"):
     """Convenience function to broadcast that an agent is thinking."""
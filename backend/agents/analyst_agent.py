@@ -6,13 +6,9 @@ import asyncio
 import logging
 import os
 from backend.agents.base_agent import BaseAgent
-from backend.runtime_env import get_controlflow, get_prefect, IS_REPLIT
+from backend.runtime_env import get_prefect, lazy_task, IS_REPLIT
 from backend.agent_status_broadcaster import AgentStatusBroadcaster
 
-# Get appropriate modules based on environment
-cf = get_controlflow()
-prefect = get_prefect()
-
 logger = logging.getLogger(__name__)
 
 # Safety counter to prevent infinite loops
@@ -42,7 +38,7 @@ def should_be_interactive() -> bool:
     # Interactive if HITL is enabled and not in auto mode
     return hitl_enabled and auto_action == "none" and not IS_REPLIT
 
-@cf.task(interactive=should_be_interactive())
+@lazy_task(interactive=should_be_interactive())
 async def run_analyst_task(project_brief: str, status_broadcaster: AgentStatusBroadcaster, session_id: str, artifact_preferences: dict, role_enforcer=None, agent_name="Analyst") -> str:
     """
     Analyst Agent task with proper logging and 1-LLM-call safety limit.
@@ -81,7 +77,7 @@ async def run_analyst_task(project_brief: str, status_broadcaster: AgentStatusBr
         current_logger.info(f"🔍 Starting Analyst Agent (Replit mode)")
     else:
         try:
-            current_logger = prefect.get_run_logger()
+            current_logger = get_prefect().get_run_logger()
         except:
             current_logger = logger
         current_logger.info(f"🔍 Starting Analyst Agent (Development mode)")
@@ -124,7 +120,7 @@ The analyst agent acknowledges the request and is ready to proceed to the archit
 
     # Create and execute the analyst agent
     current_logger.info("🤖 Creating BaseAgent with system prompt...")
-    analyst_agent = BaseAgent(system_prompt=ANALYST_SYSTEM_PROMPT)
+    analyst_agent = BaseAgent(system_prompt=ANALYST_SYSTEM_PROMPT, status_broadcaster=status_broadcaster)
     
     try:
         if not artifact_preferences.get("reqs-doc", True):
@@ -139,7 +135,8 @@ The analyst agent acknowledges the request and is ready to proceed to the archit
         current_logger.info("📡 Calling LLM for analysis...")
         requirements_document = await analyst_agent.execute(
             user_prompt=project_brief, 
-            agent_name="Analyst"
+            agent_name="Analyst",
+            session_id=session_id
         )
         
         # Log the output (truncated for readability)
@@ -6,12 +6,9 @@ import asyncio
 import logging
 import os
 
-from backend.runtime_env import get_controlflow, get_prefect, IS_REPLIT
+from backend.runtime_env import get_prefect, lazy_task, IS_REPLIT
 from backend.agent_status_broadcaster import AgentStatusBroadcaster
 
-cf = get_controlflow()
-prefect = get_prefect()
-
 logger = logging.getLogger(__name__)
 
 # Safety counter to prevent infinite loops
@@ -38,7 +35,7 @@ def should_be_interactive() -> bool:
     auto_action = os.getenv("AUTO_ACTION", "none").lower()
     return hitl_enabled and auto_action == "none" and not IS_REPLIT
 
-@cf.task(interactive=should_be_interactive())
+@lazy_task(interactive=should_be_interactive())
 async def run_architect_task(requirements_document: str, status_broadcaster: AgentStatusBroadcaster, session_id: str, artifact_preferences: dict, role_enforcer=None, agent_name="Architect") -> str:
     """
     Architect Agent task with proper logging, safety limits, and enhanced fallback responses.
@@ -66,7 +63,7 @@ async def run_architect_task(requirements_document: str, status_broadcaster: Age
         current_logger.info(f"🏗️ Starting Architect Agent (Replit mode)")
     else:
         try:
-            current_logger = prefect.get_run_logger()
+            current_logger = get_prefect().get_run_logger()
         except:
             current_logger = logger
         current_logger.info(f"🏗️ Starting Architect Agent (Development mode)")
@@ -137,7 +134,7 @@ Based on requirements: "{requirements_document[:150]}..."
             return "Architecture diagram generation skipped by user."
 
         from backend.agents.base_agent import BaseAgent
-        architect_agent = BaseAgent(ARCHITECT_SYSTEM_PROMPT)
+        architect_agent = BaseAgent(ARCHITECT_SYSTEM_PROMPT, status_broadcaster=status_broadcaster)
 
         await status_broadcaster.broadcast_agent_response(
             agent_name="Architect",
@@ -147,7 +144,8 @@ Based on requirements: "{requirements_document[:150]}..."
         current_logger.info("📡 Calling LLM for architecture design...")
         architecture_doc = await architect_agent.execute(
             user_prompt=f"Create technical architecture for:\n{requirements_document}", 
-            context=""
+            agent_name="Architect",
+            session_id=session_id
         )
 
         # Log the output (truncated for readability)
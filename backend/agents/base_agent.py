@@ -5,13 +5,16 @@ Adaptive base agent with TEST_MODE and ROLE_TEST_MODE brake functionality.
 import asyncio
 import logging
 from typing import Any, Dict, Optional
-import google.generativeai as genai
 import os
 
-from backend.runtime_env import IS_REPLIT, get_environment_info
+from backend.runtime_env import IS_REPLIT, get_environment_info, LazyModule
+from backend.services.bounded_executor import get_provider_executor
 
 logger = logging.getLogger(__name__)
 
+# Only imported when a LightweightAgent actually configures Gemini
+genai = LazyModule("google.generativeai")
+
 # Import dynamic config service
 from backend.dynamic_config import get_dynamic_config
 
@@ -73,8 +76,8 @@ Please provide a detailed response following the system instructions."""
 
             logger.info(f"{self.agent_name} processing request...")
             
-            # Generate response using Gemini
-            response = await asyncio.to_thread(
+            # Generate response using Gemini on the dedicated Google executor
+            response = await get_provider_executor('google').run(
                 self.model.generate_content, full_prompt
             )
             
@@ -186,7 +189,8 @@ To enable role confirmation with LLM:
                 
                 llm_response = await llm_service.generate_response(
                     prompt=role_prompt, 
-                    agent_name=agent_name
+                    agent_name=agent_name,
+                    session_id=session_id
                 )
                 
                 logger.info(f"✅ {agent_name} received LLM role confirmation")
@@ -244,9 +248,23 @@ To enable full agent functionality:
             
             try:
                 from backend.services.llm_service import get_llm_service
+                from backend.agent_status_broadcaster import AgentStreamForwarder
                 full_prompt = f"{self.system_prompt}\n\nUser query: {user_prompt}"
                 llm_service = get_llm_service()
-                response = await llm_service.generate_response(prompt=full_prompt, agent_name=agent_name)
+                forwarder = None
+                if self.status_broadcaster:
+                    forwarder = AgentStreamForwarder(self.status_broadcaster, agent_name, session_id)
+                try:
+                    response = await llm_service.generate_response(
+                        prompt=full_prompt,
+                        agent_name=agent_name,
+                        on_delta=forwarder.on_delta if forwarder else None,
+                        session_id=session_id
+                    )
+                finally:
+                    # Close even on failure, or clients that got deltas stay "streaming"
+                    if forwarder:
+                        await forwarder.close()
             except ImportError:
                 # Fallback to lightweight agent
                 logger.info(f"LLM service not available, using lightweight agent for {agent_name}")
@@ -6,11 +6,9 @@ import asyncio
 import logging
 import os
 from backend.agents.base_agent import BaseAgent
-from backend.runtime_env import get_controlflow, get_prefect, IS_REPLIT
+from backend.runtime_env import get_prefect, lazy_task, IS_REPLIT
 from backend.agent_status_broadcaster import AgentStatusBroadcaster
 
-cf = get_controlflow()
-prefect = get_prefect()
 logger = logging.getLogger(__name__)
 
 _deployer_call_count = 0
@@ -34,7 +32,7 @@ def should_be_interactive() -> bool:
     auto_action = os.getenv("AUTO_ACTION", "none").lower()
     return hitl_enabled and auto_action == "none" and not IS_REPLIT
 
-@cf.task(interactive=should_be_interactive())
+@lazy_task(interactive=should_be_interactive())
 async def run_deployer_task(testing_doc: str, status_broadcaster: AgentStatusBroadcaster, session_id: str, artifact_preferences: dict, role_enforcer=None, agent_name="Deployer") -> str:
     """Deployer Agent task with proper logging and 1-LLM-call safety limit."""
     # Import dynamic config to check test modes
@@ -59,7 +57,7 @@ async def run_deployer_task(testing_doc: str, status_broadcaster: AgentStatusBro
         current_logger.info(f"🚀 Starting Deployer Agent (Replit mode)")
     else:
         try:
-            current_logger = prefect.get_run_logger()
+            current_logger = get_prefect().get_run_logger()
         except:
             current_logger = logger
         current_logger.info(f"🚀 Starting Deployer Agent (Development mode)")
@@ -86,7 +84,7 @@ async def run_deployer_task(testing_doc: str, status_broadcaster: AgentStatusBro
     current_logger.info(f"🚀 Making LLM call #{_deployer_call_count}")
 
     current_logger.info("🤖 Creating BaseAgent with system prompt...")
-    deployer_agent = BaseAgent(system_prompt=DEPLOYER_SYSTEM_PROMPT)
+    deployer_agent = BaseAgent(system_prompt=DEPLOYER_SYSTEM_PROMPT, status_broadcaster=status_broadcaster)
     
     try:
         if not artifact_preferences.get("deploy-scripts", True):
@@ -101,7 +99,8 @@ async def run_deployer_task(testing_doc: str, status_broadcaster: AgentStatusBro
         current_logger.info("📡 Calling LLM for deployment plan...")
         deployment_doc = await deployer_agent.execute(
             user_prompt=f"Create deployment plan for:\n{testing_doc}", 
-            agent_name="Deployer"
+            agent_name="Deployer",
+            session_id=session_id
         )
         
         output_preview = deployment_doc[:200] + "..." if len(deployment_doc) > 200 else deployment_doc
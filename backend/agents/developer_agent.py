@@ -6,11 +6,9 @@ import asyncio
 import logging
 import os
 from backend.agents.base_agent import BaseAgent
-from backend.runtime_env import get_controlflow, get_prefect, IS_REPLIT
+from backend.runtime_env import get_prefect, lazy_task, IS_REPLIT
 from backend.agent_status_broadcaster import AgentStatusBroadcaster
 
-cf = get_controlflow()
-prefect = get_prefect()
 logger = logging.getLogger(__name__)
 
 _developer_call_count = 0
@@ -34,7 +32,7 @@ def should_be_interactive() -> bool:
     auto_action = os.getenv("AUTO_ACTION", "none").lower()
     return hitl_enabled and auto_action == "none" and not IS_REPLIT
 
-@cf.task(interactive=should_be_interactive())
+@lazy_task(interactive=should_be_interactive())
 async def run_developer_task(architecture_doc: str, status_broadcaster: AgentStatusBroadcaster, session_id: str, artifact_preferences: dict, role_enforcer=None, agent_name="Developer") -> str:
     """Developer Agent task with proper logging and 1-LLM-call safety limit."""
     
@@ -60,7 +58,7 @@ async def run_developer_task(architecture_doc: str, status_broadcaster: AgentSta
         current_logger.info(f"💻 Starting Developer Agent (Replit mode)")
     else:
         try:
-            current_logger = prefect.get_run_logger()
+            current_logger = get_prefect().get_run_logger()
         except:
             current_logger = logger
         current_logger.info(f"💻 Starting Developer Agent (Development mode)")
@@ -87,7 +85,7 @@ async def run_developer_task(architecture_doc: str, status_broadcaster: AgentSta
     current_logger.info(f"🚀 Making LLM call #{_developer_call_count}")
 
     current_logger.info("🤖 Creating BaseAgent with system prompt...")
-    developer_agent = BaseAgent(system_prompt=DEVELOPER_SYSTEM_PROMPT)
+    developer_agent = BaseAgent(system_prompt=DEVELOPER_SYSTEM_PROMPT, status_broadcaster=status_broadcaster)
     
     try:
         if not artifact_preferences.get("source-code", True):
@@ -102,7 +100,8 @@ async def run_developer_task(architecture_doc: str, status_broadcaster: AgentSta
         current_logger.info("📡 Calling LLM for implementation plan...")
         implementation_doc = await developer_agent.execute(
             user_prompt=f"Create implementation plan for:\n{architecture_doc}", 
-            agent_name="Developer"
+            agent_name="Developer",
+            session_id=session_id
         )
         
         output_preview = implementation_doc[:200] + "..." if len(implementation_doc) > 200 else implementation_doc
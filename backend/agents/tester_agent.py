@@ -6,11 +6,9 @@ import asyncio
 import logging
 import os
 from backend.agents.base_agent import BaseAgent
-from backend.runtime_env import get_controlflow, get_prefect, IS_REPLIT
+from backend.runtime_env import get_prefect, lazy_task, IS_REPLIT
 from backend.agent_status_broadcaster import AgentStatusBroadcaster
 
-cf = get_controlflow()
-prefect = get_prefect()
 logger = logging.getLogger(__name__)
 
 _tester_call_count = 0
@@ -34,7 +32,7 @@ def should_be_interactive() -> bool:
     auto_action = os.getenv("AUTO_ACTION", "none").lower()
     return hitl_enabled and auto_action == "none" and not IS_REPLIT
 
-@cf.task(interactive=should_be_interactive())
+@lazy_task(interactive=should_be_interactive())
 async def run_tester_task(implementation_doc: str, status_broadcaster: AgentStatusBroadcaster, session_id: str, artifact_preferences: dict, role_enforcer=None, agent_name="Tester") -> str:
     """Tester Agent task with proper logging and 1-LLM-call safety limit."""
     
@@ -60,7 +58,7 @@ async def run_tester_task(implementation_doc: str, status_broadcaster: AgentStat
         current_logger.info(f"🧪 Starting Tester Agent (Replit mode)")
     else:
         try:
-            current_logger = prefect.get_run_logger()
+            current_logger = get_prefect().get_run_logger()
         except:
             current_logger = logger
         current_logger.info(f"🧪 Starting Tester Agent (Development mode)")
@@ -87,7 +85,7 @@ async def run_tester_task(implementation_doc: str, status_broadcaster: AgentStat
     current_logger.info(f"🚀 Making LLM call #{_tester_call_count}")
 
     current_logger.info("🤖 Creating BaseAgent with system prompt...")
-    tester_agent = BaseAgent(system_prompt=TESTER_SYSTEM_PROMPT)
+    tester_agent = BaseAgent(system_prompt=TESTER_SYSTEM_PROMPT, status_broadcaster=status_broadcaster)
     
     try:
         if not artifact_preferences.get("test-plan", True):
@@ -102,7 +100,8 @@ async def run_tester_task(implementation_doc: str, status_broadcaster: AgentStat
         current_logger.info("📡 Calling LLM for testing strategy...")
         testing_doc = await tester_agent.execute(
             user_prompt=f"Create testing strategy for:\n{implementation_doc}", 
-            agent_name="Tester"
+            agent_name="Tester",
+            session_id=session_id
         )
         
         output_preview = testing_doc[:200] + "..." if len(testing_doc) > 200 else testing_doc
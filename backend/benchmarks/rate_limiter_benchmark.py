@@ -0,0 +1,91 @@
+"""
+Microbenchmark for RateLimiter.acquire at high request rates.
+
+Compares the sliding-window counters against the previous implementation,
+which scanned every request in the last hour four times per call. The
+history is pre-filled with --history requests spread over the last hour,
+then acquire is timed with limits high enough that every call is admitted.
+
+Run with:
+    python -m backend.benchmarks.rate_limiter_benchmark --history 1000 --calls 20000
+"""
+
+import argparse
+import asyncio
+import time
+from collections import deque
+
+from backend.rate_limit_store import MemoryRateLimitStore
+from backend.rate_limiter import RateLimiter, RateLimitConfig, RequestRecord
+
+UNLIMITED = RateLimitConfig(
+    requests_per_minute=10 ** 9,
+    requests_per_hour=10 ** 9,
+    tokens_per_minute=10 ** 12,
+    tokens_per_hour=10 ** 12,
+    burst_limit=10 ** 9
+)
+
+
+class HistoryScanLimiter:
+    """The counting done by RateLimiter.acquire before sliding windows, for comparison"""
+
+    def __init__(self, history_size: int):
+        self.history = deque(maxlen=history_size)
+
+    def acquire(self, now: float, tokens: int) -> bool:
+        history = self.history
+        while history and now - history[0].timestamp > 3600:
+            history.popleft()
+        recent_requests = sum(1 for req in history if now - req.timestamp <= 60)
+        hourly_requests = len(history)
+        recent_tokens = sum(req.tokens for req in history if now - req.timestamp <= 60)
+        hourly_tokens = sum(req.tokens for req in history)
+        history.append(RequestRecord(timestamp=now, tokens=tokens))
+        return recent_requests + hourly_requests + recent_tokens + hourly_tokens >= 0
+
+
+def bench_sliding_window(history: int, calls: int) -> float:
+    store = MemoryRateLimitStore()
+    limiter = RateLimiter(store)
+    limiter.add_provider_config("bench", UNLIMITED)
+    now = time.time()
+    window = store.window("bench")
+    for i in range(history):
+        window.add(now - 3600 + i * 3600 / max(history, 1), 1000)
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(calls):
+            await limiter.acquire("bench", 1000)
+        return time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+def bench_history_scan(history: int, calls: int) -> float:
+    limiter = HistoryScanLimiter(max(history, 1000))
+    now = time.time()
+    for i in range(history):
+        limiter.history.append(RequestRecord(timestamp=now - 3600 + i * 3600 / max(history, 1), tokens=1000))
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        limiter.acquire(time.time(), 1000)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RateLimiter.acquire")
+    parser.add_argument("--history", type=int, default=1000, help="requests already recorded in the last hour")
+    parser.add_argument("--calls", type=int, default=20000, help="acquire calls to time")
+    args = parser.parse_args()
+
+    print(f"acquire() with {args.history} requests in the last hour, {args.calls} calls")
+    for name, bench in (("sliding window", bench_sliding_window), ("history scan", bench_history_scan)):
+        elapsed = bench(args.history, args.calls)
+        print(f"  {name:<15} {elapsed / args.calls * 1e6:8.2f} us/call  {args.calls / elapsed:12,.0f} calls/s")
+
+
+if __name__ == "__main__":
+    main()
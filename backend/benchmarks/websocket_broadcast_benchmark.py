@@ -0,0 +1,90 @@
+"""
+Benchmark for broadcasting one message to many WebSocket clients.
+
+Compares serializing the message once and sharing the OutboundFrame across
+every client's outbox against serializing it again for each recipient. The
+sockets are fakes whose send_text returns at once, so the numbers are the
+server-side cost of fan-out: serialization, enqueueing and the writer tasks
+draining every outbox.
+
+Run with:
+    python -m backend.benchmarks.websocket_broadcast_benchmark --clients 1000 10000 --messages 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from backend.client_outbox import ClientOutbox, OutboundFrame, STATUS
+
+
+class NullWebSocket:
+    """Accepts every frame immediately"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_text(self, text: str):
+        self.sent += 1
+
+
+def status_message(sequence: int) -> dict:
+    return {
+        "type": "agent_status",
+        "timestamp": datetime.now().isoformat(),
+        "data": {
+            "agent_name": "Analyst",
+            "status": "working",
+            "task": f"Analyzing requirements, step {sequence}",
+            "session_id": "global_session",
+            "metadata": {"sequence": sequence, "details": "x" * 200}
+        }
+    }
+
+
+async def run_broadcasts(clients: int, messages: int, shared: bool) -> tuple:
+    sockets = [NullWebSocket() for _ in range(clients)]
+    outboxes = [ClientOutbox(f"client_{i}", ws, lane_size=messages) for i, ws in enumerate(sockets)]
+    for outbox in outboxes:
+        outbox.start()
+
+    enqueue_time = 0.0
+    start = time.perf_counter()
+    for sequence in range(messages):
+        message = status_message(sequence)
+        enqueue_start = time.perf_counter()
+        if shared:
+            frame = OutboundFrame.of(message)
+            for outbox in outboxes:
+                outbox.enqueue(frame, STATUS)
+        else:
+            for outbox in outboxes:
+                outbox.enqueue(json.dumps(message), STATUS)
+        enqueue_time += time.perf_counter() - enqueue_start
+    await asyncio.gather(*(outbox.drain() for outbox in outboxes))
+    total_time = time.perf_counter() - start
+
+    for outbox in outboxes:
+        await outbox.close()
+    assert all(ws.sent == messages for ws in sockets)
+    return enqueue_time, total_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WebSocket broadcast fan-out")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10000], help="recipient counts to test")
+    parser.add_argument("--messages", type=int, default=20, help="broadcasts per run")
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        print(f"{args.messages} broadcasts to {clients} clients")
+        for name, shared in (("shared frame", True), ("per-client dumps", False)):
+            enqueue_time, total_time = asyncio.run(run_broadcasts(clients, args.messages, shared))
+            print(f"  {name:<17} enqueue {enqueue_time / args.messages * 1e3:8.2f} ms/broadcast  "
+                  f"delivered {total_time / args.messages * 1e3:8.2f} ms/broadcast")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Per-client outbound queue and writer task for WebSocket connections.
+
+Sending inline (await websocket.send_text) lets one slow client stall every
+coroutine that broadcasts to it. Instead, each connection gets a ClientOutbox:
+senders enqueue and return at once, and a dedicated writer task drains the
+queue to the socket.
+
+Messages are queued in lanes, written in priority order:
+
+- control: heartbeats, pings, system notices
+- status: agent status and progress updates
+- bulk: chat, agent output and everything else
+
+Messages with a conflation key (e.g. session:agent:status) only matter as
+their latest value: queuing one replaces any pending message with the same
+key in its queue position, so a slow client gets the current status rather
+than every intermediate one, and frequent updates cannot starve it. Messages
+without a key keep full ordering.
+
+Each lane is bounded. When a lane is full the overflow policy decides:
+
+- drop_oldest: discard the lane's oldest pending message
+- conflate: discard the lane's oldest keyed message, falling back to the
+  oldest message
+- disconnect: treat the client as too slow and disconnect it
+
+Messages travel as OutboundFrames: serialized once, then shared by reference
+by every recipient's queue, retries and the reconnect replay queue.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lanes, highest priority first
+CONTROL = "control"
+STATUS = "status"
+BULK = "bulk"
+LANES = (CONTROL, STATUS, BULK)
+
+# An unsent frame and the lane it was queued in
+PendingFrame = Tuple["OutboundFrame", str]
+
+# Overflow policies
+DROP_OLDEST = "drop_oldest"
+CONFLATE = "conflate"
+DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (DROP_OLDEST, CONFLATE, DISCONNECT)
+
+DEFAULT_LANE_SIZE = 256
+
+# Send lag samples kept per client
+LAG_WINDOW = 100
+
+
+def conflation_key(session_id: str, agent_name: str, kind: str) -> str:
+    """Key under which only the latest message of one kind per agent and session is delivered"""
+    return f"{session_id}:{agent_name}:{kind}"
+
+
+class OutboundFrame:
+    """A WebSocket message encoded once and shared by every recipient"""
+
+    __slots__ = ('text', 'key', '_data')
+
+    def __init__(self, text: str, key: Optional[str] = None):
+        self.text = text
+        self.key = key
+        self._data: Optional[bytes] = None
+
+    @classmethod
+    def of(cls, message: Any, key: str = None) -> "OutboundFrame":
+        """
+        Wrap a serialized message, or serialize a dict. Frames are returned
+        as-is unless given a different conflation key.
+        """
+        if isinstance(message, OutboundFrame):
+            if key is None or key == message.key:
+                return message
+            frame = cls(message.text, key)
+            frame._data = message._data
+            return frame
+        if isinstance(message, str):
+            return cls(message, key)
+        return cls(json.dumps(message), key)
+
+    @property
+    def data(self) -> bytes:
+        """UTF-8 encoding of the frame, computed on first use"""
+        if self._data is None:
+            self._data = self.text.encode("utf-8")
+        return self._data
+
+    def __repr__(self) -> str:
+        return f"OutboundFrame({self.text[:60]!r})"
+
+
+class _Outbound:
+    __slots__ = ('frame', 'lane', 'enqueued_at')
+
+    def __init__(self, frame: OutboundFrame, lane: str):
+        self.frame = frame
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+
+
+class ClientOutbox:
+    """Bounded, prioritised send queue for one WebSocket client, drained by its own writer task"""
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket,
+        on_sent: Callable[[], None] = None,
+        on_failure: Callable[[str, Exception, List[PendingFrame]], Awaitable[None]] = None,
+        on_overflow: Callable[[str], Awaitable[None]] = None,
+        lane_size: int = DEFAULT_LANE_SIZE,
+        overflow_policy: str = DROP_OLDEST
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow_policy}', expected one of {OVERFLOW_POLICIES}")
+        self.client_id = client_id
+        self.websocket = websocket
+        self.lane_size = max(1, lane_size)
+        self.overflow_policy = overflow_policy
+        self._on_sent = on_sent
+        self._on_failure = on_failure
+        self._on_overflow = on_overflow
+        self._lanes: Dict[str, Deque[_Outbound]] = {lane: deque() for lane in LANES}
+        self._keyed: Dict[str, _Outbound] = {}  # Pending entry per conflation key
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closed = False
+        self._lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            'enqueued': {lane: 0 for lane in LANES},
+            'sent': 0,
+            'dropped': 0,
+            'conflated': 0,
+            'max_depth': 0,
+            'max_lag_ms': 0.0
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer(), name=f"ws-writer-{self.client_id}")
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self._lanes.values())
+
+    def enqueue(self, message: Any, lane: str = BULK, key: str = None) -> bool:
+        """
+        Queue a message for the writer. A conflation key (given here or
+        carried by the frame) replaces any pending message with the same key,
+        in that message's place in the queue.
+        Returns False if the outbox is closed or the client is being
+        disconnected for overflowing.
+        """
+        if self._closed:
+            return False
+        frame = OutboundFrame.of(message, key)
+        superseded = self._keyed.get(frame.key) if frame.key is not None else None
+        if superseded is not None:
+            self.metrics['conflated'] += 1
+            if superseded.lane == lane:
+                # Replace in place: the pending entry keeps its queue position, so a
+                # steady stream of updates cannot keep pushing it to the back
+                superseded.frame = frame
+                self.metrics['enqueued'][lane] += 1
+                return True
+            self._remove(superseded)
+
+        queue = self._lanes[lane]
+        if len(queue) >= self.lane_size and not self._make_room(queue):
+            return False
+
+        entry = _Outbound(frame, lane)
+        queue.append(entry)
+        if frame.key is not None:
+            self._keyed[frame.key] = entry
+        self.metrics['enqueued'][lane] += 1
+        self.metrics['max_depth'] = max(self.metrics['max_depth'], self.depth)
+        self._idle.clear()
+        self._ready.set()
+        return True
+
+    def _make_room(self, queue: Deque[_Outbound]) -> bool:
+        if self.overflow_policy == DISCONNECT:
+            logger.warning(f"Outbound queue full for {self.client_id}, disconnecting slow client")
+            self._closed = True
+            if self._on_overflow:
+                asyncio.ensure_future(self._on_overflow(self.client_id))
+            return False
+
+        victim = queue[0]
+        if self.overflow_policy == CONFLATE:
+            victim = next((entry for entry in queue if entry.frame.key is not None), victim)
+        self._remove(victim)
+        self.metrics['dropped'] += 1
+        return True
+
+    def _remove(self, entry: _Outbound):
+        self._lanes[entry.lane].remove(entry)
+        self._forget(entry)
+
+    def _forget(self, entry: _Outbound):
+        key = entry.frame.key
+        if key is not None and self._keyed.get(key) is entry:
+            del self._keyed[key]
+
+    def _next(self) -> Optional[_Outbound]:
+        for lane in LANES:
+            queue = self._lanes[lane]
+            if queue:
+                entry = queue.popleft()
+                self._forget(entry)
+                return entry
+        return None
+
+    async def _writer(self):
+        while True:
+            await self._ready.wait()
+            entry = self._next()
+            if entry is None:
+                self._ready.clear()
+                self._idle.set()
+                continue
+            try:
+                await self.websocket.send_text(entry.frame.text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Hand back the failed message and everything still pending
+                self._closed = True
+                self._idle.set()
+                if self._on_failure:
+                    await self._on_failure(self.client_id, e, [(entry.frame, entry.lane)] + self._take_pending())
+                return
+
+            lag_ms = (time.monotonic() - entry.enqueued_at) * 1000
+            self._lags.append(lag_ms)
+            self.metrics['sent'] += 1
+            self.metrics['max_lag_ms'] = max(self.metrics['max_lag_ms'], lag_ms)
+            if self._on_sent:
+                self._on_sent()
+
+    def pending(self) -> List[OutboundFrame]:
+        """Remove and return every queued frame in send order."""
+        return [frame for frame, _ in self._take_pending()]
+
+    def _take_pending(self) -> List[PendingFrame]:
+        pending = []
+        while True:
+            entry = self._next()
+            if entry is None:
+                return pending
+            pending.append((entry.frame, entry.lane))
+
+    async def drain(self, timeout: float = None):
+        """Wait until every queued message has been written (or the writer stopped)."""
+        await asyncio.wait_for(self._idle.wait(), timeout)
+
+    async def close(self) -> List[PendingFrame]:
+        """Stop the writer task; returns the frames that were never sent, with their lanes."""
+        self._closed = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._idle.set()
+        return self._take_pending()
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        oldest = min((queue[0].enqueued_at for queue in self._lanes.values() if queue), default=None)
+        return {
+            'overflow_policy': self.overflow_policy,
+            'lane_size': self.lane_size,
+            'depth': self.depth,
+            'depth_by_lane': {lane: len(queue) for lane, queue in self._lanes.items()},
+            'oldest_pending_ms': (now - oldest) * 1000 if oldest is not None else 0.0,
+            'average_lag_ms': sum(self._lags) / len(self._lags) if self._lags else 0.0,
+            'last_lag_ms': self._lags[-1] if self._lags else 0.0,
+            **{name: (dict(value) if isinstance(value, dict) else value) for name, value in self.metrics.items()}
+        }
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import os
 import sys
@@ -39,6 +40,10 @@ class MockConnectionManager:
         self.broadcast_messages.append(message)
         await asyncio.sleep(0) # yield control
 
+    async def send_to_session(self, session_id: str, message: str, **kwargs):
+        self.broadcast_messages.append(message)
+        await asyncio.sleep(0) # yield control
+
 @pytest.fixture
 def mock_broadcaster():
     """Provides a mock AgentStatusBroadcaster that records messages."""
@@ -4,13 +4,20 @@ import logging
 import uuid
 import time
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Union
 from collections import defaultdict, deque
 
 from fastapi import WebSocket, WebSocketDisconnect
 
+from backend.client_outbox import (
+    ClientOutbox, OutboundFrame, PendingFrame, CONTROL, BULK, DEFAULT_LANE_SIZE, DROP_OLDEST, OVERFLOW_POLICIES
+)
+
 logger = logging.getLogger(__name__)
 
+# Session every client is subscribed to unless it connects with another one
+DEFAULT_SESSION = "global_session"
+
 class ConnectionHealth:
     """Tracks health metrics for a WebSocket connection."""
     
@@ -64,10 +71,15 @@ class EnhancedConnectionManager:
         self.active_connections: Dict[str, WebSocket] = {}
         self.connection_metadata: Dict[str, dict] = {}
         self.connection_health: Dict[str, ConnectionHealth] = {}
-        self.message_queue: Dict[str, List[str]] = {}
+        self.message_queue: Dict[str, List[PendingFrame]] = {}  # Replayed into their lanes on reconnect
+        self.message_queue_times: Dict[str, float] = {}  # When each client's replay queue last grew
+        self.outboxes: Dict[str, ClientOutbox] = {}  # Per-client send queue and writer task
+        self._conflated = {"outbox": 0, "replay": 0}  # Conflations in closed outboxes and replay queues
         
         # Enhanced features
         self.connection_groups: Dict[str, Set[str]] = defaultdict(set)  # Group connections by session/room
+        self.session_subscribers: Dict[str, Set[str]] = defaultdict(set)  # session_id -> subscribed clients
+        self.client_sessions: Dict[str, Set[str]] = defaultdict(set)  # client_id -> subscribed sessions
         self.rate_limits: Dict[str, deque] = defaultdict(lambda: deque(maxlen=100))  # Rate limiting per client
         self.blocked_clients: Set[str] = set()  # Temporarily blocked clients
         self.heartbeat_timers: Dict[str, asyncio.Task] = {}
@@ -82,6 +94,7 @@ class EnhancedConnectionManager:
         self.config = {
             "max_connections": 1000,
             "max_message_queue_size": 100,
+            "message_queue_ttl": 300.0,  # seconds queued messages wait for their client to reconnect
             "heartbeat_interval": 30.0,  # seconds
             "heartbeat_timeout": 60.0,   # seconds
             "rate_limit_window": 60.0,   # seconds
@@ -92,7 +105,10 @@ class EnhancedConnectionManager:
             "retry_backoff_base": 2.0,   # Exponential backoff base
             "error_threshold": 5,        # Max errors before temporary block
             "block_duration": 300.0,     # 5 minutes block duration
+            "outbox_lane_size": DEFAULT_LANE_SIZE,      # Pending messages per client per lane
+            "outbox_overflow_policy": DROP_OLDEST,      # drop_oldest, conflate or disconnect
         }
+        self._load_outbox_config()
         
         # Start background tasks
         self._cleanup_task = None
@@ -101,6 +117,20 @@ class EnhancedConnectionManager:
         
         logger.info("Enhanced Connection Manager initialized with error recovery")
     
+    def _load_outbox_config(self):
+        """Outbox sizing and overflow policy from WS_OUTBOX_LANE_SIZE / WS_OUTBOX_OVERFLOW_POLICY."""
+        try:
+            from backend.dynamic_config import get_dynamic_config
+            config = get_dynamic_config()
+            self.config["outbox_lane_size"] = config.get("WS_OUTBOX_LANE_SIZE", DEFAULT_LANE_SIZE, "integer")
+            policy = config.get("WS_OUTBOX_OVERFLOW_POLICY", DROP_OLDEST)
+            if policy in OVERFLOW_POLICIES:
+                self.config["outbox_overflow_policy"] = policy
+            else:
+                logger.warning(f"Unknown WS_OUTBOX_OVERFLOW_POLICY '{policy}', using {DROP_OLDEST}")
+        except Exception as e:
+            logger.warning(f"Using default outbox config: {e}")
+
     def _start_cleanup_task(self):
         """Start the background cleanup task."""
         if self._cleanup_task is None or self._cleanup_task.done():
@@ -114,6 +144,7 @@ class EnhancedConnectionManager:
                 await self._cleanup_stale_connections()
                 self._cleanup_failed_connections()
                 self._cleanup_blocked_clients()
+                self._cleanup_expired_message_queues()
             except Exception as e:
                 logger.error(f"Error in cleanup loop: {e}")
     
@@ -158,6 +189,21 @@ class EnhancedConnectionManager:
             self.blocked_clients.discard(client_id)
             logger.info(f"Unblocked client: {client_id}")
     
+    def _cleanup_expired_message_queues(self):
+        """
+        Drop the replay queues of clients that have not reconnected within
+        message_queue_ttl. Client ids are fresh per connection, so most never do.
+        """
+        cutoff = time.time() - self.config["message_queue_ttl"]
+        expired = [
+            client_id for client_id, queued_at in self.message_queue_times.items()
+            if queued_at < cutoff and client_id not in self.active_connections
+        ]
+        for client_id in expired:
+            del self.message_queue_times[client_id]
+            dropped = len(self.message_queue.pop(client_id, ()))
+            logger.info(f"Dropped {dropped} queued messages for client {client_id}: not reconnected in time")
+
     def add_error_handler(self, handler: callable):
         """Add a custom error handler function."""
         self.error_handlers.append(handler)
@@ -188,8 +234,9 @@ class EnhancedConnectionManager:
         # Attempt graceful disconnect
         await self.disconnect(client_id, reason=f"Error: {str(error)[:100]}")
     
-    async def send_with_retry(self, client_id: str, message: str, max_retries: int = 3) -> bool:
+    async def send_with_retry(self, client_id: str, message: Union[str, OutboundFrame], max_retries: int = 3) -> bool:
         """Send message with automatic retry on failure."""
+        message = OutboundFrame.of(message)  # Encoded once for every attempt
         retry_count = 0
         
         while retry_count < max_retries:
@@ -229,9 +276,18 @@ class EnhancedConnectionManager:
             "is_healthy": health.is_healthy(self.config["heartbeat_timeout"]),
             "is_blocked": client_id in self.blocked_clients,
             "retry_count": self.connection_retries.get(client_id, 0),
-            "queued_messages": len(self.message_queue.get(client_id, []))
+            "queued_messages": len(self.message_queue.get(client_id, [])),
+            "sessions": sorted(self.client_sessions.get(client_id, ())),
+            "outbox": self.outboxes[client_id].get_stats() if client_id in self.outboxes else None
         }
     
+    def get_conflation_counts(self) -> Dict[str, int]:
+        """Keyed messages dropped because a newer one superseded them, by where they were pending."""
+        return {
+            "outbox": self._conflated["outbox"] + sum(outbox.metrics["conflated"] for outbox in self.outboxes.values()),
+            "replay": self._conflated["replay"]
+        }
+
     def get_system_diagnostics(self) -> Dict[str, Any]:
         """Get system-wide connection diagnostics."""
         total_messages_sent = sum(h.messages_sent for h in self.connection_health.values())
@@ -251,14 +307,20 @@ class EnhancedConnectionManager:
             "total_messages_received": total_messages_received,
             "total_errors": total_errors,
             "queued_messages": sum(len(q) for q in self.message_queue.values()),
+            "outbox_depth": sum(outbox.depth for outbox in self.outboxes.values()),
+            "max_outbox_depth": max((outbox.depth for outbox in self.outboxes.values()), default=0),
+            "conflated_messages": self.get_conflation_counts(),
             "connection_groups": {group: len(clients) for group, clients in self.connection_groups.items()},
+            "session_subscriptions": {session: len(clients) for session, clients in self.session_subscribers.items()},
             "uptime_seconds": time.time() - getattr(self, '_start_time', time.time()),
             "config": self.config.copy()
         }
 
-    async def connect(self, websocket: WebSocket, client_id: str = None, group: str = "default") -> str:
+    async def connect(self, websocket: WebSocket, client_id: str = None, group: str = "default",
+                      session_id: str = DEFAULT_SESSION) -> str:
         """
         Enhanced connection method with health monitoring and group support.
+        The client is subscribed to session_id's messages.
         """
         # Check connection limits
         if len(self.active_connections) >= self.config["max_connections"]:
@@ -282,8 +344,9 @@ class EnhancedConnectionManager:
         # Initialize health tracking
         self.connection_health[client_id] = ConnectionHealth(client_id)
         
-        # Add to group
+        # Add to group and session
         self.connection_groups[group].add(client_id)
+        self.subscribe(client_id, session_id)
         
         logger.info(f"Client {client_id} connected to group '{group}'. Total connections: {len(self.active_connections)}")
 
@@ -295,6 +358,7 @@ class EnhancedConnectionManager:
                 "message": "Welcome to the BotArmy backend!",
                 "client_id": client_id,
                 "group": group,
+                "session_id": session_id,
                 "server_time": datetime.utcnow().isoformat()
             },
         }
@@ -307,6 +371,20 @@ class EnhancedConnectionManager:
             await self.disconnect(client_id, f"Welcome message failed: {e}")
             raise
 
+        # Everything after the welcome goes through the client's writer task
+        health = self.connection_health[client_id]
+        outbox = ClientOutbox(
+            client_id,
+            websocket,
+            on_sent=health.record_message_sent,
+            on_failure=self._handle_outbox_failure,
+            on_overflow=self._handle_outbox_overflow,
+            lane_size=self.config["outbox_lane_size"],
+            overflow_policy=self.config["outbox_overflow_policy"]
+        )
+        self.outboxes[client_id] = outbox
+        outbox.start()
+
         # Process queued messages
         await self._process_queued_messages(client_id)
 
@@ -318,6 +396,13 @@ class EnhancedConnectionManager:
         metadata = self.connection_metadata.pop(client_id, None)
         health = self.connection_health.pop(client_id, None)
         
+        # Stop the writer; unsent messages are kept for a reconnect
+        outbox = self.outboxes.pop(client_id, None)
+        if outbox:
+            for message, lane in await outbox.close():
+                self._queue_message(client_id, message, lane)
+            self._conflated["outbox"] += outbox.metrics["conflated"]
+
         # Cancel heartbeat timer
         if client_id in self.heartbeat_timers:
             self.heartbeat_timers[client_id].cancel()
@@ -330,6 +415,8 @@ class EnhancedConnectionManager:
             if not self.connection_groups[group]:  # Remove empty groups
                 del self.connection_groups[group]
         
+        self.unsubscribe(client_id)
+
         # Update health metrics
         if health:
             health.disconnections += 1
@@ -350,6 +437,28 @@ class EnhancedConnectionManager:
         
         self.blocked_clients.discard(client_id)
 
+    def subscribe(self, client_id: str, session_id: str) -> bool:
+        """Subscribe a connected client to a session's messages. Returns False if already subscribed."""
+        if client_id not in self.active_connections or session_id in self.client_sessions.get(client_id, ()):
+            return False
+        self.session_subscribers[session_id].add(client_id)
+        self.client_sessions[client_id].add(session_id)
+        logger.debug(f"Client {client_id} subscribed to session {session_id}")
+        return True
+
+    def unsubscribe(self, client_id: str, session_id: str = None):
+        """Unsubscribe a client from one session, or from all of them if session_id is None."""
+        sessions = self.client_sessions.get(client_id, set())
+        for session in ([session_id] if session_id is not None else list(sessions)):
+            sessions.discard(session)
+            subscribers = self.session_subscribers.get(session)
+            if subscribers is not None:
+                subscribers.discard(client_id)
+                if not subscribers:  # Remove empty sessions
+                    del self.session_subscribers[session]
+        if not sessions:
+            self.client_sessions.pop(client_id, None)
+
     def get_client_id(self, websocket: WebSocket) -> str | None:
         """
         Retrieves the client_id for a given WebSocket object.
@@ -360,89 +469,137 @@ class EnhancedConnectionManager:
                 return client_id
         return None
 
-    async def send_to_client(self, client_id: str, message: str, priority: str = "normal"):
+    async def send_to_client(self, client_id: str, message: Union[str, OutboundFrame], priority: str = "normal",
+                             lane: str = None, key: str = None):
         """
-        Enhanced send with rate limiting and priority support.
+        Queue a message on the client's outbox; its writer task sends it.
+        message is a serialized string or a pre-encoded OutboundFrame.
+        High priority messages skip rate limiting and default to the control
+        lane, others to the bulk lane. "stream" priority (LLM output deltas,
+        already coalesced by the sender) also skips the per-client message
+        limit but stays in the bulk lane, in order with chat output. key (e.g. session:agent:status) marks
+        latest-value messages: a newer one replaces any still pending for the
+        client, in its outbox or in the reconnect replay queue.
         """
         # Check if client is blocked
         if client_id in self.blocked_clients:
             logger.warning(f"Message to blocked client {client_id} discarded")
             return False
             
-        # Check rate limiting (except for high priority messages)
-        if priority != "high" and not self._check_rate_limit(client_id):
+        message = OutboundFrame.of(message, key)
+        lane = lane or (CONTROL if priority == "high" else BULK)
+
+        # Check rate limiting (except for high priority messages and stream frames)
+        if priority not in ("high", "stream") and not self._check_rate_limit(client_id):
             logger.warning(f"Rate limit exceeded for client {client_id}, queuing message")
-            self._queue_message(client_id, message)
+            self._queue_message(client_id, message, lane)
             return False
 
-        websocket = self.active_connections.get(client_id)
-        if websocket:
-            try:
-                await websocket.send_text(message)
-                
-                # Update health metrics
-                if client_id in self.connection_health:
-                    self.connection_health[client_id].record_message_sent()
-                
-                return True
-            except Exception as e:
-                logger.error(f"Failed to send message to client {client_id}: {e}. Queuing message.")
-                
-                # Update error count
-                if client_id in self.connection_health:
-                    self.connection_health[client_id].record_error()
-                
-                self._queue_message(client_id, message)
-                return False
-        else:
-            logger.warning(f"Client {client_id} not connected. Queuing message.")
-            self._queue_message(client_id, message)
-            return False
+        outbox = self.outboxes.get(client_id)
+        if outbox:
+            return outbox.enqueue(message, lane)
+
+        logger.warning(f"Client {client_id} not connected. Queuing message.")
+        self._queue_message(client_id, message, lane)
+        return False
+
+    async def _handle_outbox_failure(self, client_id: str, error: Exception, unsent: List[PendingFrame]):
+        """A write failed: keep the unsent messages for a reconnect and drop the connection."""
+        logger.error(f"Failed to send message to client {client_id}: {error}. Queuing {len(unsent)} messages.")
+        if client_id in self.connection_health:
+            self.connection_health[client_id].record_error()
+        for message, lane in unsent:
+            self._queue_message(client_id, message, lane)
+        await self.disconnect(client_id, reason=f"Send failed: {str(error)[:100]}")
+
+    async def _handle_outbox_overflow(self, client_id: str):
+        await self.disconnect(client_id, reason="Slow consumer: outbound queue full")
 
-    def _queue_message(self, client_id: str, message: str):
-        """Helper to queue messages for disconnected clients."""
+    async def flush(self, client_id: str = None, timeout: float = 5.0):
+        """Wait until one client's (or every client's) queued messages have been written."""
+        outboxes = [self.outboxes[client_id]] if client_id in self.outboxes else (
+            [] if client_id else list(self.outboxes.values())
+        )
+        await asyncio.gather(*(outbox.drain(timeout) for outbox in outboxes))
+
+    def _queue_message(self, client_id: str, message: OutboundFrame, lane: str = BULK):
+        """Helper to queue messages for disconnected clients, with the lane to replay them into."""
         if client_id not in self.message_queue:
             self.message_queue[client_id] = []
+        self.message_queue_times[client_id] = time.time()
+
+        # Only the latest message per conflation key is replayed, in the place of the first
+        if message.key is not None:
+            queue = self.message_queue[client_id]
+            for index, (queued, _) in enumerate(queue):
+                if queued.key == message.key:
+                    queue[index] = (message, lane)
+                    self._conflated["replay"] += 1
+                    return
         
         # Limit queue size
         if len(self.message_queue[client_id]) >= self.config["max_message_queue_size"]:
             self.message_queue[client_id].pop(0)  # Remove oldest message
             
-        self.message_queue[client_id].append(message)
+        self.message_queue[client_id].append((message, lane))
 
-    async def broadcast_to_all(self, message: str, priority: str = "normal"):
+    async def broadcast_to_all(self, message: Union[str, OutboundFrame], priority: str = "normal",
+                               lane: str = None, key: str = None):
         """
         Enhanced broadcast with priority support.
+        The message is encoded once and the frame shared by every client's queue.
         """
-        # Create a list of send tasks
-        tasks = [self.send_to_client(client_id, message, priority) for client_id in self.active_connections.keys()]
-        # Run all send tasks concurrently
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Count successful sends
-        successful = sum(1 for result in results if result is True)
-        logger.debug(f"Broadcast message sent to {successful}/{len(tasks)} clients")
+        message = OutboundFrame.of(message, key)
+        clients = list(self.active_connections.keys())
+        successful = 0
+        for client_id in clients:
+            if await self.send_to_client(client_id, message, priority, lane, key):
+                successful += 1
+        logger.debug(f"Broadcast message queued for {successful}/{len(clients)} clients")
         
         return successful
 
-    async def send_to_group(self, group: str, message: str, exclude_client: str = None, priority: str = "normal"):
+    async def send_to_group(self, group: str, message: Union[str, OutboundFrame], exclude_client: str = None,
+                            priority: str = "normal", lane: str = None, key: str = None):
         """Send message to all clients in a specific group."""
         if group not in self.connection_groups:
             logger.warning(f"Group '{group}' not found")
             return 0
             
+        message = OutboundFrame.of(message, key)
         clients = self.connection_groups[group].copy()
         if exclude_client:
             clients.discard(exclude_client)
             
-        tasks = [self.send_to_client(client_id, message, priority) for client_id in clients]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        successful = sum(1 for result in results if result is True)
-        logger.debug(f"Group '{group}' message sent to {successful}/{len(tasks)} clients")
+        successful = 0
+        for client_id in clients:
+            if await self.send_to_client(client_id, message, priority, lane, key):
+                successful += 1
+        logger.debug(f"Group '{group}' message queued for {successful}/{len(clients)} clients")
         
         return successful
 
+    async def send_to_session(self, session_id: str, message: Union[str, OutboundFrame], priority: str = "normal",
+                              exclude_client: str = None, lane: str = None, key: str = None):
+        """
+        Send a session-scoped message to the clients subscribed to session_id.
+        Use broadcast_to_all only for system-wide messages.
+        """
+        clients = self.session_subscribers.get(session_id)
+        if not clients:
+            logger.debug(f"No clients subscribed to session {session_id}, message dropped")
+            return 0
+
+        message = OutboundFrame.of(message, key)
+        clients = clients - {exclude_client} if exclude_client else set(clients)
+        successful = 0
+        for client_id in clients:
+            if await self.send_to_client(client_id, message, priority, lane, key):
+                successful += 1
+        logger.debug(f"Session '{session_id}' message queued for {successful}/{len(clients)} clients")
+
+        return successful
+
     def _check_rate_limit(self, client_id: str) -> bool:
         """Check if client is within rate limits."""
         now = time.time()
@@ -466,11 +623,14 @@ class EnhancedConnectionManager:
         if client_id in self.message_queue:
             num_queued = len(self.message_queue[client_id])
             messages_to_send = self.message_queue.pop(client_id)
+            self.message_queue_times.pop(client_id, None)
             logger.info(f"Sending {num_queued} queued messages to client {client_id}...")
             
-            for message in messages_to_send:
+            for message, lane in messages_to_send:
                 try:
-                    await self.send_to_client(client_id, message, "high")  # High priority for queued messages
+                    # Not rate limited again, and back into its own lane so a backlog
+                    # of bulk output cannot get ahead of live control frames
+                    await self.send_to_client(client_id, message, "high", lane=lane)
                 except Exception as e:
                     logger.error(f"Failed to send queued message to client {client_id}: {e}. Message lost.")
                     
@@ -494,11 +654,14 @@ class EnhancedConnectionManager:
             "blocked_clients": len(self.blocked_clients),
             "total_groups": len(self.connection_groups),
             "queued_messages": {client_id: len(messages) for client_id, messages in self.message_queue.items()},
+            "outbox_depth": {client_id: outbox.depth for client_id, outbox in self.outboxes.items()},
+            "conflated_messages": self.get_conflation_counts(),
             "total_messages_sent": total_messages_sent,
             "total_messages_received": total_messages_received,
             "total_errors": total_errors,
             "average_uptime": total_uptime / len(self.connection_health) if self.connection_health else 0,
             "groups": {group: len(clients) for group, clients in self.connection_groups.items()},
+            "sessions": {session: len(clients) for session, clients in self.session_subscribers.items()},
             "config": self.config
         }
 
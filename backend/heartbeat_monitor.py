@@ -9,6 +9,7 @@ if TYPE_CHECKING:
     from backend.connection_manager import EnhancedConnectionManager
 
 from backend.agui.protocol import MessageProtocol
+from backend.client_outbox import CONTROL, OutboundFrame
 
 logger = logging.getLogger(__name__)
 
@@ -62,7 +63,8 @@ class HeartbeatMonitor:
 
     async def _send_heartbeat_to_all(self):
         """Sends a heartbeat message to all connected clients."""
-        heartbeat_message = MessageProtocol.create_heartbeat_message()
+        # Serialize once; every client's outbox shares the same frame
+        heartbeat_frame = OutboundFrame.of(MessageProtocol.create_heartbeat_message(), key="heartbeat")
         # Use a copy of the client IDs to avoid issues if the dictionary changes during iteration
         client_ids = list(self.connection_manager.active_connections.keys())
         for client_id in client_ids:
@@ -72,12 +74,9 @@ class HeartbeatMonitor:
 
             await self.connection_manager.send_to_client(
                 client_id,
-                # The message protocol returns a dict, we need to serialize it
-                # Let's assume the connection manager's send_to_client handles serialization
-                # Or better, let's serialize it here.
-                # Reading `connection_manager.py` again, it expects a string.
-                # Let's import json.
-                __import__('json').dumps(heartbeat_message)
+                heartbeat_frame,
+                priority="high",
+                lane=CONTROL
             )
 
     def handle_heartbeat_response(self, client_id: str):
@@ -1,6 +1,9 @@
 import asyncio
 import os
-import controlflow as cf
+from backend.runtime_env import LazyModule
+
+# ControlFlow is only imported when approval is actually requested
+cf = LazyModule("controlflow")
 # Removed direct import of status_broadcaster to prevent circular dependencies
 
 async def request_human_approval(
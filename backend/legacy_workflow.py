@@ -8,7 +8,7 @@ import logging
 import os
 from typing import Dict, Any
 
-from backend.runtime_env import get_controlflow, get_prefect, IS_REPLIT
+from backend.runtime_env import lazy_flow, IS_REPLIT
 from backend.human_input_handler import request_human_approval
 
 # Import the agent tasks
@@ -20,10 +20,6 @@ from backend.agents.deployer_agent import run_deployer_task
 
 logger = logging.getLogger(__name__)
 
-# Get appropriate modules based on environment
-cf = get_controlflow()
-prefect = get_prefect()
-
 # Define the sequence of agent tasks with HITL support
 AGENT_TASKS = [
     {
@@ -61,9 +57,11 @@ AGENT_TASKS = [
 from backend.agent_status_broadcaster import AgentStatusBroadcaster
 
 from backend.services.role_enforcer import RoleEnforcer
+from backend.services.context_assembler import get_context_assembler
+from backend.services.llm_service import get_llm_service
 from backend.serialization_safe_wrapper import make_serialization_safe
 
-@prefect.flow(name="BotArmy SDLC Workflow with HITL", persist_result=False, validate_parameters=False)
+@lazy_flow(name="BotArmy SDLC Workflow with HITL", persist_result=False, validate_parameters=False)
 async def botarmy_workflow(project_brief: str, session_id: str, status_broadcaster: Any, agent_pause_states: Dict[str, bool], artifact_preferences: Dict[str, bool], role_enforcer: Any) -> Dict[str, Any]:
     """
     Adaptive workflow with Human-in-the-Loop functionality.
@@ -90,6 +88,10 @@ async def botarmy_workflow(project_brief: str, session_id: str, status_broadcast
     if not hitl_enabled or auto_action == "approve":
         logger.info("HITL disabled or auto-approval enabled - running automatically")
 
+    # Each agent gets the previous output, fitted to the model's context budget
+    context_assembler = get_context_assembler()
+    context_budget = context_assembler.budget_for_models(get_llm_service().get_model_limits())
+
     for i, agent_info in enumerate(AGENT_TASKS):
         agent_name = agent_info["name"]
 
@@ -151,8 +153,9 @@ async def botarmy_workflow(project_brief: str, session_id: str, status_broadcast
             )
             
             # Execute the agent's task
+            task_input = context_assembler.assemble([("Previous Output", current_input)], budget=context_budget).text
             result = await task_func(
-                current_input,
+                task_input,
                 status_broadcaster=status_broadcaster,
                 session_id=session_id,
                 artifact_preferences=artifact_preferences,
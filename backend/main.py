@@ -22,38 +22,45 @@ load_dotenv()
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-import uvicorn
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-
-# Runtime environment detection
-from backend.runtime_env import IS_REPLIT, get_environment_info, get_prefect_client
-
-# Core imports that work in both environments
-from backend.agui.protocol import agui_handler, MessageType
-from backend.artifacts import get_artifacts_structure
-from backend.bridge import AGUI_Handler
-from backend.connection_manager import EnhancedConnectionManager
-from backend.error_handler import ErrorHandler
-from backend.agent_status_broadcaster import AgentStatusBroadcaster
-from backend.heartbeat_monitor import HeartbeatMonitor
-# Import from legacy_workflow.py file (renamed to avoid namespace collision)
-from backend.legacy_workflow import botarmy_workflow, simple_workflow
-from backend.serialization_safe_wrapper import make_serialization_safe
-
-# Import from workflow package
-from backend.workflow.generic_orchestrator import generic_workflow
-from backend.workflow.interactive_orchestrator import InteractiveWorkflowOrchestrator
-
-# Import rate limiter and enhanced LLM service
-from backend.rate_limiter import rate_limiter
-from backend.services.llm_service import get_llm_service
-from backend.services.message_router import MessageRouter
-from backend.services.general_chat_service import GeneralChatService
-from backend.services.role_enforcer import RoleEnforcer
-from backend.services.upload_rate_limiter import get_upload_rate_limiter, RateLimitType
-from backend.services.performance_monitor import PerformanceMonitor
+# Import phases are timed for the cold start report (STARTUP_TIMING_REPORT=true)
+from backend.startup_timing import startup_timer, is_report_enabled
+
+with startup_timer.phase("web_framework"):
+    import uvicorn
+    from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import FileResponse
+
+with startup_timer.phase("core"):
+    # Runtime environment detection
+    from backend.runtime_env import IS_REPLIT, get_environment_info, get_prefect_client
+
+    # Core imports that work in both environments
+    from backend.agui.protocol import agui_handler, MessageType
+    from backend.artifacts import get_artifacts_structure
+    from backend.bridge import AGUI_Handler
+    from backend.connection_manager import EnhancedConnectionManager, DEFAULT_SESSION
+    from backend.error_handler import ErrorHandler
+    from backend.agent_status_broadcaster import AgentStatusBroadcaster
+    from backend.heartbeat_monitor import HeartbeatMonitor
+    from backend.serialization_safe_wrapper import make_serialization_safe
+
+# The legacy SDLC workflow (ControlFlow/Prefect agents) is imported when it first runs
+
+with startup_timer.phase("workflows"):
+    # Import from workflow package
+    from backend.workflow.generic_orchestrator import generic_workflow
+    from backend.workflow.interactive_orchestrator import InteractiveWorkflowOrchestrator
+
+with startup_timer.phase("services"):
+    # Import rate limiter and enhanced LLM service
+    from backend.rate_limiter import rate_limiter
+    from backend.services.llm_service import get_llm_service
+    from backend.services.message_router import MessageRouter
+    from backend.services.general_chat_service import GeneralChatService
+    from backend.services.role_enforcer import RoleEnforcer
+    from backend.services.upload_rate_limiter import get_upload_rate_limiter, RateLimitType
+    from backend.services.performance_monitor import PerformanceMonitor
 
 # Configure logging
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -131,6 +138,10 @@ async def lifespan(app: FastAPI):
     
     logger.info("All services initialized including performance monitoring")
 
+    startup_timer.mark_ready()
+    if is_report_enabled():
+        startup_timer.log_report()
+
     yield
 
     logger.info("BotArmy Backend shutting down...")
@@ -230,14 +241,16 @@ async def run_and_track_workflow(project_brief: str, session_id: str, manager: E
             agent_name="System",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(response))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(response))
         # Choose workflow based on config_name - integrate both approaches
         if config_name == "sdlc":
             # Use the enhanced SDLC workflow with dual-chat-mode improvements
             # Wrap status_broadcaster to prevent circular reference serialization in Prefect
             safe_status_broadcaster = make_serialization_safe(status_broadcaster, "AgentStatusBroadcaster")
             safe_role_enforcer = make_serialization_safe(role_enforcer, "RoleEnforcer")
-            
+
+            # Imported here so its agents and ControlFlow/Prefect stay out of cold start
+            from backend.legacy_workflow import botarmy_workflow
             result = await botarmy_workflow(
                 project_brief=project_brief,
                 session_id=session_id,
@@ -281,7 +294,7 @@ async def run_and_track_workflow(project_brief: str, session_id: str, manager: E
             agent_name="System", 
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(response))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(response))
         logger.info(f"Workflow {flow_run_id} completed successfully")
 
     except Exception as e:
@@ -290,7 +303,7 @@ async def run_and_track_workflow(project_brief: str, session_id: str, manager: E
             agent_name="System",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(error_response))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(error_response))
         logger.error(f"Workflow {flow_run_id} failed: {e}", exc_info=True)
         
         # Update workflow status to failed
@@ -318,7 +331,7 @@ async def test_openai_connection(session_id: str, manager: EnhancedConnectionMan
             agent_name="System",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(response))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(response))
         
         # Get LLM service
         llm_service = get_llm_service()
@@ -340,7 +353,7 @@ async def test_openai_connection(session_id: str, manager: EnhancedConnectionMan
             agent_name="OpenAI Test",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(success_response))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(success_response))
         
         logger.info(f"OpenAI test successful for session {session_id}")
         
@@ -351,7 +364,7 @@ async def test_openai_connection(session_id: str, manager: EnhancedConnectionMan
             agent_name="System",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(error_response))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(error_response))
         logger.error(f"OpenAI test failed for session {session_id}: {e}")
 
 async def handle_chat_message(session_id: str, manager: EnhancedConnectionManager, chat_text: str, app_state: Any):
@@ -374,7 +387,7 @@ async def handle_chat_message(session_id: str, manager: EnhancedConnectionManage
                 agent_name="System",
                 session_id=session_id
             )
-            await manager.broadcast_to_all(agui_handler.serialize_message(response))
+            await manager.send_to_session(session_id, agui_handler.serialize_message(response))
             return
 
         session["mode"] = "project"
@@ -385,7 +398,7 @@ async def handle_chat_message(session_id: str, manager: EnhancedConnectionManage
             agent_name="System",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(response_msg))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(response_msg))
         # Trigger the project workflow
         asyncio.create_task(run_and_track_workflow(project_description, session_id, manager, app_state.status_broadcaster, app_state.role_enforcer))
 
@@ -396,7 +409,7 @@ async def handle_chat_message(session_id: str, manager: EnhancedConnectionManage
             agent_name="System",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(response_msg))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(response_msg))
 
     elif router_action == "project_workflow":
         # In project mode, messages are handled by the agent workflow.
@@ -407,17 +420,17 @@ async def handle_chat_message(session_id: str, manager: EnhancedConnectionManage
             agent_name="System",
             session_id=session_id
         )
-        await manager.broadcast_to_all(agui_handler.serialize_message(response_msg))
+        await manager.send_to_session(session_id, agui_handler.serialize_message(response_msg))
 
     elif router_action == "general_chat":
         try:
-            response_text = await app_state.general_chat_service.handle_message(chat_text)
+            response_text = await app_state.general_chat_service.handle_message(chat_text, session_id)
             response_msg = agui_handler.create_agent_message(
                 content=response_text,
                 agent_name="BotArmy Assistant",
                 session_id=session_id
             )
-            await manager.broadcast_to_all(agui_handler.serialize_message(response_msg))
+            await manager.send_to_session(session_id, agui_handler.serialize_message(response_msg))
         except Exception as e:
             logger.error(f"Error in general chat: {e}")
             error_response = agui_handler.create_agent_message(
@@ -425,7 +438,7 @@ async def handle_chat_message(session_id: str, manager: EnhancedConnectionManage
                 agent_name="System",
                 session_id=session_id
             )
-            await manager.broadcast_to_all(agui_handler.serialize_message(error_response))
+            await manager.send_to_session(session_id, agui_handler.serialize_message(error_response))
 
 async def handle_websocket_message(
     client_id: str,
@@ -446,11 +459,27 @@ async def handle_websocket_message(
     elif msg_type == "ping":
         await manager.send_to_client(
             client_id,
-            json.dumps({"type": "pong", "timestamp": datetime.now().isoformat()})
+            json.dumps({"type": "pong", "timestamp": datetime.now().isoformat()}),
+            priority="high"
+        )
+        return
+
+    session_id = message.get("session_id", DEFAULT_SESSION)
+
+    if msg_type == "subscribe":
+        manager.subscribe(client_id, session_id)
+        await manager.send_to_client(
+            client_id,
+            json.dumps({"type": "subscribed", "session_id": session_id, "timestamp": datetime.now().isoformat()})
         )
         return
 
-    session_id = message.get("session_id", "global_session")
+    elif msg_type == "unsubscribe":
+        manager.unsubscribe(client_id, session_id)
+        return
+
+    # Clients receive replies for every session they send commands in
+    manager.subscribe(client_id, session_id)
 
     if msg_type == "user_command":
         command_data = message.get("data", {})
@@ -463,7 +492,7 @@ async def handle_websocket_message(
                 agent_name="System",
                 session_id=session_id
             )
-            await manager.broadcast_to_all(agui_handler.serialize_message(response))
+            await manager.send_to_session(session_id, agui_handler.serialize_message(response))
             
         elif command == "test_openai":
             test_message = command_data.get("message")
@@ -488,7 +517,7 @@ async def handle_websocket_message(
                     agent_name="System",
                     session_id=session_id
                 )
-                await manager.broadcast_to_all(agui_handler.serialize_message(response))
+                await manager.send_to_session(session_id, agui_handler.serialize_message(response))
                 logger.info(f"All agents stopped by user for session {session_id}")
             else:
                 response = agui_handler.create_agent_message(
@@ -496,7 +525,7 @@ async def handle_websocket_message(
                     agent_name="System", 
                     session_id=session_id
                 )
-                await manager.broadcast_to_all(agui_handler.serialize_message(response))
+                await manager.send_to_session(session_id, agui_handler.serialize_message(response))
 
         elif command == "start_project":
             project_brief = command_data.get("brief", "No brief provided.")
@@ -546,7 +575,7 @@ async def handle_websocket_message(
                     "total_count": 0
                 }
             }
-            await manager.send_to_client(session_id, artifacts_response)
+            await manager.send_to_client(client_id, json.dumps(artifacts_response))
             logger.info("Sent artifacts list to client")
         except Exception as e:
             logger.error(f"Error handling artifacts_get_all: {e}")
@@ -593,7 +622,7 @@ async def interactive_websocket_endpoint(websocket: WebSocket, session_id: str):
     """Endpoint for interactive workflows."""
     manager = websocket.app.state.manager
     status_broadcaster = websocket.app.state.status_broadcaster
-    await manager.connect(websocket) # Simple connect, no session mapping yet
+    client_id = await manager.connect(websocket, session_id=session_id)
 
     try:
         # The first message from the client should be the project brief.
@@ -622,7 +651,7 @@ async def interactive_websocket_endpoint(websocket: WebSocket, session_id: str):
     except Exception as e:
         logger.error(f"Error in interactive websocket for session {session_id}: {e}")
     finally:
-        await manager.disconnect(websocket, reason="Interactive session ended")
+        await manager.disconnect(client_id, reason="Interactive session ended")
 
 
 @app.websocket("/api/ws")
@@ -632,7 +661,10 @@ async def websocket_endpoint(websocket: WebSocket):
     heartbeat_monitor = websocket.app.state.heartbeat_monitor
     status_broadcaster = websocket.app.state.status_broadcaster
 
-    client_id = await manager.connect(websocket)
+    # Session-scoped messages only reach subscribed clients; subscribe at connect
+    # with ?session_id= or later with a "subscribe" message
+    session_id = websocket.query_params.get("session_id", DEFAULT_SESSION)
+    client_id = await manager.connect(websocket, session_id=session_id)
     disconnect_reason = "Unknown"
     
     try:
@@ -640,7 +672,7 @@ async def websocket_endpoint(websocket: WebSocket):
         welcome_msg = agui_handler.create_agent_message(
             content="🔗 WebSocket connection established successfully!",
             agent_name="System",
-            session_id="global_session"
+            session_id=session_id
         )
         await websocket.send_text(agui_handler.serialize_message(welcome_msg))
         
@@ -1043,12 +1075,15 @@ async def get_workflow_metrics(workflow_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to get workflow metrics: {str(e)}")
 
 @app.get("/api/performance/agents")
-async def get_agent_performance():
+async def get_agent_performance(windowed: bool = True):
     """Get performance metrics for all agents."""
     try:
         performance_monitor = app.state.performance_monitor
+        llm_service = getattr(app.state, 'llm_service', None)
         return {
             "agents": dict(performance_monitor.agent_performance),
+            "task_latency": performance_monitor.get_agent_latency_percentiles(windowed),
+            "llm_latency": llm_service.get_latency_report(["agent"], windowed) if llm_service else None,
             "timestamp": time.time()
         }
         
@@ -1078,6 +1113,91 @@ async def get_connection_diagnostics(client_id: Optional[str] = None):
         logger.error(f"Error getting connection diagnostics: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get connection diagnostics: {str(e)}")
 
+@app.get("/api/performance/startup")
+async def get_startup_timing():
+    """Get cold start import timings and which heavy modules have been loaded."""
+    if not is_report_enabled():
+        raise HTTPException(status_code=404, detail="Startup timing report disabled, set STARTUP_TIMING_REPORT=true")
+    return {
+        **startup_timer.report(),
+        "timestamp": time.time()
+    }
+
+@app.get("/api/performance/llm")
+async def get_llm_performance(group_by: str = "provider,model,outcome", windowed: bool = True):
+    """Get LLM latency percentiles grouped by provider, model, agent and/or outcome."""
+    try:
+        llm_service = getattr(app.state, 'llm_service', None)
+        if not llm_service:
+            raise HTTPException(status_code=503, detail="LLM service not available")
+        labels = [label.strip() for label in group_by.split(",") if label.strip()]
+        try:
+            latency = llm_service.get_latency_report(labels, windowed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        metrics = llm_service.get_performance_metrics()
+        return {
+            "latency": latency,
+            "totals": {
+                "total_requests": metrics["total_requests"],
+                "successful_requests": metrics["successful_requests"],
+                "failed_requests": metrics["failed_requests"],
+                "success_rate": metrics["success_rate"]
+            },
+            "scheduler": metrics["scheduler"],
+            "timestamp": time.time()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting LLM performance: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get LLM performance: {str(e)}")
+
+@app.get("/api/health/llm")
+async def get_llm_health(tier: str = "probe", force: bool = False):
+    """
+    LLM provider health. tier=passive uses recent traffic only, probe (default)
+    adds list-models metadata calls, full runs a generation per provider.
+    """
+    try:
+        llm_service = getattr(app.state, 'llm_service', None)
+        if not llm_service:
+            raise HTTPException(status_code=503, detail="LLM service not available")
+        try:
+            providers = await llm_service.health_check(tier, force)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {
+            "tier": tier,
+            "providers": providers,
+            "timestamp": time.time()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error checking LLM health: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to check LLM health: {str(e)}")
+
+@app.get("/api/performance/llm/routing")
+async def get_llm_routing(policy: Optional[str] = None):
+    """Explain the current LLM provider ranking and the signals behind it."""
+    try:
+        llm_service = getattr(app.state, 'llm_service', None)
+        if not llm_service:
+            raise HTTPException(status_code=503, detail="LLM service not available")
+        return {
+            **llm_service.explain_routing(policy),
+            "timestamp": time.time()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error explaining LLM routing: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to explain LLM routing: {str(e)}")
+
 @app.post("/api/performance/cleanup")
 async def cleanup_performance_data(hours: int = 24):
     """Clean up old performance data."""
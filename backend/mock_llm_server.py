@@ -0,0 +1,375 @@
+"""
+Local deterministic stand-in for the OpenAI and Anthropic chat APIs.
+
+Lets LLMService run its real provider paths (rate limiter, fallback, circuit
+breakers, streaming) against a local server for load testing on a box with
+no network. Point the service at it with LLM_MOCK_SERVER_URL.
+
+Run with:
+    python -m backend.mock_llm_server --port 8001
+
+Behaviour is configured with MOCK_LLM_* environment variables (see
+MockServerConfig.from_env). Individual requests can override latency and force
+errors with the x-mock-latency-ms and x-mock-error headers. Prompt prefix
+caching is emulated: a repeated OpenAI system message, or an Anthropic system
+block marked with cache_control, is reported as cached input tokens. With
+MOCK_LLM_QUOTA_RPM set, responses carry the provider's rate limit headers.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+VOCABULARY = (
+    "the system agent requirement design service module interface data user workflow "
+    "test deploy build component api endpoint model state event queue cache latency "
+    "request response token provider client server session artifact plan review"
+).split()
+
+MODELS = ["gpt-3.5-turbo", "claude-3-haiku-20240307", "mock-model"]
+
+
+@dataclass
+class MockServerConfig:
+    """Latency, throughput and fault-injection settings for the mock server"""
+    latency_ms: float = 200.0
+    latency_distribution: str = "lognormal"  # fixed, uniform, normal, lognormal
+    latency_jitter_ms: float = 100.0
+    tokens_per_second: float = 200.0
+    output_tokens: int = 200
+    error_429_rate: float = 0.0
+    error_500_rate: float = 0.0
+    retry_after_seconds: float = 1.0
+    quota_requests_per_minute: int = 0  # 0 = no rate limit headers
+    seed: int = 42
+
+    @classmethod
+    def from_env(cls) -> "MockServerConfig":
+        return cls(
+            latency_ms=float(os.getenv("MOCK_LLM_LATENCY_MS", cls.latency_ms)),
+            latency_distribution=os.getenv("MOCK_LLM_LATENCY_DISTRIBUTION", cls.latency_distribution),
+            latency_jitter_ms=float(os.getenv("MOCK_LLM_LATENCY_JITTER_MS", cls.latency_jitter_ms)),
+            tokens_per_second=float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", cls.tokens_per_second)),
+            output_tokens=int(os.getenv("MOCK_LLM_OUTPUT_TOKENS", cls.output_tokens)),
+            error_429_rate=float(os.getenv("MOCK_LLM_ERROR_429_RATE", cls.error_429_rate)),
+            error_500_rate=float(os.getenv("MOCK_LLM_ERROR_500_RATE", cls.error_500_rate)),
+            retry_after_seconds=float(os.getenv("MOCK_LLM_RETRY_AFTER_SECONDS", cls.retry_after_seconds)),
+            quota_requests_per_minute=int(os.getenv("MOCK_LLM_QUOTA_RPM", cls.quota_requests_per_minute)),
+            seed=int(os.getenv("MOCK_LLM_SEED", cls.seed)),
+        )
+
+
+def deterministic_tokens(model: str, prompt: str, count: int) -> List[str]:
+    """Generate the same words for the same model and prompt on every run."""
+    digest = hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+    rng = random.Random(int(digest[:16], 16))
+    return [rng.choice(VOCABULARY) + " " for _ in range(count)]
+
+
+def _content_text(content) -> str:
+    """Flatten a message content field that may be a string or a list of blocks."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return ""
+
+
+def _prompt_text(body: dict) -> str:
+    parts = [_content_text(body.get("system", ""))]
+    parts.extend(_content_text(m.get("content", "")) for m in body.get("messages", []))
+    return "\n".join(p for p in parts if p)
+
+
+class MockLLMServer:
+    """Request handling shared by the OpenAI and Anthropic routes"""
+
+    def __init__(self, config: MockServerConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.stats = {"requests": 0, "streamed": 0, "errors_429": 0, "errors_500": 0, "cached_tokens": 0}
+        self._cached_prefixes = set()
+        self._quota_window = deque()
+
+    def sample_latency(self, request: Request) -> float:
+        """Time to first byte in seconds."""
+        override = request.headers.get("x-mock-latency-ms")
+        if override is not None:
+            return max(float(override), 0.0) / 1000
+
+        mean, jitter = self.config.latency_ms, self.config.latency_jitter_ms
+        distribution = self.config.latency_distribution
+        if distribution == "uniform":
+            value = self.rng.uniform(mean - jitter, mean + jitter)
+        elif distribution == "normal":
+            value = self.rng.gauss(mean, jitter)
+        elif distribution == "lognormal" and mean > 0:
+            # Parameterised so the median is latency_ms with a heavy right tail
+            sigma = jitter / mean if jitter > 0 else 0.0
+            value = mean * self.rng.lognormvariate(0.0, sigma)
+        else:
+            value = mean
+        return max(value, 0.0) / 1000
+
+    def injected_error(self, request: Request) -> Optional[int]:
+        forced = request.headers.get("x-mock-error")
+        if forced in ("429", "500"):
+            return int(forced)
+        roll = self.rng.random()
+        if roll < self.config.error_429_rate:
+            return 429
+        if roll < self.config.error_429_rate + self.config.error_500_rate:
+            return 500
+        return None
+
+    def output_for(self, body: dict, prompt: str) -> List[str]:
+        count = self.config.output_tokens
+        max_tokens = body.get("max_tokens")
+        if isinstance(max_tokens, int) and max_tokens > 0:
+            count = min(count, max_tokens)
+        return deterministic_tokens(body.get("model", "mock-model"), prompt, count)
+
+    def prefix_cache(self, provider: str, prefix: str) -> tuple:
+        """Return (cache_read, cache_write) tokens for a cacheable prompt prefix."""
+        if not prefix:
+            return 0, 0
+        tokens = max(len(prefix) // 4, 1)
+        # Each provider keeps its own cache
+        key = (provider, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        if key in self._cached_prefixes:
+            self.stats["cached_tokens"] += tokens
+            return tokens, 0
+        self._cached_prefixes.add(key)
+        return 0, tokens
+
+    def quota_headers(self, flavor: str) -> dict:
+        """Request quota headers in the provider's format, counting this request."""
+        limit = self.config.quota_requests_per_minute
+        if limit <= 0:
+            return {}
+        now = time.time()
+        window = self._quota_window
+        window.append(now)
+        while window and now - window[0] >= 60:
+            window.popleft()
+        remaining = max(limit - len(window), 0)
+        reset = window[0] + 60 - now
+        if flavor == "anthropic":
+            reset_at = datetime.fromtimestamp(window[0] + 60, timezone.utc).isoformat().replace("+00:00", "Z")
+            return {
+                "anthropic-ratelimit-requests-limit": str(limit),
+                "anthropic-ratelimit-requests-remaining": str(remaining),
+                "anthropic-ratelimit-requests-reset": reset_at
+            }
+        return {
+            "x-ratelimit-limit-requests": str(limit),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s"
+        }
+
+    async def pace(self, tokens: int):
+        if self.config.tokens_per_second > 0 and tokens:
+            await asyncio.sleep(tokens / self.config.tokens_per_second)
+
+
+def _openai_cacheable_prefix(body: dict) -> str:
+    messages = body.get("messages", [])
+    if messages and messages[0].get("role") == "system":
+        return _content_text(messages[0].get("content", ""))
+    return ""
+
+
+def _anthropic_cacheable_prefix(body: dict) -> str:
+    """System text up to and including the last block marked with cache_control."""
+    system = body.get("system")
+    if not isinstance(system, list):
+        return ""
+    marked = [i for i, block in enumerate(system) if isinstance(block, dict) and block.get("cache_control")]
+    return _content_text(system[:marked[-1] + 1]) if marked else ""
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def create_app(config: Optional[MockServerConfig] = None) -> FastAPI:
+    """Build the mock server application."""
+    server = MockLLMServer(config or MockServerConfig.from_env())
+    app = FastAPI(title="BotArmy Mock LLM Server")
+    app.state.server = server
+
+    def error_response(status: int, flavor: str) -> JSONResponse:
+        key = "errors_429" if status == 429 else "errors_500"
+        server.stats[key] += 1
+        message = "Rate limit exceeded (injected)" if status == 429 else "Internal server error (injected)"
+        headers = {"retry-after": str(server.config.retry_after_seconds)} if status == 429 else {}
+        if flavor == "anthropic":
+            error_type = "rate_limit_error" if status == 429 else "api_error"
+            content = {"type": "error", "error": {"type": error_type, "message": message}}
+        else:
+            error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+            content = {"error": {"message": message, "type": error_type, "code": error_type}}
+        return JSONResponse(status_code=status, content=content, headers=headers)
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": m, "object": "model", "type": "model"} for m in MODELS]}
+
+    @app.get("/stats")
+    async def stats():
+        return server.stats
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request, response: Response):
+        body = await request.json()
+        server.stats["requests"] += 1
+        await asyncio.sleep(server.sample_latency(request))
+
+        status = server.injected_error(request)
+        if status:
+            return error_response(status, "openai")
+
+        prompt = _prompt_text(body)
+        tokens = server.output_for(body, prompt)
+        finish_reason = "length" if len(tokens) < server.config.output_tokens else "stop"
+        prompt_tokens = max(len(prompt) // 4, 1)
+        cached_tokens, _ = server.prefix_cache("openai", _openai_cacheable_prefix(body))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+            "prompt_tokens_details": {"cached_tokens": min(cached_tokens, prompt_tokens)}
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model", "mock-model")
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        if body.get("stream"):
+            server.stats["streamed"] += 1
+
+            async def events() -> AsyncIterator[str]:
+                def chunk(delta: dict, finish_reason=None) -> str:
+                    return _sse({
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                    })
+                yield chunk({"role": "assistant", "content": ""})
+                for token in tokens:
+                    await server.pace(1)
+                    yield chunk({"content": token})
+                yield chunk({}, finish_reason)
+                if include_usage:
+                    yield _sse({
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                        "model": model, "choices": [], "usage": usage
+                    })
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream",
+                                     headers=server.quota_headers("openai"))
+
+        await server.pace(len(tokens))
+        response.headers.update(server.quota_headers("openai"))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                "finish_reason": finish_reason
+            }],
+            "usage": usage
+        }
+
+    @app.post("/v1/messages")
+    async def anthropic_messages(request: Request, response: Response):
+        body = await request.json()
+        server.stats["requests"] += 1
+        await asyncio.sleep(server.sample_latency(request))
+
+        status = server.injected_error(request)
+        if status:
+            return error_response(status, "anthropic")
+
+        prompt = _prompt_text(body)
+        tokens = server.output_for(body, prompt)
+        stop_reason = "max_tokens" if len(tokens) < server.config.output_tokens else "end_turn"
+        cache_read, cache_write = server.prefix_cache("anthropic", _anthropic_cacheable_prefix(body))
+        # Anthropic's input_tokens excludes tokens read from or written to the cache
+        input_tokens = max(len(prompt) // 4 - cache_read - cache_write, 1)
+        cache_usage = {"cache_read_input_tokens": cache_read, "cache_creation_input_tokens": cache_write}
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock-model")
+
+        if body.get("stream"):
+            server.stats["streamed"] += 1
+
+            async def events() -> AsyncIterator[str]:
+                yield _sse({"type": "message_start", "message": {
+                    "id": message_id, "type": "message", "role": "assistant", "model": model,
+                    "content": [], "stop_reason": None, "stop_sequence": None,
+                    "usage": {"input_tokens": input_tokens, "output_tokens": 1, **cache_usage}
+                }}, "message_start")
+                yield _sse({"type": "content_block_start", "index": 0,
+                            "content_block": {"type": "text", "text": ""}}, "content_block_start")
+                for token in tokens:
+                    await server.pace(1)
+                    yield _sse({"type": "content_block_delta", "index": 0,
+                                "delta": {"type": "text_delta", "text": token}}, "content_block_delta")
+                yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+                yield _sse({"type": "message_delta",
+                            "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                            "usage": {"output_tokens": len(tokens)}}, "message_delta")
+                yield _sse({"type": "message_stop"}, "message_stop")
+
+            return StreamingResponse(events(), media_type="text/event-stream",
+                                     headers=server.quota_headers("anthropic"))
+
+        await server.pace(len(tokens))
+        response.headers.update(server.quota_headers("anthropic"))
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": "".join(tokens).strip()}],
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": len(tokens), **cache_usage}
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock LLM provider server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
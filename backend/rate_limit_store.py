@@ -0,0 +1,594 @@
+"""
+Storage backends for RateLimiter request and token windows.
+
+The limiter's minute/hour accounting lives in a RateLimitStore so that
+several backend worker processes can share one provider quota:
+
+- memory: per-process (the default, one worker)
+- file: a memory-mapped file per provider, locked with fcntl.flock, for
+  several workers on one host
+- redis: per-second hashes plus running totals, updated by a Lua script
+  through the asyncio client, for workers on several hosts
+
+Every store admits a request atomically: the limit check and the recording
+of the request happen under one lock (or in one script), so two workers can
+never both take the last slot. RateLimiter admits through admit_async for
+every store; SyncRateLimitStore is the base for stores that admit without
+I/O on the event loop.
+
+Select with RATE_LIMIT_BACKEND (memory, file or redis), plus
+RATE_LIMIT_FILE_DIR or RATE_LIMIT_REDIS_URL.
+"""
+
+import asyncio
+import fcntl
+import logging
+import math
+import mmap
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60
+HOUR = 3600
+
+# (requests per minute, requests per hour, tokens per minute, tokens per hour)
+Limits = Tuple[int, int, int, int]
+# (requests last minute, requests last hour, tokens last minute, tokens last hour)
+Totals = Tuple[int, int, int, int]
+
+
+def admission_delay(totals: Totals, tokens: int, limits: Limits, now: float,
+                    release_time: Callable[[int, float, int, int], float]) -> float:
+    """
+    Seconds until a request of tokens fits the minute and hour limits, 0.0 if
+    it fits now, or math.inf if it can never fit. release_time(window, now,
+    requests_over, tokens_over) gives the time enough old requests expire.
+    """
+    minute_requests, hour_requests, minute_tokens, hour_tokens = totals
+    requests_per_minute, requests_per_hour, tokens_per_minute, tokens_per_hour = limits
+    delay = 0.0
+    for seconds, requests, request_limit, used_tokens, token_limit in (
+        (MINUTE, minute_requests, requests_per_minute, minute_tokens, tokens_per_minute),
+        (HOUR, hour_requests, requests_per_hour, hour_tokens, tokens_per_hour)
+    ):
+        if tokens > token_limit or request_limit <= 0:
+            return math.inf
+        requests_over = requests + 1 - request_limit
+        tokens_over = used_tokens + tokens - token_limit
+        if requests_over > 0 or tokens_over > 0:
+            delay = max(delay, release_time(seconds, now, requests_over, tokens_over) - now)
+    return delay
+
+
+class SlidingWindowCounter:
+    """
+    Request and token totals over the last minute and the last hour.
+
+    Admitted requests are added to per-second buckets held in fixed arrays
+    (one slot per second of the hour). Running minute and hour totals are
+    kept up to date as seconds fall out of each window, so reading them is
+    O(1) instead of a scan over every request in the last hour.
+
+    All state lives in one flat int64 buffer (a header followed by the
+    bucket arrays), so it can be backed by shared memory.
+    """
+
+    MINUTE = MINUTE
+    HOUR = HOUR
+
+    # Header slots
+    _MINUTE_START = 0  # oldest second still counted in the minute totals
+    _HOUR_START = 1    # oldest second still counted in the hour totals
+    _LATEST = 2
+    _MINUTE_REQUESTS = 3
+    _MINUTE_TOKENS = 4
+    _HOUR_REQUESTS = 5
+    _HOUR_TOKENS = 6
+    _HEADER = 8
+
+    # Bucket arrays follow the header
+    _STAMPS = _HEADER
+    _REQUESTS = _HEADER + HOUR
+    _TOKENS = _HEADER + 2 * HOUR
+    SIZE = _HEADER + 3 * HOUR
+
+    def __init__(self, buffer=None):
+        """buffer, if given, is a writable buffer of SIZE int64 values (e.g. an mmap)."""
+        if buffer is None:
+            self._state = array('q', [0]) * self.SIZE
+            self._state[self._STAMPS:self._REQUESTS] = array('q', [-1]) * self.HOUR
+        else:
+            self._state = memoryview(buffer).cast('q')
+
+    def _advance(self, now: float) -> int:
+        """Expire seconds that left the windows; returns the current second."""
+        state = self._state
+        second = max(int(now), state[self._LATEST])
+        state[self._LATEST] = second
+
+        for start_slot, requests_slot, tokens_slot, window in (
+            (self._MINUTE_START, self._MINUTE_REQUESTS, self._MINUTE_TOKENS, self.MINUTE),
+            (self._HOUR_START, self._HOUR_REQUESTS, self._HOUR_TOKENS, self.HOUR)
+        ):
+            floor = second - window + 1
+            start = state[start_slot]
+            if floor <= start:
+                continue
+            if floor - start >= window:
+                state[requests_slot] = state[tokens_slot] = 0
+            else:
+                for expired in range(start, floor):
+                    slot = expired % self.HOUR
+                    if state[self._STAMPS + slot] == expired:
+                        state[requests_slot] -= state[self._REQUESTS + slot]
+                        state[tokens_slot] -= state[self._TOKENS + slot]
+            state[start_slot] = floor
+        return second
+
+    def add(self, now: float, tokens: int, requests: int = 1):
+        state = self._state
+        second = self._advance(now)
+        slot = second % self.HOUR
+        if state[self._STAMPS + slot] != second:
+            state[self._STAMPS + slot] = second
+            state[self._REQUESTS + slot] = 0
+            state[self._TOKENS + slot] = 0
+        state[self._REQUESTS + slot] += requests
+        state[self._TOKENS + slot] += tokens
+        state[self._MINUTE_REQUESTS] += requests
+        state[self._MINUTE_TOKENS] += tokens
+        state[self._HOUR_REQUESTS] += requests
+        state[self._HOUR_TOKENS] += tokens
+
+    def adjust_tokens(self, timestamp: float, delta: int, now: float):
+        """Correct the tokens recorded for a request admitted at timestamp, if still in the window."""
+        state = self._state
+        self._advance(now)
+        second = int(timestamp)
+        slot = second % self.HOUR
+        if second < state[self._HOUR_START] or state[self._STAMPS + slot] != second:
+            return
+        state[self._TOKENS + slot] += delta
+        state[self._HOUR_TOKENS] += delta
+        if second >= state[self._MINUTE_START]:
+            state[self._MINUTE_TOKENS] += delta
+
+    def release_time(self, window_seconds: int, now: float, requests_over: int, tokens_over: int) -> float:
+        """
+        Earliest time at which enough of the oldest requests leave the window
+        (MINUTE or HOUR) to free requests_over requests and tokens_over tokens.
+        """
+        state = self._state
+        second = self._advance(now)
+        if requests_over <= 0 and tokens_over <= 0:
+            return now
+        start = state[self._MINUTE_START if window_seconds == self.MINUTE else self._HOUR_START]
+        freed_requests = freed_tokens = 0
+        for bucket in range(start, second + 1):
+            slot = bucket % self.HOUR
+            if state[self._STAMPS + slot] != bucket:
+                continue
+            freed_requests += state[self._REQUESTS + slot]
+            freed_tokens += state[self._TOKENS + slot]
+            if freed_requests >= requests_over and freed_tokens >= tokens_over:
+                # The bucket stops counting at the start of the second window_seconds later
+                return bucket + window_seconds
+        return math.inf
+
+    def totals(self, now: float) -> Totals:
+        """(requests last minute, requests last hour, tokens last minute, tokens last hour)"""
+        state = self._state
+        self._advance(now)
+        return (state[self._MINUTE_REQUESTS], state[self._HOUR_REQUESTS],
+                state[self._MINUTE_TOKENS], state[self._HOUR_TOKENS])
+
+    def admit(self, now: float, tokens: int, limits: Limits) -> Tuple[float, Totals]:
+        """Record the request if it fits; returns (delay, totals before the request)."""
+        totals = self.totals(now)
+        delay = admission_delay(totals, tokens, limits, now, self.release_time)
+        if delay == 0.0:
+            self.add(now, tokens)
+        return delay, totals
+
+
+class RateLimitStore(ABC):
+    """Shared minute/hour request and token accounting for RateLimiter"""
+
+    name = "base"
+
+    @abstractmethod
+    async def admit_async(self, provider: str, now: float, tokens: int, limits: Limits) -> Tuple[float, Totals]:
+        """
+        Atomically check the limits and record the request if it fits.
+        Returns (0.0, totals) when admitted, otherwise (seconds until it may
+        fit, totals); math.inf if it never can.
+        """
+
+    @abstractmethod
+    def adjust_tokens(self, provider: str, timestamp: float, delta: int, now: float):
+        """Correct the tokens recorded for the request made at timestamp by delta."""
+
+    @abstractmethod
+    def totals(self, provider: str, now: float) -> Totals:
+        """Requests and tokens in the last minute and hour."""
+
+
+class SyncRateLimitStore(RateLimitStore):
+    """A store whose admission is a quick local operation, callable from any thread"""
+
+    @abstractmethod
+    def admit(self, provider: str, now: float, tokens: int, limits: Limits) -> Tuple[float, Totals]:
+        """Synchronous admit_async."""
+
+    async def admit_async(self, provider, now, tokens, limits):
+        return self.admit(provider, now, tokens, limits)
+
+
+class MemoryRateLimitStore(SyncRateLimitStore):
+    """Per-process windows; each worker process has its own quota"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.windows: Dict[str, SlidingWindowCounter] = {}
+
+    def window(self, provider: str) -> SlidingWindowCounter:
+        window = self.windows.get(provider)
+        if window is None:
+            window = self.windows[provider] = SlidingWindowCounter()
+        return window
+
+    def admit(self, provider, now, tokens, limits):
+        return self.window(provider).admit(now, tokens, limits)
+
+    def adjust_tokens(self, provider, timestamp, delta, now):
+        self.window(provider).adjust_tokens(timestamp, delta, now)
+
+    def totals(self, provider, now):
+        return self.window(provider).totals(now)
+
+
+class FileLockRateLimitStore(SyncRateLimitStore):
+    """
+    Windows in a memory-mapped file per provider, shared by every process on
+    the host that uses the same directory. Each operation holds an exclusive
+    fcntl.flock on the file, so check-and-record is atomic across workers.
+    """
+
+    name = "file"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._windows: Dict[str, Tuple[int, mmap.mmap, SlidingWindowCounter]] = {}
+        self._lock = threading.Lock()
+
+    def _open(self, provider: str) -> Tuple[int, SlidingWindowCounter]:
+        entry = self._windows.get(provider)
+        if entry is None:
+            path = os.path.join(self.directory, f"{provider}.ratelimit")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            size = SlidingWindowCounter.SIZE * 8
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < size:
+                    # A zeroed file is a valid empty window
+                    os.ftruncate(fd, size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            mapped = mmap.mmap(fd, size)
+            entry = (fd, mapped, SlidingWindowCounter(mapped))
+            self._windows[provider] = entry
+        return entry[0], entry[2]
+
+    @contextmanager
+    def _locked(self, provider: str):
+        with self._lock:
+            fd, window = self._open(provider)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield window
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def admit(self, provider, now, tokens, limits):
+        with self._locked(provider) as window:
+            return window.admit(now, tokens, limits)
+
+    def adjust_tokens(self, provider, timestamp, delta, now):
+        with self._locked(provider) as window:
+            window.adjust_tokens(timestamp, delta, now)
+
+    def totals(self, provider, now):
+        with self._locked(provider) as window:
+            return window.totals(now)
+
+    def close(self):
+        with self._lock:
+            for fd, mapped, window in self._windows.values():
+                window._state.release()
+                mapped.close()
+                os.close(fd)
+            self._windows.clear()
+
+
+# Per-second request and token counts live in two hashes per provider, keyed
+# by epoch second, next to a third hash of running minute/hour totals kept up
+# to date like SlidingWindowCounter's header. One script run advances the
+# totals past expired seconds, checks and records; only a rejected request
+# reads the buckets back to find when capacity frees up.
+_REDIS_SCRIPT = """
+local mode = ARGV[1]
+local now = tonumber(ARGV[2])
+
+local state = redis.call('HMGET', KEYS[3], 'minute_start', 'hour_start', 'latest',
+    'minute_requests', 'minute_tokens', 'hour_requests', 'hour_tokens')
+local minute_start = tonumber(state[1] or '0')
+local hour_start = tonumber(state[2] or '0')
+local second = math.max(math.floor(now), tonumber(state[3] or '0'))
+local minute_requests = tonumber(state[4] or '0')
+local minute_tokens = tonumber(state[5] or '0')
+local hour_requests = tonumber(state[6] or '0')
+local hour_tokens = tonumber(state[7] or '0')
+
+-- Expire the minute before the hour, whose pruning deletes the buckets
+local floor = second - 59
+if floor > minute_start then
+    if floor - minute_start >= 60 then
+        minute_requests, minute_tokens = 0, 0
+    else
+        for expired = minute_start, floor - 1 do
+            minute_requests = minute_requests - tonumber(redis.call('HGET', KEYS[1], expired) or '0')
+            minute_tokens = minute_tokens - tonumber(redis.call('HGET', KEYS[2], expired) or '0')
+        end
+    end
+    minute_start = floor
+end
+
+floor = second - 3599
+if floor > hour_start then
+    if floor - hour_start >= 3600 then
+        hour_requests, hour_tokens = 0, 0
+        redis.call('DEL', KEYS[1], KEYS[2])
+    else
+        for expired = hour_start, floor - 1 do
+            local requests = redis.call('HGET', KEYS[1], expired)
+            if requests then
+                hour_requests = hour_requests - tonumber(requests)
+                hour_tokens = hour_tokens - tonumber(redis.call('HGET', KEYS[2], expired) or '0')
+                redis.call('HDEL', KEYS[1], expired)
+                redis.call('HDEL', KEYS[2], expired)
+            end
+        end
+    end
+    hour_start = floor
+end
+
+local function save()
+    redis.call('HSET', KEYS[3], 'minute_start', minute_start, 'hour_start', hour_start, 'latest', second,
+        'minute_requests', minute_requests, 'minute_tokens', minute_tokens,
+        'hour_requests', hour_requests, 'hour_tokens', hour_tokens)
+    for _, key in ipairs(KEYS) do
+        redis.call('EXPIRE', key, 3660)
+    end
+end
+
+local function reply(delay)
+    return {delay, tostring(minute_requests), tostring(hour_requests), tostring(minute_tokens), tostring(hour_tokens)}
+end
+
+if mode == 'adjust' then
+    local bucket = tonumber(ARGV[3])
+    local delta = tonumber(ARGV[4])
+    if bucket >= hour_start and redis.call('HEXISTS', KEYS[1], bucket) == 1 then
+        redis.call('HINCRBY', KEYS[2], bucket, delta)
+        hour_tokens = hour_tokens + delta
+        if bucket >= minute_start then
+            minute_tokens = minute_tokens + delta
+        end
+    end
+    save()
+    return reply('0')
+end
+
+if mode == 'totals' then
+    save()
+    return reply('0')
+end
+
+-- Earliest time enough of the oldest requests leave the window to make room
+local function release_time(window, requests_over, tokens_over)
+    local buckets = {}
+    if window == 60 then
+        for bucket = minute_start, second do
+            table.insert(buckets, bucket)
+        end
+    else
+        local fields = redis.call('HKEYS', KEYS[1])
+        for _, field in ipairs(fields) do
+            table.insert(buckets, tonumber(field))
+        end
+        table.sort(buckets)
+    end
+    local freed_requests, freed_tokens = 0, 0
+    for _, bucket in ipairs(buckets) do
+        local requests = redis.call('HGET', KEYS[1], bucket)
+        if requests then
+            freed_requests = freed_requests + tonumber(requests)
+            freed_tokens = freed_tokens + tonumber(redis.call('HGET', KEYS[2], bucket) or '0')
+            if freed_requests >= requests_over and freed_tokens >= tokens_over then
+                return bucket + window
+            end
+        end
+    end
+    return nil
+end
+
+local estimate = tonumber(ARGV[3])
+local limits = {
+    {60, minute_requests, tonumber(ARGV[4]), minute_tokens, tonumber(ARGV[6])},
+    {3600, hour_requests, tonumber(ARGV[5]), hour_tokens, tonumber(ARGV[7])}
+}
+local delay = 0
+for _, limit in ipairs(limits) do
+    local window, used_requests, request_limit, used_tokens, token_limit = limit[1], limit[2], limit[3], limit[4], limit[5]
+    if estimate > token_limit or request_limit <= 0 then
+        save()
+        return reply('inf')
+    end
+    local requests_over = used_requests + 1 - request_limit
+    local tokens_over = used_tokens + estimate - token_limit
+    if requests_over > 0 or tokens_over > 0 then
+        local release = release_time(window, requests_over, tokens_over)
+        if release == nil then
+            save()
+            return reply('inf')
+        end
+        delay = math.max(delay, release - now)
+    end
+end
+
+local result = reply(tostring(delay))
+if delay <= 0 then
+    result[1] = '0'
+    redis.call('HINCRBY', KEYS[1], second, 1)
+    redis.call('HINCRBY', KEYS[2], second, estimate)
+    minute_requests = minute_requests + 1
+    hour_requests = hour_requests + 1
+    minute_tokens = minute_tokens + estimate
+    hour_tokens = hour_tokens + estimate
+end
+save()
+return result
+"""
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    Windows in Redis, shared by workers on any host. A single Lua script
+    advances the running totals, checks and records, so admission is atomic
+    on the server and does not grow with the number of requests in the hour.
+
+    Takes a redis.asyncio client so the limiter never blocks the event loop
+    on a round trip. The synchronous totals() behind status reports returns
+    the totals seen on the last round trip and refreshes them in the
+    background. While Redis is unreachable the store falls back to
+    per-process windows, retrying Redis every retry_seconds.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "botarmy:ratelimit", retry_seconds: float = 30.0):
+        self.client = client
+        self.prefix = prefix
+        self.retry_seconds = retry_seconds
+        self._script = client.register_script(_REDIS_SCRIPT)
+        self._fallback = MemoryRateLimitStore()
+        self._down_until = 0.0
+        self._snapshots: Dict[str, Tuple[float, Totals]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._background = set()
+        try:
+            from redis.exceptions import RedisError
+            self._errors = (RedisError, OSError)
+        except ImportError:
+            self._errors = (OSError,)
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "botarmy:ratelimit") -> "RedisRateLimitStore":
+        import redis.asyncio
+        # Short timeouts so an unreachable server trips the fallback instead of stalling admissions
+        return cls(redis.asyncio.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0), prefix)
+
+    def _keys(self, provider: str):
+        # The hash tag keeps a provider's keys in one cluster slot, as the script needs
+        return [f"{self.prefix}:{{{provider}}}:{kind}" for kind in ("requests", "tokens", "totals")]
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    async def _run(self, provider: str, *args) -> Optional[Tuple[float, Totals]]:
+        """Run the script, or return None while Redis is unreachable."""
+        if not self.available:
+            return None
+        try:
+            reply = await self._script(keys=self._keys(provider), args=list(args))
+        except self._errors as e:
+            self._down_until = time.monotonic() + self.retry_seconds
+            logger.error(f"Redis rate limit store unreachable, using per-process windows for {self.retry_seconds:.0f}s: {e}")
+            return None
+        result = [value.decode() if isinstance(value, bytes) else str(value) for value in reply]
+        delay = math.inf if result[0] == 'inf' else float(result[0])
+        totals = tuple(int(float(value)) for value in result[1:5])
+        self._snapshots[provider] = (time.monotonic(), totals)
+        return delay, totals
+
+    async def admit_async(self, provider, now, tokens, limits):
+        result = await self._run(provider, 'admit', repr(now), tokens, *limits)
+        if result is None:
+            return self._fallback.admit(provider, now, tokens, limits)
+        return result
+
+    async def adjust_tokens_async(self, provider: str, timestamp: float, delta: int, now: float):
+        if await self._run(provider, 'adjust', repr(now), int(timestamp), delta) is None:
+            self._fallback.adjust_tokens(provider, timestamp, delta, now)
+
+    async def totals_async(self, provider: str, now: float) -> Totals:
+        result = await self._run(provider, 'totals', repr(now))
+        return self._fallback.totals(provider, now) if result is None else result[1]
+
+    def adjust_tokens(self, provider, timestamp, delta, now):
+        # Reconciling usage needs no reply, so it runs in the background
+        self._spawn(self.adjust_tokens_async(provider, timestamp, delta, now))
+
+    def totals(self, provider, now):
+        if not self.available:
+            return self._fallback.totals(provider, now)
+        refreshed_at, totals = self._snapshots.get(provider, (None, (0, 0, 0, 0)))
+        if refreshed_at is None or time.monotonic() - refreshed_at > 1.0:
+            task = self._tasks.get(provider)
+            if task is None or task.done() or task.get_loop().is_closed():
+                self._tasks[provider] = self._spawn(self.totals_async(provider, now))
+        return totals
+
+    def _spawn(self, coro) -> Optional[asyncio.Task]:
+        try:
+            task = asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+            logger.debug("No running event loop, skipped Redis rate limit update")
+            return None
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+
+def create_rate_limit_store(backend: Optional[str] = None) -> RateLimitStore:
+    """Build the store selected by RATE_LIMIT_BACKEND, falling back to memory."""
+    from backend.dynamic_config import get_dynamic_config
+    config = get_dynamic_config()
+    backend = (backend or config.get("RATE_LIMIT_BACKEND", "memory")).lower()
+
+    try:
+        if backend == "file":
+            directory = config.get("RATE_LIMIT_FILE_DIR", "") or os.path.join(
+                os.getenv("TMPDIR", "/tmp"), "botarmy-ratelimit"
+            )
+            return FileLockRateLimitStore(directory)
+        if backend == "redis":
+            return RedisRateLimitStore.from_url(config.get("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"))
+    except Exception as e:
+        logger.error(f"Could not create {backend} rate limit store, using in-process memory: {e}")
+        return MemoryRateLimitStore()
+
+    if backend != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{backend}', using in-process memory")
+    return MemoryRateLimitStore()
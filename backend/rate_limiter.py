@@ -4,14 +4,25 @@ Supports multiple providers with different limits.
 """
 
 import asyncio
+import math
+import re
 import time
 import logging
-from typing import Dict, Optional, Callable, Any
-from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Callable, Any, Mapping, Tuple
+from dataclasses import dataclass, field, replace
 from collections import defaultdict, deque
 
+from backend.rate_limit_store import RateLimitStore, SlidingWindowCounter, create_rate_limit_store
+
 logger = logging.getLogger(__name__)
 
+
+class RateLimitTimeout(Exception):
+    """Raised when a call could not get rate limit budget within its max wait."""
+
+
 @dataclass
 class RateLimitConfig:
     """Configuration for rate limiting"""
@@ -26,7 +37,75 @@ class RequestRecord:
     """Record of a single API request"""
     timestamp: float
     tokens: int = 0
-    
+
+
+# Provider quota headers: OpenAI (x-ratelimit-*) and Anthropic (anthropic-ratelimit-*)
+QUOTA_HEADERS = {
+    'requests_limit': ('x-ratelimit-limit-requests', 'anthropic-ratelimit-requests-limit'),
+    'requests_remaining': ('x-ratelimit-remaining-requests', 'anthropic-ratelimit-requests-remaining'),
+    'requests_reset': ('x-ratelimit-reset-requests', 'anthropic-ratelimit-requests-reset'),
+    'tokens_limit': ('x-ratelimit-limit-tokens', 'anthropic-ratelimit-tokens-limit'),
+    'tokens_remaining': ('x-ratelimit-remaining-tokens', 'anthropic-ratelimit-tokens-remaining'),
+    'tokens_reset': ('x-ratelimit-reset-tokens', 'anthropic-ratelimit-tokens-reset'),
+}
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+def _seconds_until(value: str, now: float) -> Optional[float]:
+    """
+    Parse a reset or retry-after value: seconds ("20"), a duration ("6m0s",
+    "250ms"), an RFC 3339 timestamp or an HTTP date. Returns seconds from now.
+    """
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and ''.join(number + unit for number, unit in parts) == value:
+        scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+        return sum(float(number) * scale[unit] for number, unit in parts)
+    for parse in (lambda v: datetime.fromisoformat(v.replace('Z', '+00:00')), parsedate_to_datetime):
+        try:
+            return max(parse(value).timestamp() - now, 0.0)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _header_number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_quota_headers(headers: Mapping[str, str], now: float = None) -> Dict[str, float]:
+    """
+    Extract limits, remaining quota, reset delays and retry-after (all in
+    seconds from now) from a provider response's headers.
+    """
+    now = time.time() if now is None else now
+    headers = {name.lower(): value for name, value in headers.items()}
+    quota = {}
+    for key, names in QUOTA_HEADERS.items():
+        value = next((headers[name] for name in names if name in headers), None)
+        if value is None:
+            continue
+        parsed = _seconds_until(value, now) if key.endswith('_reset') else _header_number(value)
+        if parsed is not None:
+            quota[key] = parsed
+
+    if 'retry-after-ms' in headers and _header_number(headers['retry-after-ms']) is not None:
+        quota['retry_after'] = _header_number(headers['retry-after-ms']) / 1000
+    elif 'retry-after' in headers:
+        retry_after = _seconds_until(headers['retry-after'], now)
+        if retry_after is not None:
+            quota['retry_after'] = retry_after
+    return quota
+
+
 class TokenBucket:
     """Token bucket algorithm for rate limiting"""
     
@@ -45,6 +124,15 @@ class TokenBucket:
             return True
         return False
     
+    def time_until_available(self, tokens: int = 1) -> float:
+        """Seconds until consume(tokens) would succeed, 0.0 if it would now."""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        if self.refill_rate <= 0:
+            return math.inf
+        return (tokens - self.tokens) / self.refill_rate
+    
     def _refill(self):
         """Refill tokens based on time elapsed"""
         now = time.time()
@@ -52,13 +140,37 @@ class TokenBucket:
         self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
         self.last_refill = now
 
+class _RateLimitWaiter:
+    __slots__ = ('tokens', 'future', 'enqueued_at')
+
+    def __init__(self, tokens: int, future: asyncio.Future):
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+def _new_wait_stats() -> Dict[str, Any]:
+    return {
+        'immediate': 0,
+        'admitted': 0,
+        'timed_out': 0,
+        'total_wait_time': 0.0,
+        'max_wait_time': 0.0,
+        'max_waiters': 0
+    }
+
+
 class RateLimiter:
     """
     Advanced rate limiter for LLM APIs with provider-specific limits.
     Tracks requests per minute/hour and token usage.
+
+    Minute/hour windows live in a RateLimitStore, which can be shared by
+    several worker processes (see backend.rate_limit_store). The burst
+    bucket and the waiter queue stay per-process.
     """
     
-    def __init__(self):
+    def __init__(self, store: Optional[RateLimitStore] = None):
         self.configs: Dict[str, RateLimitConfig] = {
             'openai': RateLimitConfig(
                 requests_per_minute=60,
@@ -83,8 +195,20 @@ class RateLimiter:
             )
         }
         
-        # Request tracking
-        self.request_history: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+        # Request tracking: rolling minute/hour totals plus each provider's latest admitted request
+        self._store = store
+        self._last_records: Dict[str, RequestRecord] = {}
+
+        # FIFO queues of callers in wait_if_needed, the pending wakeup and the task admitting them per provider
+        self._waiters: Dict[str, deque] = defaultdict(deque)
+        self._wakeups: Dict[str, asyncio.TimerHandle] = {}
+        self._drains: Dict[str, asyncio.Task] = {}
+        self._wait_stats: Dict[str, Dict[str, Any]] = defaultdict(_new_wait_stats)
+
+        # Provider-reported quota: pauses from retry-after/exhausted quota, and the last headers seen
+        self._paused_until: Dict[str, float] = {}
+        self._quota: Dict[str, Dict[str, float]] = {}
+
         self.token_buckets: Dict[str, TokenBucket] = {}
         
         # Initialize token buckets
@@ -103,6 +227,19 @@ class RateLimiter:
         )
         logger.info(f"Updated rate limit config for {provider}")
     
+    @property
+    def store(self) -> RateLimitStore:
+        """Window store, created from RATE_LIMIT_BACKEND on first use"""
+        if self._store is None:
+            self._store = create_rate_limit_store()
+            logger.info(f"Rate limit windows stored in {self._store.name} backend")
+        return self._store
+
+    def _limits(self, provider: str):
+        config = self.configs[provider]
+        return (config.requests_per_minute, config.requests_per_hour,
+                config.tokens_per_minute, config.tokens_per_hour)
+
     async def acquire(self, provider: str, estimated_tokens: int = 1000) -> bool:
         """
         Try to acquire permission to make a request.
@@ -111,80 +248,223 @@ class RateLimiter:
         if provider not in self.configs:
             logger.warning(f"No rate limit config for provider {provider}, allowing request")
             return True
-        
-        config = self.configs[provider]
-        now = time.time()
-        
-        # Check token bucket (burst protection)
-        if not self.token_buckets[provider].consume(1):
+        delay, _ = await self._try_acquire(provider, estimated_tokens, time.time())
+        return delay == 0.0
+
+    async def _try_acquire(self, provider: str, estimated_tokens: int, now: float) -> Tuple[float, Optional[RequestRecord]]:
+        """
+        Record the request and return (0.0, its record) if it fits,
+        otherwise (the delay until it may, None).
+        """
+        paused = self._paused_until.get(provider, 0.0) - now
+        if paused > 0:
+            return paused, None
+
+        # Check token bucket (burst protection) before claiming a slot in the shared windows
+        bucket = self.token_buckets[provider]
+        burst_delay = bucket.time_until_available(1)
+        if burst_delay > 0:
             logger.warning(f"Rate limited by burst protection for {provider}")
-            return False
-        
-        # Check request rate limits
-        history = self.request_history[provider]
-        
-        # Remove old requests (older than 1 hour)
-        while history and now - history[0].timestamp > 3600:
-            history.popleft()
-        
-        # Count requests in the last minute and hour
-        recent_requests = sum(1 for req in history if now - req.timestamp <= 60)
-        hourly_requests = len(history)
-        
-        # Count tokens in the last minute and hour
-        recent_tokens = sum(req.tokens for req in history if now - req.timestamp <= 60)
-        hourly_tokens = sum(req.tokens for req in history)
-        
-        # Check limits
-        if recent_requests >= config.requests_per_minute:
-            logger.warning(f"Rate limited: {recent_requests} requests in last minute for {provider}")
-            return False
-        
-        if hourly_requests >= config.requests_per_hour:
-            logger.warning(f"Rate limited: {hourly_requests} requests in last hour for {provider}")
-            return False
-        
-        if recent_tokens + estimated_tokens > config.tokens_per_minute:
-            logger.warning(f"Rate limited: {recent_tokens + estimated_tokens} tokens would exceed minute limit for {provider}")
-            return False
-        
-        if hourly_tokens + estimated_tokens > config.tokens_per_hour:
-            logger.warning(f"Rate limited: {hourly_tokens + estimated_tokens} tokens would exceed hour limit for {provider}")
-            return False
-        
-        # Record the request
-        history.append(RequestRecord(timestamp=now, tokens=estimated_tokens))
-        
-        logger.debug(f"Rate limit check passed for {provider}: {recent_requests}/min, {hourly_requests}/hour, {recent_tokens} tokens/min")
-        return True
-    
+            return burst_delay, None
+
+        # Check the limits and record the request in one atomic store operation
+        config = self.configs[provider]
+        delay, totals = await self.store.admit_async(provider, now, estimated_tokens, self._limits(provider))
+        if delay > 0:
+            recent_requests, hourly_requests, recent_tokens, hourly_tokens = totals
+            if recent_requests >= config.requests_per_minute:
+                logger.warning(f"Rate limited: {recent_requests} requests in last minute for {provider}")
+            if hourly_requests >= config.requests_per_hour:
+                logger.warning(f"Rate limited: {hourly_requests} requests in last hour for {provider}")
+            if recent_tokens + estimated_tokens > config.tokens_per_minute:
+                logger.warning(f"Rate limited: {recent_tokens + estimated_tokens} tokens would exceed minute limit for {provider}")
+            if hourly_tokens + estimated_tokens > config.tokens_per_hour:
+                logger.warning(f"Rate limited: {hourly_tokens + estimated_tokens} tokens would exceed hour limit for {provider}")
+            return delay, None
+
+        bucket.consume(1)
+        record = RequestRecord(timestamp=now, tokens=estimated_tokens)
+        self._last_records[provider] = record
+        logger.debug(f"Rate limit check passed for {provider}")
+        return 0.0, record
+
     async def wait_if_needed(self, provider: str, estimated_tokens: int = 1000, max_wait: float = 60.0) -> bool:
         """
         Wait until a request can be made, up to max_wait seconds.
         Returns True if permission acquired, False if timed out.
         """
-        start_time = time.time()
-        wait_time = 1.0  # Start with 1 second wait
-        
-        while time.time() - start_time < max_wait:
-            if await self.acquire(provider, estimated_tokens):
-                return True
-            
-            logger.info(f"Rate limited for {provider}, waiting {wait_time:.1f}s...")
-            await asyncio.sleep(wait_time)
-            
-            # Exponential backoff, but cap at 10 seconds
-            wait_time = min(wait_time * 1.5, 10.0)
-        
-        logger.error(f"Rate limit timeout for {provider} after {max_wait}s")
-        return False
-    
-    def update_actual_usage(self, provider: str, actual_tokens: int):
-        """Update the last request record with actual token usage"""
-        if provider in self.request_history and self.request_history[provider]:
-            # Update the most recent request
-            last_request = self.request_history[provider][-1]
-            last_request.tokens = actual_tokens
+        return await self.reserve(provider, estimated_tokens, max_wait) is not None
+
+    async def reserve(self, provider: str, estimated_tokens: int = 1000, max_wait: float = 60.0) -> Optional[RequestRecord]:
+        """
+        Wait until a request can be made, up to max_wait seconds.
+        Returns the admitted request's record, to pass to update_actual_usage,
+        or None if timed out.
+
+        Waiters are admitted in FIFO order per provider. The head waiter is
+        woken at the moment the limiter computes that capacity frees up,
+        rather than polling with backoff.
+        """
+        if provider not in self.configs:
+            # Not tracked by any window, the record only carries the estimate
+            return RequestRecord(timestamp=time.time(), tokens=estimated_tokens)
+
+        queue = self._waiters[provider]
+        stats = self._wait_stats[provider]
+        if not queue:
+            delay, record = await self._try_acquire(provider, estimated_tokens, time.time())
+            if delay == 0.0:
+                stats['immediate'] += 1
+                return record
+
+        loop = asyncio.get_running_loop()
+        waiter = _RateLimitWaiter(estimated_tokens, loop.create_future())
+        queue.append(waiter)
+        stats['max_waiters'] = max(stats['max_waiters'], len(queue))
+        deadline = loop.call_later(max(max_wait, 0.0), self._expire_waiter, provider, waiter)
+        self._wake(provider)
+
+        try:
+            record = await waiter.future
+        except asyncio.CancelledError:
+            self._remove_waiter(provider, waiter)
+            raise
+        finally:
+            deadline.cancel()
+
+        waited = time.monotonic() - waiter.enqueued_at
+        stats['total_wait_time'] += waited
+        stats['max_wait_time'] = max(stats['max_wait_time'], waited)
+        if record is not None:
+            stats['admitted'] += 1
+        else:
+            stats['timed_out'] += 1
+            logger.error(f"Rate limit timeout for {provider} after {max_wait}s")
+        return record
+
+    def _wake(self, provider: str):
+        """Start admitting waiters for provider, unless that is already under way."""
+        handle = self._wakeups.pop(provider, None)
+        if handle:
+            handle.cancel()
+
+        drain = self._drains.get(provider)
+        if drain is not None and not drain.done() and not drain.get_loop().is_closed():
+            return
+        self._drains[provider] = asyncio.get_running_loop().create_task(self._drain(provider))
+
+    async def _drain(self, provider: str):
+        """Admit waiters from the head of the queue and schedule a wakeup for the next one."""
+        queue = self._waiters[provider]
+        while queue:
+            waiter = queue[0]
+            if waiter.future.done() or waiter.future.get_loop().is_closed():
+                queue.popleft()
+                continue
+            try:
+                delay, record = await self._try_acquire(provider, waiter.tokens, time.time())
+            except Exception as e:
+                # Fail the waiter now rather than leave it hanging until its deadline
+                logger.error(f"Rate limit store failed for {provider}: {e}")
+                if queue and queue[0] is waiter:
+                    queue.popleft()
+                if not waiter.future.done():
+                    waiter.future.set_exception(e)
+                continue
+            if waiter.future.done():
+                # Timed out or cancelled while the store answered
+                if queue and queue[0] is waiter:
+                    queue.popleft()
+                continue
+            if delay == 0.0:
+                # The waiter resumes later, so it gets its own record rather than last_record
+                queue.popleft()
+                waiter.future.set_result(record)
+                continue
+            if delay == math.inf:
+                # Larger than the limit itself; waiting would only block the queue
+                queue.popleft()
+                waiter.future.set_result(None)
+                continue
+            logger.info(f"Rate limited for {provider}, next slot in {delay:.2f}s ({len(queue)} waiting)")
+            self._wakeups[provider] = asyncio.get_running_loop().call_later(delay, self._wake, provider)
+            return
+
+    def _expire_waiter(self, provider: str, waiter: "_RateLimitWaiter"):
+        if not waiter.future.done():
+            waiter.future.set_result(None)
+        self._remove_waiter(provider, waiter)
+
+    def _remove_waiter(self, provider: str, waiter: "_RateLimitWaiter"):
+        queue = self._waiters[provider]
+        was_head = bool(queue) and queue[0] is waiter
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if was_head:
+            self._wake(provider)
+
+    def pause(self, provider: str, seconds: float, reason: str = "retry-after"):
+        """Admit no requests for provider for the next seconds (extends, never shortens, a pause)."""
+        until = time.time() + seconds
+        if seconds <= 0 or until <= self._paused_until.get(provider, 0.0):
+            return
+        self._paused_until[provider] = until
+        logger.warning(f"Pausing {provider} for {seconds:.2f}s ({reason})")
+
+    def sync_quota(self, provider: str, headers: Mapping[str, str]):
+        """
+        Apply a provider response's quota headers: per-minute limits replace
+        the configured ones, and retry-after or an exhausted quota pauses the
+        provider until it resets. Hour limits are left as configured.
+        """
+        config = self.configs.get(provider)
+        quota = parse_quota_headers(headers)
+        if config is None or not quota:
+            return
+        self._quota[provider] = {**quota, 'synced_at': time.time()}
+
+        requests_limit = int(quota.get('requests_limit', 0))
+        tokens_limit = int(quota.get('tokens_limit', 0))
+        updates = {}
+        if requests_limit > 0 and requests_limit != config.requests_per_minute:
+            updates['requests_per_minute'] = requests_limit
+        if tokens_limit > 0 and tokens_limit != config.tokens_per_minute:
+            updates['tokens_per_minute'] = tokens_limit
+        if updates:
+            self.configs[provider] = replace(config, **updates)
+            if 'requests_per_minute' in updates:
+                self.token_buckets[provider].refill_rate = requests_limit / 60.0
+            logger.info(f"Synced {provider} rate limits from provider headers: {updates}")
+
+        if 'retry_after' in quota:
+            self.pause(provider, quota['retry_after'])
+        for kind in ('requests', 'tokens'):
+            if quota.get(f'{kind}_remaining') == 0 and f'{kind}_reset' in quota:
+                self.pause(provider, quota[f'{kind}_reset'], f"{kind} quota exhausted")
+
+    def last_record(self, provider: str) -> Optional[RequestRecord]:
+        """
+        Get the most recently admitted request record for a provider.
+        Concurrent callers may have been admitted since; use the record
+        returned by reserve to reconcile a specific request.
+        """
+        return self._last_records.get(provider)
+
+    def update_actual_usage(self, provider: str, actual_tokens: int, record: Optional[RequestRecord] = None):
+        """
+        Update a request record with actual token usage.
+        Pass the record returned by reserve; without it the most recent
+        request is updated, which may belong to a concurrent caller.
+        """
+        if provider not in self.configs:
+            return
+        if record is None:
+            record = self.last_record(provider)
+        if record is not None:
+            self.store.adjust_tokens(provider, record.timestamp, actual_tokens - record.tokens, time.time())
+            record.tokens = actual_tokens
             logger.debug(f"Updated actual token usage for {provider}: {actual_tokens}")
     
     def get_status(self, provider: str) -> Dict[str, Any]:
@@ -193,13 +473,8 @@ class RateLimiter:
             return {"error": f"No config for provider {provider}"}
         
         config = self.configs[provider]
-        history = self.request_history[provider]
         now = time.time()
-        
-        recent_requests = sum(1 for req in history if now - req.timestamp <= 60)
-        hourly_requests = len(history)
-        recent_tokens = sum(req.tokens for req in history if now - req.timestamp <= 60)
-        hourly_tokens = sum(req.tokens for req in history)
+        recent_requests, hourly_requests, recent_tokens, hourly_tokens = self.store.totals(provider, now)
         
         return {
             "provider": provider,
@@ -208,7 +483,23 @@ class RateLimiter:
             "tokens_per_minute": f"{recent_tokens}/{config.tokens_per_minute}",
             "tokens_per_hour": f"{hourly_tokens}/{config.tokens_per_hour}",
             "burst_tokens_available": self.token_buckets[provider].tokens,
-            "next_refill_in": 60 - (now % 60)  # Rough estimate
+            "next_refill_in": 60 - (now % 60),  # Rough estimate
+            "paused_for": max(self._paused_until.get(provider, 0.0) - now, 0.0),
+            "provider_quota": self._quota.get(provider),
+            "waiters": self.get_wait_stats(provider)
+        }
+
+    def get_wait_stats(self, provider: str) -> Dict[str, Any]:
+        """Queue length and wait times of callers in wait_if_needed for a provider"""
+        stats = self._wait_stats[provider]
+        queue = self._waiters.get(provider) or ()
+        waited = stats['admitted'] + stats['timed_out']
+        now = time.monotonic()
+        return {
+            **stats,
+            'waiting': len(queue),
+            'oldest_wait': max((now - waiter.enqueued_at for waiter in queue), default=0.0),
+            'average_wait_time': stats['total_wait_time'] / waited if waited else 0.0
         }
     
     def get_all_status(self) -> Dict[str, Dict[str, Any]]:
@@ -219,19 +510,26 @@ class RateLimiter:
 rate_limiter = RateLimiter()
 
 # Decorator for automatic rate limiting
-def rate_limited(provider: str, estimated_tokens: int = 1000):
-    """Decorator to automatically rate limit function calls"""
+def rate_limited(provider: str, estimated_tokens: int = 1000, estimator: Optional[Callable[..., int]] = None):
+    """
+    Decorator to automatically rate limit function calls.
+    If estimator is given it is called with the wrapped function's arguments
+    to size the token reservation instead of using estimated_tokens.
+    """
     def decorator(func: Callable) -> Callable:
         async def wrapper(*args, **kwargs):
-            if not await rate_limiter.wait_if_needed(provider, estimated_tokens):
-                raise Exception(f"Rate limit exceeded for {provider}")
+            tokens = estimator(*args, **kwargs) if estimator else estimated_tokens
+            record = await rate_limiter.reserve(provider, tokens)
+            if record is None:
+                raise RateLimitTimeout(f"Rate limit exceeded for {provider}")
             
             try:
                 result = await func(*args, **kwargs)
                 # If the function returns token usage info, update it
                 if isinstance(result, dict) and 'usage' in result:
-                    actual_tokens = result['usage'].get('total_tokens', estimated_tokens)
-                    rate_limiter.update_actual_usage(provider, actual_tokens)
+                    actual_tokens = result['usage'].get('total_tokens')
+                    if isinstance(actual_tokens, int) and not isinstance(actual_tokens, bool) and actual_tokens > 0:
+                        rate_limiter.update_actual_usage(provider, actual_tokens, record)
                 return result
             except Exception as e:
                 logger.error(f"Error in rate limited function: {e}")
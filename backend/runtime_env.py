@@ -5,8 +5,15 @@ This allows the same codebase to work in both development and Replit environment
 
 import os
 import sys
+import asyncio
+import functools
+import importlib
+import importlib.util
 import logging
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Callable, Dict, Optional
+
+from backend.startup_timing import startup_timer
 
 logger = logging.getLogger(__name__)
 
@@ -54,25 +61,102 @@ class MockPrefect:
     def get_run_logger():
         return logging.getLogger("mock_prefect")
 
+_controlflow = None
+_prefect = None
+
 def get_controlflow():
-    """Get ControlFlow module or mock for fallback."""
-    try:
-        import controlflow as cf
-        logger.info("ControlFlow successfully imported")
-        return cf
-    except ImportError as e:
-        logger.warning(f"ControlFlow not available: {e}, using mock")
-        return MockControlFlow()
+    """Get ControlFlow module or mock for fallback. Imported once, on first call."""
+    global _controlflow
+    if _controlflow is None:
+        start = time.perf_counter()
+        try:
+            import controlflow as cf
+            logger.info("ControlFlow successfully imported")
+            _controlflow = cf
+        except ImportError as e:
+            logger.warning(f"ControlFlow not available: {e}, using mock")
+            _controlflow = MockControlFlow()
+        startup_timer.record_lazy_import("controlflow", time.perf_counter() - start)
+    return _controlflow
 
 def get_prefect():
-    """Get Prefect module or mock for fallback."""
+    """Get Prefect module or mock for fallback. Imported once, on first call."""
+    global _prefect
+    if _prefect is None:
+        start = time.perf_counter()
+        try:
+            import prefect
+            logger.info("Prefect successfully imported")
+            _prefect = prefect
+        except ImportError as e:
+            logger.warning(f"Prefect not available: {e}, using mock")
+            _prefect = MockPrefect()
+        startup_timer.record_lazy_import("prefect", time.perf_counter() - start)
+    return _prefect
+
+def _lazy_decorator(get_decorator: Callable[[], Callable], func: Callable) -> Callable:
+    """Apply get_decorator()(func) on the first call instead of at import time."""
+    wrapped = None
+
+    def resolve():
+        nonlocal wrapped
+        if wrapped is None:
+            wrapped = get_decorator()(func)
+        return wrapped
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def call_async(*args, **kwargs):
+            return await resolve()(*args, **kwargs)
+        return call_async
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        return resolve()(*args, **kwargs)
+    return call
+
+def lazy_flow(**flow_kwargs):
+    """Like prefect.flow(**kwargs), but Prefect is only imported when the flow first runs."""
+    return lambda func: _lazy_decorator(lambda: get_prefect().flow(**flow_kwargs), func)
+
+def lazy_task(**task_kwargs):
+    """Like controlflow.task(**kwargs), but ControlFlow is only imported when the task first runs."""
+    return lambda func: _lazy_decorator(lambda: get_controlflow().task(**task_kwargs), func)
+
+def module_available(name: str) -> bool:
+    """Whether a module can be imported, without importing it."""
     try:
-        import prefect
-        logger.info("Prefect successfully imported")
-        return prefect
-    except ImportError as e:
-        logger.warning(f"Prefect not available: {e}, using mock")
-        return MockPrefect()
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access, so
+    provider SDKs only cost import time once a provider is actually used.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            startup_timer.record_lazy_import(self._name, time.perf_counter() - start)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
 
 def get_prefect_client():
     """Get Prefect client or mock for fallback."""
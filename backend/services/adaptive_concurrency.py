@@ -0,0 +1,156 @@
+"""
+Adaptive (AIMD) limit on concurrent in-flight calls per LLM provider.
+
+The scheduler caps total concurrency, but each provider has its own
+ceiling that is unknown up front and moves with load. Each provider gets
+a limit that:
+
+- grows additively (+1 per limit's worth of successes) while latency stays
+  within LATENCY_TOLERANCE of the best recent latency
+- is cut multiplicatively on a 429/overload, at most once per cooldown so a
+  burst of rejections from one round of requests halves it only once
+
+Callers over the limit wait in FIFO order for a slot.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL_LIMIT = 4
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 32
+BACKOFF_RATIO = 0.5
+LATENCY_TOLERANCE = 2.0
+
+# Successful latencies kept for the baseline (best recent latency)
+LATENCY_WINDOW = 50
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit and FIFO wait queue for one provider"""
+
+    def __init__(self, name: str, initial_limit: int = DEFAULT_INITIAL_LIMIT,
+                 min_limit: int = DEFAULT_MIN_LIMIT, max_limit: int = DEFAULT_MAX_LIMIT,
+                 enabled: bool = True):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.enabled = enabled
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._last_decrease: Optional[float] = None
+        self.metrics = {
+            'increases': 0,
+            'decreases': 0,
+            'queued': 0,
+            'max_in_flight': 0,
+            'peak_limit': int(self.limit)
+        }
+
+    @property
+    def capacity(self) -> int:
+        return int(self.limit) if self.enabled else self.max_limit
+
+    async def acquire(self):
+        """Wait for an in-flight slot; pair every successful acquire with release()."""
+        if self.in_flight < self.capacity and not self._waiters:
+            self._take()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.metrics['queued'] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed over just as the caller was cancelled
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+
+    def _take(self):
+        self.in_flight += 1
+        self.metrics['max_in_flight'] = max(self.metrics['max_in_flight'], self.in_flight)
+
+    def release(self):
+        """Give back a slot and hand free capacity to queued callers."""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters and self.in_flight < self.capacity:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._take()
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold an in-flight slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record_success(self, latency: float):
+        """
+        Additive increase while latency is near the best recent latency and
+        the limit is in use. Call while still holding the call's slot.
+        """
+        self._latencies.append(latency)
+        baseline = min(self._latencies)
+        if latency > baseline * LATENCY_TOLERANCE or (self.in_flight < int(self.limit) and not self._waiters):
+            return
+        previous = int(self.limit)
+        self.limit = min(self.limit + 1.0 / self.limit, float(self.max_limit))
+        if int(self.limit) > previous:
+            self.metrics['increases'] += 1
+            self.metrics['peak_limit'] = max(self.metrics['peak_limit'], int(self.limit))
+            self._dispatch()
+
+    def record_overload(self, cooldown_seconds: float = None):
+        """
+        Multiplicative decrease after a 429/overload. Rejections within
+        cooldown_seconds (default: the best recent latency, at least 1s) of
+        the last cut are treated as the same event.
+        """
+        now = time.monotonic()
+        if cooldown_seconds is None:
+            cooldown_seconds = max(min(self._latencies, default=1.0), 1.0)
+        if self._last_decrease is not None and now - self._last_decrease < cooldown_seconds:
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(self.limit * BACKOFF_RATIO, float(self.min_limit))
+        self.metrics['decreases'] += 1
+        logger.warning(f"{self.name} overloaded, concurrency limit {previous} -> {int(self.limit)}")
+
+    def get_stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'limit': int(self.limit),
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'in_flight': self.in_flight,
+            'waiting': len(self._waiters),
+            'baseline_latency': min(self._latencies, default=None),
+            **self.metrics
+        }
+
+    def reset_metrics(self):
+        for name in ('increases', 'decreases', 'queued'):
+            self.metrics[name] = 0
+        self.metrics['max_in_flight'] = self.in_flight
+        self.metrics['peak_limit'] = int(self.limit)
@@ -0,0 +1,140 @@
+"""
+Dedicated, bounded thread pools for blocking provider SDK calls.
+
+The Gemini SDK is synchronous. Running it through asyncio.to_thread shares
+the default executor with every other to_thread user in the process and has
+no bound. Each blocking provider gets its own pool here instead. Admission
+fails fast once the pool and its queue are full, and queue depth and wait
+times are tracked for diagnostics.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when a bounded executor has no worker or queue slot available."""
+
+
+class BoundedExecutor:
+    """Thread pool with a hard cap on queued plus running calls"""
+
+    def __init__(self, name: str, max_workers: int = 8, max_queue: int = 32):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-sdk")
+        self._lock = threading.Lock()
+        self._pending = 0  # queued + running
+        self._active = 0
+        self.metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'rejected': 0,
+            'total_wait_time': 0.0,
+            'max_wait_time': 0.0
+        }
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on the pool, failing fast if it is saturated."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.metrics['rejected'] += 1
+                raise ExecutorSaturatedError(
+                    f"{self.name} executor saturated ({self._pending}/{self.capacity} calls in flight)"
+                )
+            self._pending += 1
+            self.metrics['submitted'] += 1
+
+        enqueued_at = time.monotonic()
+
+        def call():
+            wait = time.monotonic() - enqueued_at
+            with self._lock:
+                self._active += 1
+                self.metrics['total_wait_time'] += wait
+                self.metrics['max_wait_time'] = max(self.metrics['max_wait_time'], wait)
+            succeeded = False
+            try:
+                result = fn(*args, **kwargs)
+                succeeded = True
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self.metrics['completed' if succeeded else 'failed'] += 1
+
+        try:
+            future = self._pool.submit(call)
+        except RuntimeError:
+            # Pool already shut down
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Slots are released when the call finishes, or when a queued call is cancelled
+        # (by shutdown or its caller) and never runs
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                self.metrics['cancelled'] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            started = self.metrics['completed'] + self.metrics['failed'] + self._active
+            return {
+                **self.metrics,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'active': self._active,
+                'queue_depth': self._pending - self._active,
+                'average_wait_time': self.metrics['total_wait_time'] / started if started else 0.0
+            }
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+# Executors per blocking provider
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+def get_provider_executor(provider: str) -> BoundedExecutor:
+    """
+    Get the dedicated executor for a blocking provider, sized from
+    <PROVIDER>_EXECUTOR_WORKERS and <PROVIDER>_EXECUTOR_QUEUE.
+    """
+    with _executors_lock:
+        executor = _executors.get(provider)
+        if executor is None:
+            from backend.dynamic_config import get_dynamic_config
+            config = get_dynamic_config()
+            prefix = provider.upper()
+            executor = BoundedExecutor(
+                provider,
+                max_workers=config.get(f"{prefix}_EXECUTOR_WORKERS", 8, "integer"),
+                max_queue=config.get(f"{prefix}_EXECUTOR_QUEUE", 32, "integer")
+            )
+            _executors[provider] = executor
+            logger.info(f"Created {provider} executor with {executor.max_workers} workers, queue {executor.max_queue}")
+        return executor
+
+def get_executor_stats() -> Dict[str, dict]:
+    """Get stats for every provider executor created so far"""
+    with _executors_lock:
+        return {name: executor.get_stats() for name, executor in _executors.items()}
@@ -0,0 +1,116 @@
+"""
+Per-provider circuit breaker for LLMService.
+
+A provider that keeps failing (or reports a rate limit) is taken out of
+rotation for a cooldown period instead of burning a full timeout on every
+request. After the cooldown a single probe request is let through; its
+outcome decides whether the circuit closes again or re-opens.
+"""
+
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is rejected because the provider's circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for a single provider"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.last_error: Optional[str] = None
+        self.times_opened = 0
+        self.rejected_requests = 0
+
+    def _cooldown_elapsed(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at >= self.cooldown_seconds
+
+    def is_available(self) -> bool:
+        """Whether a request could currently be sent, without claiming the probe slot."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self._cooldown_elapsed()
+        return not self.probe_in_flight
+
+    def allow_request(self) -> bool:
+        """Claim permission to send a request; in half-open only one probe is admitted."""
+        if self.state == OPEN and self._cooldown_elapsed():
+            self.state = HALF_OPEN
+            logger.info(f"Circuit for {self.name} half-open, sending probe request")
+
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+
+        self.rejected_requests += 1
+        return False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"Circuit for {self.name} closed after successful probe")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self, error: Exception = None, rate_limited: bool = False):
+        """Count a failure; rate limits and failed probes trip the circuit immediately."""
+        self.consecutive_failures += 1
+        self.last_error = str(error) if error else None
+        self.probe_in_flight = False
+
+        if self.state == HALF_OPEN or rate_limited or self.consecutive_failures >= self.failure_threshold:
+            self._trip()
+
+    def release(self, probe: bool):
+        """
+        Give back the probe slot of a request that ended without an outcome. Only
+        the half-open probe owns the slot; a request admitted while closed must
+        not free a probe started after it.
+        """
+        if probe:
+            self.probe_in_flight = False
+
+    def _trip(self):
+        if self.state != OPEN:
+            self.times_opened += 1
+            logger.warning(
+                f"Circuit for {self.name} opened after {self.consecutive_failures} consecutive failures; "
+                f"cooling down for {self.cooldown_seconds}s"
+            )
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+
+    def get_status(self) -> dict:
+        retry_in = None
+        if self.state == OPEN and self.opened_at is not None:
+            retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'failure_threshold': self.failure_threshold,
+            'cooldown_seconds': self.cooldown_seconds,
+            'retry_in_seconds': round(retry_in, 2) if retry_in is not None else None,
+            'probe_in_flight': self.probe_in_flight,
+            'times_opened': self.times_opened,
+            'rejected_requests': self.rejected_requests,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,246 @@
+"""
+Token-budgeted context assembly for chained agents.
+
+Workflows hand every input artifact (or the previous agent's full output) to
+the next agent, so prompts grow with each stage until they overflow the model
+window or InputSanitizer.MAX_CONTEXT_LENGTH. ContextAssembler fits a list of
+named artifacts, ordered by priority, into a token budget:
+
+1. every artifact in full, if that fits
+2. otherwise the lowest-priority artifacts are reduced to an extractive form
+   (headings, list items and the lead line of each paragraph)
+3. then to a short summary (lead sentences and a headings outline)
+4. then lower-priority artifacts are omitted; the top-priority one is cut
+
+Compacted forms are deterministic and cached per artifact content hash, so the
+same artifact reused by several tasks is only compacted once.
+"""
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.dynamic_config import get_dynamic_config
+from backend.services.token_counter import CHARS_PER_TOKEN, get_token_counter
+
+logger = logging.getLogger(__name__)
+
+# Context windows (prompt + completion) in tokens
+MODEL_CONTEXT_WINDOWS = {
+    'gemini-pro': 30720,
+    'gemini-1.5-flash': 1048576,
+    'gemini-1.5-pro': 2097152,
+    'gpt-3.5-turbo': 16385,
+    'gpt-4': 8192,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'claude-3-haiku-20240307': 200000,
+    'claude-3-sonnet-20240229': 200000,
+    'claude-3-opus-20240229': 200000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Tokens kept free for the role prefix and task wrapper around the context
+PROMPT_OVERHEAD_TOKENS = 3000
+MIN_CONTEXT_BUDGET = 500
+
+# Character cap matching InputSanitizer.MAX_CONTEXT_LENGTH
+DEFAULT_MAX_CHARS = 50000
+
+FULL = "full"
+EXTRACTIVE = "extractive"
+SUMMARY = "summary"
+OMITTED = "omitted"
+TRUNCATED = "truncated"
+
+SUMMARY_MAX_CHARS = 800
+EXTRACT_LINE_MAX_CHARS = 240
+
+_HEADING = re.compile(r'^\s{0,3}#{1,6}\s+\S')
+_LIST_ITEM = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+\S')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def context_window(model: Optional[str]) -> int:
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def _clip(line: str, limit: int) -> str:
+    line = line.rstrip()
+    return line if len(line) <= limit else line[:limit - 3].rstrip() + "..."
+
+
+def extract_sections(text: str) -> str:
+    """Headings, list items and the first line of each paragraph; code blocks are elided."""
+    kept = []
+    in_code, code_lines = False, 0
+    paragraph_start = True
+    for line in text.splitlines():
+        if line.strip().startswith("```"):
+            if in_code:
+                kept.append(f"[code block omitted: {code_lines} lines]")
+            in_code, code_lines = not in_code, 0
+            paragraph_start = True
+            continue
+        if in_code:
+            code_lines += 1
+            continue
+        if not line.strip():
+            paragraph_start = True
+            continue
+        if _HEADING.match(line) or _LIST_ITEM.match(line) or paragraph_start:
+            kept.append(_clip(line, EXTRACT_LINE_MAX_CHARS))
+        paragraph_start = False
+    return "\n".join(kept)
+
+
+def summarize(text: str, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Lead sentences of the first paragraph followed by an outline of the headings."""
+    body = [line for line in text.splitlines() if line.strip() and not _HEADING.match(line)
+            and not line.strip().startswith("```")]
+    lead = " ".join(_SENTENCE_END.split(" ".join(line.strip() for line in body[:5]))[:2])
+    headings = [line.strip().lstrip("#").strip() for line in text.splitlines() if _HEADING.match(line)]
+    summary = lead
+    if headings:
+        summary += f"\nSections: {'; '.join(headings)}"
+    return _clip(summary.strip(), max_chars)
+
+
+@dataclass
+class AssembledContext:
+    text: str
+    tokens: int
+    budget: int
+    original_tokens: int
+    forms: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def trimmed_tokens(self) -> int:
+        return max(self.original_tokens - self.tokens, 0)
+
+
+class ContextAssembler:
+    """Fits prioritized artifacts into a token budget, caching compacted forms by content hash"""
+
+    def __init__(self, provider: str = "openai", max_cache_entries: int = 512):
+        self.provider = provider
+        self.max_cache_entries = max_cache_entries
+        self._cache: "OrderedDict[tuple, Tuple[str, int]]" = OrderedDict()
+        self.metrics = {
+            'assemblies': 0,
+            'trimmed_assemblies': 0,
+            'tokens_trimmed': 0,
+            'cache_hits': 0,
+            'cache_misses': 0
+        }
+
+    def budget_for_models(self, models: Iterable[Tuple[str, int]], max_chars: int = DEFAULT_MAX_CHARS) -> int:
+        """
+        Context budget in tokens for (model, max_output_tokens) pairs. Any of
+        them may serve the request after a fallback, so the tightest one wins.
+        CONTEXT_TOKEN_BUDGET overrides the derived budget when set.
+        """
+        override = get_dynamic_config().get("CONTEXT_TOKEN_BUDGET", 0, "integer")
+        if override > 0:
+            return override
+
+        budgets = [context_window(model) - max_output - PROMPT_OVERHEAD_TOKENS for model, max_output in models]
+        budget = min(budgets) if budgets else DEFAULT_CONTEXT_WINDOW - PROMPT_OVERHEAD_TOKENS
+        return max(min(budget, max_chars // CHARS_PER_TOKEN), MIN_CONTEXT_BUDGET)
+
+    def _form(self, content: str, form: str) -> Tuple[str, int]:
+        """Return (text, tokens) of an artifact in the given form, from cache when possible."""
+        key = (hashlib.sha256(content.encode("utf-8")).hexdigest(), form)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.metrics['cache_hits'] += 1
+            return cached
+
+        self.metrics['cache_misses'] += 1
+        if form == EXTRACTIVE:
+            text = extract_sections(content)
+        elif form == SUMMARY:
+            text = summarize(content)
+        else:
+            text = content
+        result = (text, get_token_counter().count(self.provider, text))
+        self._cache[key] = result
+        if len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    def assemble(self, artifacts: Sequence[Tuple[str, str]], budget: int,
+                 max_chars: int = DEFAULT_MAX_CHARS, separator: str = "\n") -> AssembledContext:
+        """
+        Join (name, content) artifacts, highest priority first, within budget
+        tokens and max_chars characters. When everything fits the result is
+        identical to separator.join of the contents.
+        """
+        artifacts = [(name, content) for name, content in artifacts if content]
+        self.metrics['assemblies'] += 1
+        if not artifacts:
+            return AssembledContext("", 0, budget, 0)
+
+        chosen: List[Tuple[str, int]] = [self._form(content, FULL) for _, content in artifacts]
+        forms = {name: FULL for name, _ in artifacts}
+        original_tokens = sum(tokens for _, tokens in chosen)
+
+        def fits() -> bool:
+            texts = [text for text, _ in chosen if text]
+            return (sum(tokens for _, tokens in chosen) <= budget
+                    and len(separator.join(texts)) <= max_chars)
+
+        # Degrade lowest-priority artifacts first, one level at a time
+        for form in (EXTRACTIVE, SUMMARY):
+            for index in reversed(range(len(artifacts))):
+                if fits():
+                    break
+                name, content = artifacts[index]
+                candidate = self._form(content, form)
+                if candidate[1] < chosen[index][1]:
+                    chosen[index] = candidate
+                    forms[name] = form
+
+        for index in reversed(range(1, len(artifacts))):
+            if fits():
+                break
+            chosen[index] = ("", 0)
+            forms[artifacts[index][0]] = OMITTED
+
+        text = separator.join(text for text, _ in chosen if text)
+        tokens = sum(tokens for _, tokens in chosen)
+        if not fits():
+            # Only the top-priority artifact is left and even its summary is too long
+            limit = min(budget * CHARS_PER_TOKEN, max_chars)
+            text = text[:limit]
+            tokens = get_token_counter().count(self.provider, text)
+            forms[artifacts[0][0]] = TRUNCATED
+
+        result = AssembledContext(text, tokens, budget, original_tokens, forms)
+        if result.trimmed_tokens:
+            self.metrics['trimmed_assemblies'] += 1
+            self.metrics['tokens_trimmed'] += result.trimmed_tokens
+            logger.info(
+                f"Context trimmed by {result.trimmed_tokens} tokens "
+                f"({original_tokens} -> {tokens}, budget {budget}): {forms}"
+            )
+        return result
+
+    def get_stats(self) -> dict:
+        return {**self.metrics, 'cached_forms': len(self._cache)}
+
+
+# Global context assembler instance
+_context_assembler = None
+
+def get_context_assembler() -> ContextAssembler:
+    """Get the global context assembler instance"""
+    global _context_assembler
+    if _context_assembler is None:
+        _context_assembler = ContextAssembler()
+    return _context_assembler
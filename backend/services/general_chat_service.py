@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from backend.services.llm_service import get_llm_service
+from backend.services.llm_scheduler import INTERACTIVE
 
 class GeneralChatService:
     def __init__(self, provider: str = "openai", model: str = "gpt-4"):
@@ -8,16 +9,19 @@ class GeneralChatService:
         self.history = []
         self.llm_service = get_llm_service()
 
-    async def handle_message(self, message: str) -> str:
+    async def handle_message(self, message: str, session_id: str = None) -> str:
         """
         Handles a message in general chat mode by calling the LLM service.
+        Chat runs in the interactive lane so it is not starved by workflows.
         """
         self.history.append({"role": "user", "content": message})
 
         # In a real implementation, this would call an LLM provider.
         response_text = await self.llm_service.generate_response(
             prompt=message,
-            agent_name="GeneralChat"
+            agent_name="GeneralChat",
+            priority=INTERACTIVE,
+            session_id=session_id
         )
 
         self.history.append({"role": "assistant", "content": response_text})
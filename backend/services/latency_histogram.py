@@ -0,0 +1,207 @@
+"""
+Fixed-memory latency histograms with sliding windows.
+
+Averages hide the tail. These histograms use log-spaced buckets (every bucket
+is GROWTH times wider than the previous one), so memory is fixed regardless of
+traffic, percentiles carry a bounded relative error (about 5%), and two
+histograms with the same layout can be merged by adding their counts.
+
+WindowedHistogram keeps a ring of short time slices so percentiles can be read
+over the last few minutes as well as over the process lifetime.
+HistogramRegistry keys windowed histograms by labels such as provider, model,
+agent and outcome, and aggregates them along any subset of those labels.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bucket layout shared by every histogram so they stay mergeable
+MIN_VALUE = 0.001      # 1ms; anything faster lands in the first bucket
+MAX_VALUE = 600.0      # 10 minutes; anything slower lands in the last bucket
+GROWTH = 1.1           # each bucket is 10% wider than the previous one
+
+_LOG_GROWTH = math.log(GROWTH)
+BUCKET_COUNT = int(math.ceil(math.log(MAX_VALUE / MIN_VALUE) / _LOG_GROWTH)) + 1
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+# Label value used once a registry reaches its series limit
+OVERFLOW_LABEL = "_other"
+
+
+def _bucket_index(value: float) -> int:
+    if value <= MIN_VALUE:
+        return 0
+    index = int(math.log(value / MIN_VALUE) / _LOG_GROWTH) + 1
+    return min(index, BUCKET_COUNT - 1)
+
+
+def _bucket_value(index: int) -> float:
+    """Representative value of a bucket: the geometric midpoint of its bounds."""
+    if index == 0:
+        return MIN_VALUE
+    lower = MIN_VALUE * GROWTH ** (index - 1)
+    return lower * math.sqrt(GROWTH)
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of latencies in seconds"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, value: float):
+        value = max(float(value), 0.0)
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add another histogram's samples into this one."""
+        if not other.count:
+            return
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Value at percentile p (0-100), clamped to the observed min and max."""
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(max(_bucket_value(i), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def summary(self, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> dict:
+        def rounded(value):
+            return round(value, 4) if value is not None else None
+
+        result = {
+            'count': self.count,
+            'mean': rounded(self.mean),
+            'min': rounded(self.min),
+            'max': rounded(self.max)
+        }
+        for p in percentiles:
+            result[f"p{p:g}"] = rounded(self.percentile(p))
+        return result
+
+
+class WindowedHistogram:
+    """
+    Sliding-window histogram built from a ring of time slices, plus a lifetime
+    histogram. The window advances one slice at a time, so a window of 300s
+    in 10 slices covers between 270 and 300 seconds of samples.
+    """
+
+    def __init__(self, window_seconds: float = 300.0, slices: int = 10):
+        self.window_seconds = window_seconds
+        self.slice_seconds = window_seconds / slices
+        self._slices: List[Tuple[int, LatencyHistogram]] = [(-1, LatencyHistogram()) for _ in range(slices)]
+        self.lifetime = LatencyHistogram()
+
+    def _slice_id(self, now: float) -> int:
+        return int(now // self.slice_seconds)
+
+    def record(self, value: float, now: Optional[float] = None):
+        slice_id = self._slice_id(time.monotonic() if now is None else now)
+        position = slice_id % len(self._slices)
+        current_id, histogram = self._slices[position]
+        if current_id != slice_id:
+            histogram = LatencyHistogram()
+            self._slices[position] = (slice_id, histogram)
+        histogram.record(value)
+        self.lifetime.record(value)
+
+    def window(self, now: Optional[float] = None) -> LatencyHistogram:
+        """Merge the slices that are still inside the window."""
+        oldest = self._slice_id(time.monotonic() if now is None else now) - len(self._slices) + 1
+        merged = LatencyHistogram()
+        for slice_id, histogram in self._slices:
+            if slice_id >= oldest:
+                merged.merge(histogram)
+        return merged
+
+
+class HistogramRegistry:
+    """
+    Windowed latency histograms keyed by a fixed set of labels.
+
+    The number of distinct label combinations is capped; once the cap is hit,
+    new combinations are folded into a series whose labels are all "_other".
+    """
+
+    def __init__(self, labels: Sequence[str], window_seconds: float = 300.0,
+                 slices: int = 10, max_series: int = 1000):
+        self.labels = tuple(labels)
+        self.window_seconds = window_seconds
+        self.slices = slices
+        self.max_series = max_series
+        self._series: Dict[Tuple[str, ...], WindowedHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, value: float, now: Optional[float] = None, **labels):
+        key = tuple(str(labels.get(name) or "unknown") for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    key = (OVERFLOW_LABEL,) * len(self.labels)
+                    series = self._series.get(key)
+                if series is None:
+                    series = WindowedHistogram(self.window_seconds, self.slices)
+                    self._series[key] = series
+            series.record(value, now)
+
+    def summary(self, group_by: Iterable[str] = None, windowed: bool = True,
+                percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                now: Optional[float] = None, **filters) -> Dict[str, dict]:
+        """
+        Percentiles per group. group_by names the labels to keep (all labels by
+        default); groups are keyed by their label values joined with "/".
+        Keyword filters restrict the series, e.g. provider="openai".
+        """
+        group_by = tuple(group_by) if group_by is not None else self.labels
+        unknown = [name for name in (*group_by, *filters) if name not in self.labels]
+        if unknown:
+            raise ValueError(f"Unknown histogram labels: {unknown}")
+        positions = [self.labels.index(name) for name in group_by]
+        filter_positions = {self.labels.index(name): str(value) for name, value in filters.items()}
+
+        groups: Dict[str, LatencyHistogram] = {}
+        with self._lock:
+            for key, series in self._series.items():
+                if any(key[i] != value for i, value in filter_positions.items()):
+                    continue
+                group = "/".join(key[i] for i in positions) or "all"
+                merged = groups.setdefault(group, LatencyHistogram())
+                merged.merge(series.window(now) if windowed else series.lifetime)
+
+        return {group: histogram.summary(percentiles) for group, histogram in sorted(groups.items()) if histogram.count}
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
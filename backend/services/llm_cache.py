@@ -0,0 +1,217 @@
+"""
+Content-addressed response cache for LLMService.
+
+Responses are keyed on provider, model, temperature and a hash of the
+normalized prompt's system text and messages. A bounded in-memory LRU serves
+hot entries; an optional sqlite tier keeps entries across restarts. Every
+entry carries a TTL.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from backend.services.prompt_messages import Prompt, as_prompt_messages
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize line endings and surrounding whitespace so trivially different prompts share a key."""
+    lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def make_cache_key(provider: str, model: str, temperature: float, prompt: Prompt) -> str:
+    """
+    Build the content address for a completion request. The system prompt and
+    each message are hashed with their roles, so the same text split
+    differently between system, user and assistant gets a different key.
+    """
+    prompt = as_prompt_messages(prompt)
+    structured = json.dumps(
+        [normalize_prompt(prompt.system) if prompt.system else None,
+         [[role, normalize_prompt(content)] for role, content in prompt.messages]],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    prompt_hash = hashlib.sha256(structured.encode("utf-8")).hexdigest()
+    return f"{provider}:{model}:{float(temperature):.3f}:{prompt_hash}"
+
+
+class LLMResponseCache:
+    """
+    Two-tier LRU/TTL cache for LLM responses.
+
+    The memory tier is an OrderedDict bounded by max_entries. When db_path is
+    set, entries are also written to a sqlite table so they survive restarts;
+    disk hits are promoted back into memory. The sqlite connection is used
+    from worker threads (asyncio.to_thread), one at a time under a lock.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.metrics = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+
+        if db_path:
+            self._init_disk_tier(db_path)
+
+    def _init_disk_tier(self, db_path: str):
+        """Open the sqlite tier, disabling it if the database cannot be created."""
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            logger.info(f"LLM response cache disk tier enabled at {db_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"LLM response cache disk tier disabled: {e}")
+            self._db = None
+
+    def _disk_get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _disk_set(self, key: str, response: str, expires_at: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, response, expires_at)
+            )
+            self._db.commit()
+
+    def _disk_delete(self, key: str):
+        with self._db_lock:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _memory_set(self, key: str, response: str, expires_at: float):
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.metrics['evictions'] += 1
+
+    async def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        """
+        Return the cached response for key, or None on a miss or expired entry.
+        Callers probing several keys for one lookup pass count_miss=False and
+        call record_miss once if none of them hit.
+        """
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            response, expires_at = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.metrics['hits'] += 1
+                self.metrics['memory_hits'] += 1
+                return response
+            del self._memory[key]
+            self.metrics['expirations'] += 1
+
+        if self._db is not None:
+            try:
+                entry = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache disk read failed: {e}")
+                entry = None
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._memory_set(key, response, expires_at)
+                    self.metrics['hits'] += 1
+                    self.metrics['disk_hits'] += 1
+                    return response
+                self.metrics['expirations'] += 1
+                try:
+                    await asyncio.to_thread(self._disk_delete, key)
+                except sqlite3.Error:
+                    pass
+
+        if count_miss:
+            self.record_miss()
+        return None
+
+    async def set(self, key: str, response: str, ttl_seconds: Optional[float] = None):
+        """Store a response under key in both tiers."""
+        expires_at = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        self._memory_set(key, response, expires_at)
+        self.metrics['stores'] += 1
+
+        if self._db is not None:
+            try:
+                await asyncio.to_thread(self._disk_set, key, response, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache disk write failed: {e}")
+
+    def record_miss(self):
+        """Count a lookup that found no usable entry."""
+        self.metrics['misses'] += 1
+
+    def record_bypass(self):
+        """Count a request that explicitly skipped the cache."""
+        self.metrics['bypassed'] += 1
+
+    def clear(self):
+        """Drop all entries from both tiers."""
+        self._memory.clear()
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.execute("DELETE FROM llm_cache")
+                    self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache disk clear failed: {e}")
+
+    def reset_metrics(self):
+        for name in self.metrics:
+            self.metrics[name] = 0
+
+    def get_stats(self) -> dict:
+        """Get cache statistics for performance metrics."""
+        lookups = self.metrics['hits'] + self.metrics['misses']
+        return {
+            **self.metrics,
+            'entries': len(self._memory),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'disk_tier_enabled': self._db is not None,
+            'hit_rate': (self.metrics['hits'] / lookups * 100) if lookups else 0
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,179 @@
+"""
+Priority-aware, per-session fair scheduling of LLM calls.
+
+Without a scheduler, interactive chat and long SDLC workflows race for the
+same rate limiter first-come-first-served, so one large workflow can starve
+every chat user. LLMScheduler caps the number of provider calls in flight and,
+when calls have to queue, dispatches them by start-time fair queuing (SFQ):
+
+- every (priority, session_id) pair is a flow with weight PRIORITY_WEIGHTS[priority]
+- a request's start tag is max(virtual time, the flow's previous finish tag)
+- the waiter with the smallest start tag runs next
+
+A session that submits many requests only gets its weighted share, and an
+interactive request jumps ahead of queued workflow and background work
+without starving it completely.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from backend.services.latency_histogram import HistogramRegistry
+
+logger = logging.getLogger(__name__)
+
+# Priority classes
+INTERACTIVE = "interactive"
+WORKFLOW = "workflow"
+BACKGROUND = "background"
+
+PRIORITY_WEIGHTS = {
+    INTERACTIVE: 8.0,
+    WORKFLOW: 2.0,
+    BACKGROUND: 1.0
+}
+
+DEFAULT_SESSION = "global"
+
+# Finish tags are pruned once this many flows have been seen
+MAX_TRACKED_FLOWS = 1000
+
+
+class _Waiter:
+    __slots__ = ('start_tag', 'seq', 'future', 'priority', 'session_id', 'enqueued_at')
+
+    def __init__(self, start_tag: float, seq: int, future: asyncio.Future, priority: str, session_id: str):
+        self.start_tag = start_tag
+        self.seq = seq
+        self.future = future
+        self.priority = priority
+        self.session_id = session_id
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.start_tag, self.seq) < (other.start_tag, other.seq)
+
+
+class LLMScheduler:
+    """Bounds concurrent LLM calls and orders queued calls by weighted fair queuing"""
+
+    def __init__(self, max_concurrent: int = 8, weights: Dict[str, float] = None):
+        self.max_concurrent = max_concurrent
+        self.weights = dict(weights or PRIORITY_WEIGHTS)
+        self._in_flight = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._finish_tags: Dict[tuple, float] = {}
+        self._queued_by_priority: Dict[str, int] = {name: 0 for name in self.weights}
+        self._queued_by_session: Dict[str, int] = {}
+        self.wait_times = HistogramRegistry(('priority',))
+        self.metrics = {
+            'dispatched': {name: 0 for name in self.weights},
+            'queued': {name: 0 for name in self.weights},
+            'cancelled': 0,
+            'max_queue_depth': 0
+        }
+
+    def _tag(self, priority: str, session_id: str) -> float:
+        """Assign the start tag for a request and advance its flow's finish tag."""
+        if priority not in self.weights:
+            raise ValueError(f"Unknown LLM priority '{priority}', expected one of {list(self.weights)}")
+        flow = (priority, session_id)
+        start = max(self._virtual_time, self._finish_tags.get(flow, 0.0))
+        self._finish_tags[flow] = start + 1.0 / self.weights[priority]
+
+        if len(self._finish_tags) > MAX_TRACKED_FLOWS:
+            # Flows at or behind virtual time would start at virtual time anyway
+            self._finish_tags = {f: tag for f, tag in self._finish_tags.items() if tag > self._virtual_time}
+        return start
+
+    async def acquire(self, priority: str = WORKFLOW, session_id: str = None):
+        """Wait for an in-flight slot; pair every successful acquire with release()."""
+        session_id = session_id or DEFAULT_SESSION
+        start_tag = self._tag(priority, session_id)
+
+        if self._in_flight < self.max_concurrent and not self.queue_depth:
+            self._in_flight += 1
+            self._virtual_time = max(self._virtual_time, start_tag)
+            self.metrics['dispatched'][priority] += 1
+            self.wait_times.record(0.0, priority=priority)
+            return
+
+        waiter = _Waiter(start_tag, next(self._seq), asyncio.get_running_loop().create_future(), priority, session_id)
+        heapq.heappush(self._queue, waiter)
+        self._queued_by_priority[priority] += 1
+        self._queued_by_session[session_id] = self._queued_by_session.get(session_id, 0) + 1
+        self.metrics['queued'][priority] += 1
+        self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], self.queue_depth)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was handed over just as the caller was cancelled
+                self.release()
+            else:
+                self._forget(waiter)
+                self.metrics['cancelled'] += 1
+            raise
+
+    def release(self):
+        """Give back a slot and hand it to the fairest queued waiter."""
+        self._in_flight -= 1
+        while self._queue and self._in_flight < self.max_concurrent:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue  # cancelled while queued, already forgotten
+            self._forget(waiter)
+            self._in_flight += 1
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            self.metrics['dispatched'][waiter.priority] += 1
+            self.wait_times.record(time.monotonic() - waiter.enqueued_at, priority=waiter.priority)
+            waiter.future.set_result(None)
+
+    def _forget(self, waiter: _Waiter):
+        self._queued_by_priority[waiter.priority] -= 1
+        remaining = self._queued_by_session.get(waiter.session_id, 1) - 1
+        if remaining > 0:
+            self._queued_by_session[waiter.session_id] = remaining
+        else:
+            self._queued_by_session.pop(waiter.session_id, None)
+
+    @asynccontextmanager
+    async def slot(self, priority: str = WORKFLOW, session_id: str = None):
+        """Hold an in-flight slot for the duration of the block."""
+        await self.acquire(priority, session_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self._queued_by_priority.values())
+
+    def get_stats(self) -> dict:
+        return {
+            'max_concurrent': self.max_concurrent,
+            'in_flight': self._in_flight,
+            'queue_depth': self.queue_depth,
+            'queue_depth_by_priority': dict(self._queued_by_priority),
+            'queued_sessions': len(self._queued_by_session),
+            'weights': dict(self.weights),
+            'wait_time': self.wait_times.summary(['priority']),
+            **{name: (dict(value) if isinstance(value, dict) else value) for name, value in self.metrics.items()}
+        }
+
+    def reset_metrics(self):
+        self.wait_times.clear()
+        for name in self.weights:
+            self.metrics['dispatched'][name] = 0
+            self.metrics['queued'][name] = 0
+        self.metrics['cancelled'] = 0
+        self.metrics['max_queue_depth'] = self.queue_depth
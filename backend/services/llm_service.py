@@ -1,40 +1,99 @@
 import os
 import asyncio
+import inspect
 import logging
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, Callable, Union
+import math
 import time
-from contextlib import asynccontextmanager
-import google.generativeai as genai
-from google.api_core.exceptions import GoogleAPICallError
-from backend.rate_limiter import rate_limiter, rate_limited
-
-# Optional imports for multi-provider support
-try:
-    import openai
-    HAS_OPENAI = True
-except ImportError:
-    HAS_OPENAI = False
-
-try:
-    import anthropic
-    HAS_ANTHROPIC = True
-except ImportError:
-    HAS_ANTHROPIC = False
-
-try:
-    import aiohttp
-    HAS_AIOHTTP = True
-except ImportError:
-    HAS_AIOHTTP = False
-    # Create a dummy aiohttp module for type hints when not available
-    class _DummyClientSession:
-        pass
-    class _DummyAiohttp:
-        ClientSession = _DummyClientSession
-    aiohttp = _DummyAiohttp()
+from collections import deque
+from dataclasses import dataclass
+from contextlib import asynccontextmanager, aclosing
+from backend.rate_limiter import rate_limiter, rate_limited, RateLimitTimeout
+from backend.services.llm_cache import LLMResponseCache, make_cache_key
+from backend.services.single_flight import SingleFlight
+from backend.services.provider_router import ProviderRouter
+from backend.services.circuit_breaker import CircuitBreaker, CircuitOpenError, HALF_OPEN
+from backend.services.token_counter import get_token_counter
+from backend.services.bounded_executor import get_provider_executor, get_executor_stats, ExecutorSaturatedError
+from backend.services.latency_histogram import HistogramRegistry
+from backend.services.llm_scheduler import LLMScheduler, WORKFLOW, BACKGROUND
+from backend.services.provider_health import ProviderHealthChecker, PROBE
+from backend.services.output_budget import OutputBudgetPolicy
+from backend.services.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from backend.services.prompt_messages import (
+    PromptMessages, as_prompt_messages, prompt_text, openai_messages, anthropic_request, continuation_prompt
+)
+
+from backend.runtime_env import LazyModule, module_available
+
+# Provider SDKs are imported on first use of a provider to keep cold start fast
+genai = LazyModule("google.generativeai")
+google_exceptions = LazyModule("google.api_core.exceptions")
+openai = LazyModule("openai")
+anthropic = LazyModule("anthropic")
+aiohttp = LazyModule("aiohttp")
+
+HAS_GOOGLE_AI = module_available("google.generativeai")
+HAS_OPENAI = module_available("openai")
+HAS_ANTHROPIC = module_available("anthropic")
+HAS_AIOHTTP = module_available("aiohttp")
 
 logger = logging.getLogger(__name__)
 
+
+def _usage_tokens(value) -> Optional[int]:
+    """Return a provider-reported token count, ignoring missing or non-numeric values"""
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    return None
+
+
+def _temperature_kwargs(method, temperature: float) -> dict:
+    """Pass temperature as a named argument, or in the request body for SDK releases whose method no longer declares it"""
+    try:
+        parameters = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return {'temperature': temperature}
+    if 'temperature' in parameters or any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+        return {'temperature': temperature}
+    return {'extra_body': {'temperature': temperature}}
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """
+    Provider rate-limit/quota rejections, by HTTP status or SDK exception type.
+    Timeouts of the local rate limiter are not provider errors.
+    """
+    if isinstance(error, RateLimitTimeout):
+        return False
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    name = type(error).__name__.lower()
+    return "ratelimit" in name or "resourceexhausted" in name
+
+
+def _is_overload_error(error: Exception) -> bool:
+    """Rate limits plus provider overload responses (503, Anthropic's 529)"""
+    return (
+        _is_rate_limit_error(error)
+        or getattr(error, "status_code", None) in (503, 529)
+        or "overloaded" in str(error).lower()
+    )
+
+
+@dataclass
+class BatchItemResult:
+    """Outcome of a single prompt within generate_batch"""
+    index: int
+    prompt: str
+    success: bool
+    response: Optional[str] = None
+    error: Optional[str] = None
+    provider: Optional[str] = None
+    duration: float = 0.0
+
+
 class ConnectionPool:
     """
     Connection pool for managing HTTP connections to LLM providers.
@@ -43,7 +102,7 @@ class ConnectionPool:
     
     def __init__(self, max_connections_per_provider: int = 10):
         self.max_connections = max_connections_per_provider
-        self.sessions: Dict[str, aiohttp.ClientSession] = {}
+        self.sessions: Dict[str, "aiohttp.ClientSession"] = {}
         self.connection_stats = {
             'total_requests': 0,
             'active_connections': 0,
@@ -51,7 +110,7 @@ class ConnectionPool:
             'created_at': time.time()
         }
     
-    async def get_session(self, provider: str) -> aiohttp.ClientSession:
+    async def get_session(self, provider: str) -> "aiohttp.ClientSession":
         """Get or create a session for the provider"""
         if not HAS_AIOHTTP:
             # If aiohttp is not available, return None and let providers handle their own connections
@@ -130,16 +189,78 @@ class LLMService:
             'successful_requests': 0,
             'failed_requests': 0,
             'average_response_time': 0,
-            'response_times': [],
-            'provider_usage': {}
+            'response_times': deque(maxlen=100),
+            'provider_usage': {},
+            'streaming_requests': 0,
+            'average_time_to_first_token': 0,
+            'time_to_first_token': deque(maxlen=100)
         }
         
+        # Per-provider latency history of successful calls, used for hedging
+        self.provider_response_times: Dict[str, deque] = {}
+
+        # Windowed latency percentiles by provider, model, agent and outcome
+        self.latency_histograms = HistogramRegistry(('provider', 'model', 'agent', 'outcome'))
+        self.ttft_histograms = HistogramRegistry(('provider', 'model', 'agent'))
+
+        # Provider-side prompt prefix cache accounting, per provider
+        self.prompt_cache_metrics: Dict[str, Dict[str, int]] = {}
+
+        # Hedged request accounting
+        self.hedge_metrics = {
+            'eligible_requests': 0,
+            'hedges_fired': 0,
+            'hedge_wins': 0,
+            'budget_denied': 0
+        }
+
         # Initialize providers
         self.providers = {}
         self._setup_providers()
+
+        # Response cache, keyed on provider/model/temperature/prompt
+        self.response_cache = self._setup_response_cache()
+
+        # Coalesces identical concurrent requests into one provider call
+        self.single_flight = SingleFlight()
         
         # Default provider order (can be customized)
         self.provider_priority = ['google', 'openai', 'anthropic']
+
+        # Tokenizer-based accounting for rate limiting
+        self.token_counter = get_token_counter()
+
+        # Circuit breakers take failing providers out of rotation
+        self.circuit_breakers = self._setup_circuit_breakers()
+
+        # AIMD in-flight limits per provider, created on first call
+        self.concurrency_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+
+        # Dynamic ranking on top of provider_priority
+        from backend.dynamic_config import get_dynamic_config
+        self.router = ProviderRouter(
+            rate_limiter=rate_limiter,
+            policy=get_dynamic_config().get("LLM_ROUTING_POLICY", "latency_first")
+        )
+
+        # Priority lanes and per-session fair queuing in front of the providers
+        self.scheduler = LLMScheduler(
+            max_concurrent=get_dynamic_config().get("LLM_SCHEDULER_MAX_CONCURRENT", 8, "integer")
+        )
+
+        # max_tokens sized per agent from observed output lengths
+        self.output_budget = OutputBudgetPolicy(
+            enabled=get_dynamic_config().get("LLM_ADAPTIVE_MAX_TOKENS", True, "boolean"),
+            headroom=get_dynamic_config().get("LLM_MAX_TOKENS_HEADROOM", 0.25, "float"),
+            min_samples=get_dynamic_config().get("LLM_MAX_TOKENS_MIN_SAMPLES", 20, "integer")
+        )
+
+        # Tiered provider health: traffic, metadata probes, on-demand generation
+        self.health_checker = ProviderHealthChecker(
+            self,
+            cache_ttl_seconds=get_dynamic_config().get("LLM_HEALTH_CACHE_TTL_SECONDS", 30.0, "float"),
+            probe_timeout_seconds=get_dynamic_config().get("LLM_HEALTH_PROBE_TIMEOUT_SECONDS", 5.0, "float")
+        )
         
     def _setup_providers(self):
         """Setup available LLM providers with enhanced connection management"""
@@ -148,18 +269,29 @@ class LLMService:
         from backend.dynamic_config import get_dynamic_config
         config = get_dynamic_config()
         is_test_mode = config.get("TEST_MODE", False, "boolean")
+
+        # A local mock server replaces the real providers, even in test mode
+        mock_server_url = config.get("LLM_MOCK_SERVER_URL", "")
+        if mock_server_url:
+            self._setup_mock_providers(mock_server_url.rstrip("/"))
+            return
         
         # Google AI (Gemini)
         google_key = os.getenv("GOOGLE_AI_API_KEY") or os.getenv("GEMINI_API_KEY")
-        if google_key and not is_test_mode:
+        if HAS_GOOGLE_AI and google_key and not is_test_mode:
             try:
-                genai.configure(api_key=google_key)
+                def create_google_client():
+                    genai.configure(api_key=google_key)
+                    return genai.GenerativeModel('gemini-pro')
+
                 self.providers['google'] = {
-                    'client': genai.GenerativeModel('gemini-pro'),
+                    'client': None,
+                    'client_factory': create_google_client,
                     'type': 'google',
                     'available': True,
                     'uses_connection_pool': False,  # Google AI uses their own client
                     'config': {
+                        'model': 'gemini-pro',
                         'temperature': 0.7,
                         'max_tokens': 4000
                     }
@@ -172,15 +304,14 @@ class LLMService:
         # OpenAI with enhanced connection pooling
         if HAS_OPENAI and os.getenv("OPENAI_API_KEY") and not is_test_mode:
             try:
-                # Create OpenAI client with custom HTTP session
-                openai_client = openai.AsyncOpenAI(
-                    api_key=os.getenv("OPENAI_API_KEY"),
-                    max_retries=2,
-                    timeout=self.timeout_seconds
-                )
-                
                 self.providers['openai'] = {
-                    'client': openai_client,
+                    'client': None,
+                    'client_factory': lambda: openai.AsyncOpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        max_retries=2,
+                        timeout=self.timeout_seconds,
+                        http_client=openai.DefaultAsyncHttpxClient(event_hooks=self._quota_hooks('openai'))
+                    ),
                     'type': 'openai',
                     'available': True,
                     'uses_connection_pool': HAS_AIOHTTP,
@@ -198,14 +329,14 @@ class LLMService:
         # Anthropic with enhanced connection pooling
         if HAS_ANTHROPIC and os.getenv("ANTHROPIC_API_KEY") and not is_test_mode:
             try:
-                anthropic_client = anthropic.AsyncAnthropic(
-                    api_key=os.getenv("ANTHROPIC_API_KEY"),
-                    max_retries=2,
-                    timeout=self.timeout_seconds
-                )
-                
                 self.providers['anthropic'] = {
-                    'client': anthropic_client,
+                    'client': None,
+                    'client_factory': lambda: anthropic.AsyncAnthropic(
+                        api_key=os.getenv("ANTHROPIC_API_KEY"),
+                        max_retries=2,
+                        timeout=self.timeout_seconds,
+                        http_client=anthropic.DefaultAsyncHttpxClient(event_hooks=self._quota_hooks('anthropic'))
+                    ),
                     'type': 'anthropic',
                     'available': True,
                     'uses_connection_pool': HAS_AIOHTTP,
@@ -225,154 +356,660 @@ class LLMService:
         
         logger.info(f"Configured {len(self.providers)} LLM providers with connection pooling")
 
-    def estimate_tokens(self, prompt: str) -> int:
-        """Rough estimation of tokens (4 chars = 1 token)"""
-        return len(prompt) // 4 + 100  # Add buffer for response
+    def _setup_mock_providers(self, base_url: str):
+        """Point the OpenAI and Anthropic providers at a local mock server (backend.mock_llm_server)"""
+        if HAS_OPENAI:
+            self.providers['openai'] = {
+                'client': None,
+                'client_factory': lambda: openai.AsyncOpenAI(
+                    api_key="mock-key",
+                    base_url=f"{base_url}/v1",
+                    max_retries=0,
+                    timeout=self.timeout_seconds,
+                    http_client=openai.DefaultAsyncHttpxClient(event_hooks=self._quota_hooks('openai'))
+                ),
+                'type': 'openai',
+                'available': True,
+                'uses_connection_pool': HAS_AIOHTTP,
+                'config': {
+                    'model': 'gpt-3.5-turbo',
+                    'temperature': 0.7,
+                    'max_tokens': 4000
+                }
+            }
+            self.performance_metrics['provider_usage']['openai'] = 0
+
+        if HAS_ANTHROPIC:
+            self.providers['anthropic'] = {
+                'client': None,
+                'client_factory': lambda: anthropic.AsyncAnthropic(
+                    api_key="mock-key",
+                    base_url=base_url,
+                    max_retries=0,
+                    timeout=self.timeout_seconds,
+                    http_client=anthropic.DefaultAsyncHttpxClient(event_hooks=self._quota_hooks('anthropic'))
+                ),
+                'type': 'anthropic',
+                'available': True,
+                'uses_connection_pool': HAS_AIOHTTP,
+                'config': {
+                    'model': 'claude-3-haiku-20240307',
+                    'temperature': 0.7,
+                    'max_tokens': 4000
+                }
+            }
+            self.performance_metrics['provider_usage']['anthropic'] = 0
+
+        logger.info(f"LLM providers pointed at mock server {base_url}: {list(self.providers.keys())}")
+
+    def _get_client(self, provider_name: str):
+        """Get a provider's SDK client, importing the SDK and creating the client on first use"""
+        provider = self.providers[provider_name]
+        if provider['client'] is None:
+            provider['client'] = provider['client_factory']()
+            logger.info(f"Created {provider_name} client on first use")
+        return provider['client']
+
+    def _quota_hooks(self, provider_name: str) -> dict:
+        """httpx event hooks that sync every response's rate limit headers into the rate limiter"""
+        async def sync_quota(response):
+            rate_limiter.sync_quota(provider_name, response.headers)
+        return {'response': [sync_quota]}
+
+    def _concurrency_limiter(self, provider_name: str) -> AdaptiveConcurrencyLimiter:
+        limiter = self.concurrency_limiters.get(provider_name)
+        if limiter is None:
+            from backend.dynamic_config import get_dynamic_config
+            config = get_dynamic_config()
+            limiter = AdaptiveConcurrencyLimiter(
+                provider_name,
+                initial_limit=config.get("LLM_CONCURRENCY_INITIAL", 4, "integer"),
+                min_limit=config.get("LLM_CONCURRENCY_MIN", 1, "integer"),
+                max_limit=config.get("LLM_CONCURRENCY_MAX", 32, "integer"),
+                enabled=config.get("LLM_ADAPTIVE_CONCURRENCY", True, "boolean")
+            )
+            self.concurrency_limiters[provider_name] = limiter
+        return limiter
+
+    def _provider_slot(self, provider_name: str):
+        """
+        Hold one of the provider's adaptive in-flight slots. Taken before the
+        rate limit reservation so queued callers don't hold rate budget.
+        """
+        return self._concurrency_limiter(provider_name).slot()
+
+    @asynccontextmanager
+    async def _provider_call(self, provider_name: str):
+        """
+        Feed a call made under _provider_slot back into the adaptive limit. The
+        limit grows while latency holds steady and is cut on 429/overload.
+        """
+        limiter = self._concurrency_limiter(provider_name)
+        call_start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if _is_overload_error(e):
+                limiter.record_overload()
+            raise
+        limiter.record_success(time.monotonic() - call_start)
+
+    def _use_test_mode_stub(self) -> bool:
+        """TEST_MODE short-circuits generation unless a mock provider server is configured"""
+        from backend.dynamic_config import get_dynamic_config
+        config = get_dynamic_config()
+        return config.get("TEST_MODE", False, "boolean") and not config.get("LLM_MOCK_SERVER_URL", "")
+
+    def _setup_circuit_breakers(self) -> Dict[str, CircuitBreaker]:
+        """Create a circuit breaker for each configured provider"""
+        from backend.dynamic_config import get_dynamic_config
+        config = get_dynamic_config()
+        failure_threshold = config.get("LLM_BREAKER_FAILURE_THRESHOLD", 5, "integer")
+        cooldown_seconds = config.get("LLM_BREAKER_COOLDOWN_SECONDS", 30.0, "float")
+        return {
+            name: CircuitBreaker(name, failure_threshold=failure_threshold, cooldown_seconds=cooldown_seconds)
+            for name in self.providers
+        }
+
+    def _setup_response_cache(self) -> Optional[LLMResponseCache]:
+        """Create the response cache from configuration, or None if disabled"""
+        from backend.dynamic_config import get_dynamic_config
+        config = get_dynamic_config()
+        if not config.get("LLM_CACHE_ENABLED", True, "boolean"):
+            logger.info("LLM response cache disabled")
+            return None
+
+        return LLMResponseCache(
+            max_entries=config.get("LLM_CACHE_MAX_ENTRIES", 512, "integer"),
+            ttl_seconds=config.get("LLM_CACHE_TTL_SECONDS", 3600, "float"),
+            db_path=config.get("LLM_CACHE_DB_PATH", "") or None
+        )
+
+    def _cache_key(self, provider_name: str, prompt: str) -> str:
+        """Build the response cache key for a provider/prompt pair"""
+        config = self.providers[provider_name]['config']
+        return make_cache_key(provider_name, config.get('model', provider_name), config.get('temperature', 0), prompt)
+
+    def _flight_key(self, provider_name: str, prompt: Union[str, PromptMessages], priority: str) -> str:
+        """Single-flight key: a call is only shared with callers of the same scheduler priority"""
+        return f"{priority}:{self._cache_key(provider_name, prompt)}"
+
+    async def _cache_lookup(self, providers_to_try: list, prompt: str) -> Optional[tuple]:
+        """Return (provider_name, response) for the first provider with a cached answer"""
+        for provider_name in providers_to_try:
+            cached = await self.response_cache.get(self._cache_key(provider_name, prompt), count_miss=False)
+            if cached is not None:
+                return provider_name, cached
+        # One lookup, one miss, however many providers were probed
+        self.response_cache.record_miss()
+        return None
+
+    def estimate_tokens(self, prompt: str, provider: str = "openai") -> int:
+        """Count prompt tokens with the provider's tokenizer (or a heuristic fallback)"""
+        model = self.providers.get(provider, {}).get('config', {}).get('model')
+        return self.token_counter.count(provider, prompt_text(prompt), model)
+
+    def estimate_request_tokens(self, provider: str, prompt: str, max_tokens: int = None) -> int:
+        """Estimate the tokens a request will reserve: prompt plus expected completion"""
+        from backend.dynamic_config import get_dynamic_config
+        config = self.providers.get(provider, {}).get('config', {})
+        expected_output = min(
+            get_dynamic_config().get("LLM_EXPECTED_OUTPUT_TOKENS", 1000, "integer"),
+            max_tokens or config.get('max_tokens', 4000)
+        )
+        return self.token_counter.estimate_request(provider, prompt_text(prompt), config.get('model'), expected_output)
+
+    def _usage_dict(self, provider: str, prompt, text: str, reported_total=None,
+                    prompt_tokens=None, cached_tokens=None, cache_write_tokens=None,
+                    completion_tokens=None) -> dict:
+        """Build a usage dict, counting locally when the provider didn't report usage"""
+        total = _usage_tokens(reported_total)
+        if total is None:
+            total = self.estimate_tokens(prompt, provider) + self.estimate_tokens(text, provider)
+        completion = _usage_tokens(completion_tokens)
+        return {
+            'total_tokens': total,
+            'completion_tokens': completion if completion is not None else self.estimate_tokens(text, provider),
+            'prompt_tokens': _usage_tokens(prompt_tokens) or 0,
+            'cached_tokens': _usage_tokens(cached_tokens) or 0,
+            'cache_write_tokens': _usage_tokens(cache_write_tokens) or 0
+        }
+
+    def _openai_usage(self, prompt, text: str, usage) -> dict:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        return self._usage_dict(
+            'openai', prompt, text,
+            reported_total=getattr(usage, 'total_tokens', None),
+            prompt_tokens=getattr(usage, 'prompt_tokens', None),
+            cached_tokens=getattr(details, 'cached_tokens', None),
+            completion_tokens=getattr(usage, 'completion_tokens', None)
+        )
+
+    def _anthropic_usage(self, prompt, text: str, usage) -> dict:
+        input_tokens = _usage_tokens(getattr(usage, 'input_tokens', None))
+        output_tokens = _usage_tokens(getattr(usage, 'output_tokens', None))
+        cache_read = _usage_tokens(getattr(usage, 'cache_read_input_tokens', None)) or 0
+        cache_write = _usage_tokens(getattr(usage, 'cache_creation_input_tokens', None)) or 0
+        reported = None
+        if input_tokens is not None and output_tokens is not None:
+            # input_tokens excludes tokens read from or written to the prompt cache
+            reported = input_tokens + cache_read + cache_write + output_tokens
+        return self._usage_dict(
+            'anthropic', prompt, text, reported,
+            prompt_tokens=(input_tokens or 0) + cache_read + cache_write,
+            cached_tokens=cache_read,
+            cache_write_tokens=cache_write,
+            completion_tokens=output_tokens
+        )
 
-    async def _call_google(self, client, prompt: str) -> str:
-        """Call Google AI API"""
-        response = await asyncio.to_thread(
+    def _track_prompt_cache(self, provider_name: str, usage: dict):
+        """Accumulate provider-reported prompt cache reads and writes"""
+        stats = self.prompt_cache_metrics.setdefault(provider_name, {
+            'requests': 0,
+            'cache_hits': 0,
+            'prompt_tokens': 0,
+            'cached_tokens': 0,
+            'cache_write_tokens': 0
+        })
+        stats['requests'] += 1
+        stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+        stats['cached_tokens'] += usage.get('cached_tokens', 0)
+        stats['cache_write_tokens'] += usage.get('cache_write_tokens', 0)
+        if usage.get('cached_tokens'):
+            stats['cache_hits'] += 1
+
+    def get_prompt_cache_stats(self) -> dict:
+        """Cached prompt tokens per provider and overall"""
+        totals = {'requests': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'cache_write_tokens': 0}
+        for stats in self.prompt_cache_metrics.values():
+            for name in totals:
+                totals[name] += stats[name]
+        return {
+            **totals,
+            'cached_token_ratio': totals['cached_tokens'] / totals['prompt_tokens'] if totals['prompt_tokens'] else 0.0,
+            'by_provider': {name: dict(stats) for name, stats in self.prompt_cache_metrics.items()}
+        }
+
+    async def _call_google(self, client, prompt: str, max_tokens: int = None) -> dict:
+        """Call Google AI API on the dedicated Google executor"""
+        response = await get_provider_executor('google').run(
             client.generate_content,
-            prompt,
+            prompt_text(prompt),
             generation_config=genai.types.GenerationConfig(
                 temperature=0.7,
+                **({'max_output_tokens': max_tokens} if max_tokens else {})
             ),
         )
         
         if response.parts:
-            return response.text.strip()
+            text = response.text.strip()
+            metadata = getattr(response, 'usage_metadata', None)
+            candidates = getattr(response, 'candidates', None) or [None]
+            finish_reason = getattr(getattr(candidates[0], 'finish_reason', None), 'name', None)
+            return {
+                'text': text,
+                'truncated': finish_reason == 'MAX_TOKENS',
+                'usage': self._usage_dict(
+                    'google', prompt, text, getattr(metadata, 'total_token_count', None),
+                    completion_tokens=getattr(metadata, 'candidates_token_count', None)
+                )
+            }
         else:
-            raise GoogleAPICallError("Empty response from Google AI")
+            raise google_exceptions.GoogleAPICallError("Empty response from Google AI")
 
-    async def _call_openai(self, client, prompt: str) -> str:
+    async def _call_openai(self, client, prompt: str, max_tokens: int = None) -> dict:
         """Call OpenAI API with connection pooling"""
         config = self.providers['openai']['config']
         response = await client.chat.completions.create(
             model=config['model'],
-            messages=[{"role": "user", "content": prompt}],
+            messages=openai_messages(prompt),
             temperature=config['temperature'],
-            max_tokens=config['max_tokens'],
+            max_tokens=max_tokens or config['max_tokens'],
             timeout=self.timeout_seconds
         )
-        return response.choices[0].message.content.strip()
+        text = response.choices[0].message.content.strip()
+        return {
+            'text': text,
+            'truncated': response.choices[0].finish_reason == 'length',
+            'usage': self._openai_usage(prompt, text, getattr(response, 'usage', None))
+        }
 
-    async def _call_anthropic(self, client, prompt: str) -> str:
+    async def _call_anthropic(self, client, prompt: str, max_tokens: int = None) -> dict:
         """Call Anthropic API with connection pooling"""
         config = self.providers['anthropic']['config']
         response = await client.messages.create(
             model=config['model'],
-            messages=[{"role": "user", "content": prompt}],
-            temperature=config['temperature'],
-            max_tokens=config['max_tokens'],
+            **anthropic_request(prompt),
+            **_temperature_kwargs(client.messages.create, config['temperature']),
+            max_tokens=max_tokens or config['max_tokens'],
             timeout=self.timeout_seconds
         )
-        return response.content[0].text.strip()
-
-    @rate_limited("google", estimated_tokens=1500)
-    async def _generate_with_google(self, prompt: str) -> str:
-        """Generate response using Google AI with rate limiting"""
-        provider = self.providers['google']
-        return await self._call_google(provider['client'], prompt)
-
-    @rate_limited("openai", estimated_tokens=1500)
-    async def _generate_with_openai(self, prompt: str) -> str:
-        """Generate response using OpenAI with rate limiting"""
-        provider = self.providers['openai']
-        return await self._call_openai(provider['client'], prompt)
-
-    @rate_limited("anthropic", estimated_tokens=1500)
-    async def _generate_with_anthropic(self, prompt: str) -> str:
-        """Generate response using Anthropic with rate limiting"""
-        provider = self.providers['anthropic']
-        return await self._call_anthropic(provider['client'], prompt)
-
-    def _track_performance(self, provider_name: str, response_time: float, success: bool):
+        text = response.content[0].text.strip()
+        return {
+            'text': text,
+            'truncated': getattr(response, 'stop_reason', None) == 'max_tokens',
+            'usage': self._anthropic_usage(prompt, text, getattr(response, 'usage', None))
+        }
+
+    async def _stream_google(self, client, prompt: str, max_tokens: int = None, outcome: dict = None) -> AsyncIterator[str]:
+        """Stream Google AI deltas. The Gemini client is synchronous, so chunks are
+        produced on the Google executor and handed back to the event loop via a queue."""
+        outcome = {} if outcome is None else outcome
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                stream = client.generate_content(
+                    prompt_text(prompt),
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=0.7,
+                        **({'max_output_tokens': max_tokens} if max_tokens else {})
+                    ),
+                    stream=True,
+                )
+                texts = []
+                last = None
+                for chunk in stream:
+                    if stop.is_set():
+                        # The consumer went away; stop pulling chunks and free the thread
+                        break
+                    last = chunk
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without parts (e.g. safety metadata) carry no text
+                        continue
+                    texts.append(text)
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+                else:
+                    # The last chunk carries the finish reason and usage for the whole response
+                    metadata = getattr(last, 'usage_metadata', None)
+                    candidates = getattr(last, 'candidates', None) or [None]
+                    finish_reason = getattr(getattr(candidates[0], 'finish_reason', None), 'name', None)
+                    outcome['truncated'] = finish_reason == 'MAX_TOKENS'
+                    outcome['usage'] = self._usage_dict(
+                        'google', prompt, "".join(texts), getattr(metadata, 'total_token_count', None),
+                        completion_tokens=getattr(metadata, 'candidates_token_count', None)
+                    )
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        def surface_admission_error(future: asyncio.Future):
+            # A saturated executor rejects the call before produce() runs
+            if not future.cancelled() and future.exception() is not None:
+                queue.put_nowait(future.exception())
+
+        producer = asyncio.ensure_future(get_provider_executor('google').run(produce))
+        producer.add_done_callback(surface_admission_error)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    async def _stream_openai(self, client, prompt: str, max_tokens: int = None, outcome: dict = None) -> AsyncIterator[str]:
+        """Stream OpenAI chat completion deltas"""
+        outcome = {} if outcome is None else outcome
+        config = self.providers['openai']['config']
+        stream = await client.chat.completions.create(
+            model=config['model'],
+            messages=openai_messages(prompt),
+            temperature=config['temperature'],
+            max_tokens=max_tokens or config['max_tokens'],
+            timeout=self.timeout_seconds,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        chunks = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].finish_reason:
+                outcome['truncated'] = chunk.choices[0].finish_reason == 'length'
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, 'usage', None):
+                # Final chunk carries usage for the whole request
+                outcome['usage'] = self._openai_usage(prompt, "".join(chunks), chunk.usage)
+                self._track_prompt_cache('openai', outcome['usage'])
+
+    async def _stream_anthropic(self, client, prompt: str, max_tokens: int = None, outcome: dict = None) -> AsyncIterator[str]:
+        """Stream Anthropic message deltas"""
+        outcome = {} if outcome is None else outcome
+        config = self.providers['anthropic']['config']
+        async with client.messages.stream(
+            model=config['model'],
+            **anthropic_request(prompt),
+            **_temperature_kwargs(client.messages.stream, config['temperature']),
+            max_tokens=max_tokens or config['max_tokens'],
+            timeout=self.timeout_seconds
+        ) as stream:
+            chunks = []
+            async for text in stream.text_stream:
+                chunks.append(text)
+                yield text
+            final = await stream.get_final_message()
+            outcome['truncated'] = getattr(final, 'stop_reason', None) == 'max_tokens'
+            outcome['usage'] = self._anthropic_usage(prompt, "".join(chunks), final.usage)
+            self._track_prompt_cache('anthropic', outcome['usage'])
+
+    def _stream_provider(self, provider_name: str, prompt: str, max_tokens: int = None,
+                         outcome: dict = None) -> AsyncIterator[str]:
+        """
+        Dispatch a streaming call to the given provider. Once the stream ends,
+        outcome (if given) holds its 'usage' and whether it was 'truncated' at max_tokens.
+        """
+        client = self._get_client(provider_name)
+        if provider_name == 'google':
+            return self._stream_google(client, prompt, max_tokens, outcome)
+        if provider_name == 'openai':
+            return self._stream_openai(client, prompt, max_tokens, outcome)
+        if provider_name == 'anthropic':
+            return self._stream_anthropic(client, prompt, max_tokens, outcome)
+        raise ValueError(f"Streaming not supported for provider {provider_name}")
+
+    async def _generate_with_google(self, prompt: str, max_tokens: int = None) -> dict:
+        """Generate response using Google AI with concurrency and rate limiting"""
+        async with self._provider_slot('google'):
+            return await self._rate_limited_google(prompt, max_tokens)
+
+    @rate_limited("google", estimator=lambda self, prompt, max_tokens=None: self.estimate_request_tokens("google", prompt, max_tokens))
+    async def _rate_limited_google(self, prompt: str, max_tokens: int = None) -> dict:
+        async with self._provider_call('google'):
+            return await self._call_google(self._get_client('google'), prompt, max_tokens)
+
+    async def _generate_with_openai(self, prompt: str, max_tokens: int = None) -> dict:
+        """Generate response using OpenAI with concurrency and rate limiting"""
+        async with self._provider_slot('openai'):
+            return await self._rate_limited_openai(prompt, max_tokens)
+
+    @rate_limited("openai", estimator=lambda self, prompt, max_tokens=None: self.estimate_request_tokens("openai", prompt, max_tokens))
+    async def _rate_limited_openai(self, prompt: str, max_tokens: int = None) -> dict:
+        async with self._provider_call('openai'):
+            return await self._call_openai(self._get_client('openai'), prompt, max_tokens)
+
+    async def _generate_with_anthropic(self, prompt: str, max_tokens: int = None) -> dict:
+        """Generate response using Anthropic with concurrency and rate limiting"""
+        async with self._provider_slot('anthropic'):
+            return await self._rate_limited_anthropic(prompt, max_tokens)
+
+    @rate_limited("anthropic", estimator=lambda self, prompt, max_tokens=None: self.estimate_request_tokens("anthropic", prompt, max_tokens))
+    async def _rate_limited_anthropic(self, prompt: str, max_tokens: int = None) -> dict:
+        async with self._provider_call('anthropic'):
+            return await self._call_anthropic(self._get_client('anthropic'), prompt, max_tokens)
+
+    def _provider_model(self, provider_name: str) -> Optional[str]:
+        return self.providers.get(provider_name, {}).get('config', {}).get('model')
+
+    def _track_performance(self, provider_name: str, response_time: float, success: bool, agent_name: str = None):
         """Track performance metrics for monitoring and optimization"""
         self.performance_metrics['total_requests'] += 1
         
         if success:
             self.performance_metrics['successful_requests'] += 1
+            # Bounded deque keeps the last 100 response times for the moving average
             self.performance_metrics['response_times'].append(response_time)
             
-            # Keep only last 100 response times for moving average
-            if len(self.performance_metrics['response_times']) > 100:
-                self.performance_metrics['response_times'] = self.performance_metrics['response_times'][-100:]
-            
             # Update average
             self.performance_metrics['average_response_time'] = sum(self.performance_metrics['response_times']) / len(self.performance_metrics['response_times'])
+
+            self.provider_response_times.setdefault(provider_name, deque(maxlen=100)).append(response_time)
         else:
             self.performance_metrics['failed_requests'] += 1
+
+        if provider_name in self.providers:
+            self.router.record(provider_name, response_time, success)
+            self.latency_histograms.record(
+                response_time,
+                provider=provider_name,
+                model=self._provider_model(provider_name),
+                agent=agent_name,
+                outcome='success' if success else 'error'
+            )
         
         # Track provider usage
         if provider_name in self.performance_metrics['provider_usage']:
             self.performance_metrics['provider_usage'][provider_name] += 1
 
-    async def generate_response(self, prompt: str, agent_name: str, preferred_provider: str = None) -> str:
+    def _track_time_to_first_token(self, provider_name: str, ttft: float, agent_name: str = None):
+        """Track time-to-first-token for streamed responses"""
+        samples = self.performance_metrics['time_to_first_token']
+        samples.append(ttft)
+        self.performance_metrics['average_time_to_first_token'] = sum(samples) / len(samples)
+        self.ttft_histograms.record(ttft, provider=provider_name, model=self._provider_model(provider_name), agent=agent_name)
+        logger.debug(f"Time to first token from {provider_name}: {ttft:.2f}s")
+
+    def _get_providers_to_try(self, preferred_provider: str = None) -> list:
+        """Resolve the ordered list of available providers for a request"""
+        # Filter to only available providers with a closed (or probe-ready) circuit, ranked by the router
+        available = [
+            p for p in self.provider_priority
+            if p in self.providers and self.providers[p]['available'] and self.circuit_breakers[p].is_available()
+        ]
+        providers_to_try = self.router.rank(available)
+
+        if preferred_provider in providers_to_try:
+            providers_to_try = [preferred_provider] + [p for p in providers_to_try if p != preferred_provider]
+        return providers_to_try
+
+    def explain_routing(self, policy: str = None) -> dict:
+        """Explain how available providers are currently ranked"""
+        available = [
+            p for p in self.provider_priority
+            if p in self.providers and self.providers[p]['available'] and self.circuit_breakers[p].is_available()
+        ]
+        return {
+            'policy': policy if policy in self.router.policies else self.router.policy,
+            'available_policies': list(self.router.policies.keys()),
+            'static_priority': list(self.provider_priority),
+            'ranking': self.router.explain(available, policy)
+        }
+
+    async def generate_response(
+        self,
+        prompt: Union[str, PromptMessages],
+        agent_name: str,
+        preferred_provider: str = None,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        use_cache: bool = True,
+        priority: str = WORKFLOW,
+        session_id: str = None,
+        system_prompt: str = None
+    ) -> str:
         """
         Generate response with automatic provider fallback, rate limiting, and performance tracking.
         Enhanced with connection pooling for improved performance.
+
+        If on_delta is given the response is streamed and each text delta is awaited
+        through the callback as it arrives; the full response is still returned.
+        Pass use_cache=False for creative runs that should not reuse earlier answers.
+        Provider calls queue in the scheduler by priority ("interactive", "workflow",
+        "background") and are shared fairly between session_ids.
+        A system_prompt is sent separately from the prompt so providers can cache it.
         """
+        if system_prompt is not None:
+            prompt = PromptMessages(as_prompt_messages(prompt).messages, system_prompt)
+
+        if on_delta is not None:
+            async def stream_to_caller():
+                chunks = []
+                async for delta in self.generate_stream(prompt, agent_name, preferred_provider, use_cache=use_cache,
+                                                        priority=priority, session_id=session_id):
+                    chunks.append(delta)
+                    await on_delta(delta)
+                return "".join(chunks).strip()
+
+            providers = self._get_providers_to_try(preferred_provider)
+            if not providers or not use_cache:
+                return await stream_to_caller()
+
+            result, coalesced = await self.single_flight.do(self._flight_key(providers[0], prompt, priority), stream_to_caller)
+            if coalesced:
+                # Joined another caller's request, deliver its output as a single delta
+                await on_delta(result)
+            return result
+
         start_time = time.time()
         
         # Check test mode dynamically
-        from backend.dynamic_config import get_dynamic_config
-        config = get_dynamic_config()
-        if config.get("TEST_MODE", False, "boolean"):
+        if self._use_test_mode_stub():
             return f"Mocked LLM Result for {agent_name}"
 
-        # Determine provider order
-        if preferred_provider and preferred_provider in self.providers:
-            providers_to_try = [preferred_provider] + [p for p in self.provider_priority if p != preferred_provider]
-        else:
-            providers_to_try = self.provider_priority
-
-        # Filter to only available providers
-        providers_to_try = [p for p in providers_to_try if p in self.providers and self.providers[p]['available']]
+        providers_to_try = self._get_providers_to_try(preferred_provider)
 
         if not providers_to_try:
             self._track_performance("none", time.time() - start_time, False)
             raise Exception("No LLM providers available")
 
+        cache_enabled = self.response_cache is not None and use_cache
+        if self.response_cache is not None and not use_cache:
+            self.response_cache.record_bypass()
+        if cache_enabled:
+            cached = await self._cache_lookup(providers_to_try, prompt)
+            if cached:
+                logger.info(f"Serving cached {cached[0]} response for {agent_name}")
+                return cached[1]
+
+        async def scheduled_call():
+            async with self.scheduler.slot(priority, session_id):
+                return await self._generate_with_fallback(prompt, agent_name, providers_to_try, cache_enabled, start_time)
+
+        if not use_cache:
+            # A fresh answer was asked for, so don't share another caller's
+            return await scheduled_call()
+
+        result, coalesced = await self.single_flight.do(self._flight_key(providers_to_try[0], prompt, priority), scheduled_call)
+        if coalesced:
+            logger.info(f"Coalesced {agent_name} request with an identical in-flight request")
+        return result
+
+    async def generate_messages(
+        self,
+        messages: List[Dict[str, str]],
+        agent_name: str,
+        system_prompt: str = None,
+        **kwargs
+    ) -> str:
+        """
+        Generate a response to a conversation given as [{"role": "user"|"assistant", "content": ...}].
+        The system prompt is marked as a cache breakpoint for providers that support one.
+        Accepts the same keyword arguments as generate_response.
+        """
+        return await self.generate_response(PromptMessages.build(messages, system_prompt), agent_name, **kwargs)
+
+    async def _generate_with_fallback(
+        self,
+        prompt: str,
+        agent_name: str,
+        providers_to_try: list,
+        cache_enabled: bool,
+        start_time: float
+    ) -> str:
+        """Try each provider in order until one succeeds, hedging slow calls when enabled"""
         last_error = None
-        
-        for provider_name in providers_to_try:
-            provider_start_time = time.time()
+        remaining = list(providers_to_try)
+        # Only requests that could be hedged earn hedge budget
+        if len(remaining) > 1 and self._hedging_enabled():
+            self.hedge_metrics['eligible_requests'] += 1
+
+        while remaining:
+            provider_name = remaining.pop(0)
             try:
-                logger.info(f"Attempting {provider_name} for {agent_name} (connection pooling: {self.providers[provider_name].get('uses_connection_pool', False)})")
-                
-                if provider_name == 'google':
-                    result = await self._generate_with_google(prompt)
-                elif provider_name == 'openai':
-                    result = await self._generate_with_openai(prompt)
-                elif provider_name == 'anthropic':
-                    result = await self._generate_with_anthropic(prompt)
+                hedge_delay = self._get_hedge_delay(provider_name) if remaining else None
+                if hedge_delay is None:
+                    result = await self._attempt_provider(provider_name, prompt, agent_name)
                 else:
-                    continue
-                
-                # Track successful request
-                response_time = time.time() - provider_start_time
-                self._track_performance(provider_name, response_time, True)
-                
-                logger.info(f"Successfully used {provider_name} for {agent_name} in {response_time:.2f}s")
+                    provider_name, result = await self._attempt_with_hedge(
+                        provider_name, remaining, prompt, agent_name, hedge_delay
+                    )
+
+                if cache_enabled and result:
+                    await self.response_cache.set(self._cache_key(provider_name, prompt), result)
                 return result
-                
+
             except Exception as e:
                 last_error = e
-                response_time = time.time() - provider_start_time
-                self._track_performance(provider_name, response_time, False)
-                
-                logger.warning(f"Provider {provider_name} failed for {agent_name} in {response_time:.2f}s: {e}")
-                
+
                 # Mark provider as temporarily unavailable if it's a rate limit
                 if "rate limit" in str(e).lower():
                     logger.warning(f"Rate limit hit for {provider_name}, trying next provider")
-                
+
                 # If this was the last provider, don't continue
-                if provider_name == providers_to_try[-1]:
+                if not remaining:
                     break
-                
-                # Wait a bit before trying next provider
-                await asyncio.sleep(1)
+
+                # Wait a bit before trying next provider, unless it was rejected without a call
+                if not isinstance(e, (CircuitOpenError, ExecutorSaturatedError)):
+                    await asyncio.sleep(1)
 
         # If we get here, all providers failed
         total_time = time.time() - start_time
@@ -380,6 +1017,374 @@ class LLMService:
         logger.error(error_msg)
         raise Exception(error_msg)
 
+    async def _attempt_provider(self, provider_name: str, prompt: str, agent_name: str) -> str:
+        """Call a single provider, tracking latency and outcome"""
+        breaker = self.circuit_breakers[provider_name]
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"Circuit open for {provider_name}")
+        probe = breaker.state == HALF_OPEN
+
+        provider_start_time = time.time()
+        try:
+            logger.info(f"Attempting {provider_name} for {agent_name} (connection pooling: {self.providers[provider_name].get('uses_connection_pool', False)})")
+
+            generators = {
+                'google': self._generate_with_google,
+                'openai': self._generate_with_openai,
+                'anthropic': self._generate_with_anthropic
+            }
+            if provider_name not in generators:
+                raise ValueError(f"Unknown provider {provider_name}")
+
+            # Adaptive max_tokens from this agent's output history; a response
+            # cut off below the provider maximum is retried with a larger budget
+            ceiling = self.providers[provider_name]['config'].get('max_tokens', 4000)
+            budget = self.output_budget.max_tokens_for(agent_name, ceiling)
+            while True:
+                result = await generators[provider_name](prompt, **({'max_tokens': budget} if budget < ceiling else {}))
+                if not isinstance(result, dict):
+                    break
+                self._track_prompt_cache(provider_name, result.get('usage', {}))
+                if not result.get('truncated'):
+                    self.output_budget.record(agent_name, result.get('usage', {}).get('completion_tokens', 0))
+                    break
+                budget = self.output_budget.retry_budget(agent_name, budget, ceiling)
+                if budget is None:
+                    break
+
+            if isinstance(result, dict):
+                result = result['text']
+
+            # Track successful request
+            response_time = time.time() - provider_start_time
+            self._track_performance(provider_name, response_time, True, agent_name)
+            breaker.record_success()
+
+            logger.info(f"Successfully used {provider_name} for {agent_name} in {response_time:.2f}s")
+            return result
+
+        except asyncio.CancelledError:
+            # Hedge losers are cancelled; that says nothing about provider health
+            breaker.release(probe)
+            raise
+
+        except (ExecutorSaturatedError, RateLimitTimeout) as e:
+            # Local back-pressure, not a provider failure
+            breaker.release(probe)
+            logger.warning(f"Provider {provider_name} skipped for {agent_name}: {e}")
+            raise
+
+        except Exception as e:
+            response_time = time.time() - provider_start_time
+            self._track_performance(provider_name, response_time, False, agent_name)
+            breaker.record_failure(e, rate_limited=_is_rate_limit_error(e))
+            logger.warning(f"Provider {provider_name} failed for {agent_name} in {response_time:.2f}s: {e}")
+            raise
+
+    def _get_hedge_delay(self, provider_name: str) -> Optional[float]:
+        """
+        Return how long to wait on provider_name before hedging, or None if hedging
+        is disabled or there is not enough latency history to pick a threshold.
+        """
+        from backend.dynamic_config import get_dynamic_config
+        config = get_dynamic_config()
+        if not self._hedging_enabled():
+            return None
+
+        samples = self.provider_response_times.get(provider_name)
+        if not samples or len(samples) < config.get("LLM_HEDGE_MIN_SAMPLES", 20, "integer"):
+            return None
+
+        percentile = min(max(config.get("LLM_HEDGE_PERCENTILE", 95.0, "float"), 1.0), 100.0)
+        ordered = sorted(samples)
+        index = max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)
+        return ordered[index]
+
+    def _hedging_enabled(self) -> bool:
+        from backend.dynamic_config import get_dynamic_config
+        return get_dynamic_config().get("LLM_HEDGING_ENABLED", False, "boolean")
+
+    def _hedge_budget_available(self) -> bool:
+        """Check that firing another hedge stays within the configured extra-spend budget"""
+        from backend.dynamic_config import get_dynamic_config
+        budget_percent = get_dynamic_config().get("LLM_HEDGE_BUDGET_PERCENT", 10.0, "float")
+        allowed = self.hedge_metrics['eligible_requests'] * budget_percent / 100
+        return self.hedge_metrics['hedges_fired'] + 1 <= allowed
+
+    async def _attempt_with_hedge(
+        self,
+        primary: str,
+        remaining: list,
+        prompt: str,
+        agent_name: str,
+        hedge_delay: float
+    ) -> tuple:
+        """
+        Call primary and, if it has not answered within hedge_delay, race the next
+        provider against it. The first success wins and the other call is cancelled.
+        The hedge provider is removed from remaining so fallback does not retry it.
+        Returns (provider_name, result).
+        """
+        primary_task = asyncio.ensure_future(self._attempt_provider(primary, prompt, agent_name))
+        tasks = {primary_task: primary}
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=hedge_delay)
+            if done:
+                return primary, primary_task.result()
+
+            if not self._hedge_budget_available():
+                self.hedge_metrics['budget_denied'] += 1
+                return primary, await primary_task
+
+            secondary = remaining.pop(0)
+            self.hedge_metrics['hedges_fired'] += 1
+            logger.info(f"{primary} exceeded {hedge_delay:.2f}s for {agent_name}, hedging with {secondary}")
+            tasks[asyncio.ensure_future(self._attempt_provider(secondary, prompt, agent_name))] = secondary
+
+            pending = set(tasks)
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] == secondary:
+                            self.hedge_metrics['hedge_wins'] += 1
+                        return tasks[task], task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            # The race loser, or every call if the caller itself was cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def generate_stream(
+        self,
+        prompt: Union[str, PromptMessages],
+        agent_name: str,
+        preferred_provider: str = None,
+        use_cache: bool = True,
+        priority: str = WORKFLOW,
+        session_id: str = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response as text deltas with the same provider fallback, rate limiting and
+        scheduling as generate_response. Fallback to the next provider only happens before
+        the first delta has been yielded; once output has reached the caller, errors propagate.
+        A cached response is yielded as a single delta.
+        """
+        start_time = time.time()
+
+        if self._use_test_mode_stub():
+            yield f"Mocked LLM Result for {agent_name}"
+            return
+
+        providers_to_try = self._get_providers_to_try(preferred_provider)
+
+        if not providers_to_try:
+            self._track_performance("none", time.time() - start_time, False)
+            raise Exception("No LLM providers available")
+
+        cache_enabled = self.response_cache is not None and use_cache
+        if self.response_cache is not None and not use_cache:
+            self.response_cache.record_bypass()
+        if cache_enabled:
+            cached = await self._cache_lookup(providers_to_try, prompt)
+            if cached:
+                logger.info(f"Serving cached {cached[0]} response for {agent_name}")
+                yield cached[1]
+                return
+
+        self.performance_metrics['streaming_requests'] += 1
+        async with self.scheduler.slot(priority, session_id):
+            async with aclosing(self._stream_with_fallback(prompt, agent_name, providers_to_try, cache_enabled, start_time)) as stream:
+                async for delta in stream:
+                    yield delta
+
+    async def _stream_with_fallback(
+        self,
+        prompt: str,
+        agent_name: str,
+        providers_to_try: list,
+        cache_enabled: bool,
+        start_time: float
+    ) -> AsyncIterator[str]:
+        """Stream from each provider in turn until one produces output"""
+        last_error = None
+
+        for provider_name in providers_to_try:
+            provider_start_time = time.time()
+            first_token_at = None
+            chunks = []
+            breaker = self.circuit_breakers[provider_name]
+            if not breaker.allow_request():
+                last_error = CircuitOpenError(f"Circuit open for {provider_name}")
+                continue
+            probe = breaker.state == HALF_OPEN
+            try:
+                logger.info(f"Streaming from {provider_name} for {agent_name}")
+
+                # Adaptive max_tokens as in _attempt_provider. Output cut off at the
+                # budget has already reached the caller, so instead of retrying, the
+                # stream continues from the partial text with a larger budget.
+                ceiling = self.providers[provider_name]['config'].get('max_tokens', 4000)
+                budget = self.output_budget.max_tokens_for(agent_name, ceiling)
+                request_prompt = prompt
+                completion_tokens = 0
+                while True:
+                    outcome = {}
+                    segment = []
+                    async with self._provider_slot(provider_name):
+                        rate_record = await rate_limiter.reserve(
+                            provider_name, self.estimate_request_tokens(provider_name, request_prompt, budget)
+                        )
+                        if rate_record is None:
+                            raise RateLimitTimeout(f"Rate limit exceeded for {provider_name}")
+
+                        async with self._provider_call(provider_name), \
+                                aclosing(self._stream_provider(provider_name, request_prompt,
+                                                               budget if budget < ceiling else None, outcome)) as stream:
+                            async for delta in stream:
+                                if not delta:
+                                    continue
+                                if first_token_at is None:
+                                    first_token_at = time.time()
+                                    self._track_time_to_first_token(provider_name, first_token_at - provider_start_time, agent_name)
+                                segment.append(delta)
+                                chunks.append(delta)
+                                yield delta
+
+                    usage = outcome.get('usage') or self._usage_dict(provider_name, request_prompt, "".join(segment))
+                    rate_limiter.update_actual_usage(provider_name, usage['total_tokens'], rate_record)
+                    completion_tokens += usage.get('completion_tokens', 0)
+                    if not outcome.get('truncated'):
+                        self.output_budget.record(agent_name, completion_tokens)
+                        break
+                    budget = self.output_budget.retry_budget(agent_name, budget, ceiling)
+                    if budget is None:
+                        break
+                    request_prompt = continuation_prompt(prompt, "".join(chunks))
+
+                response_time = time.time() - provider_start_time
+                self._track_performance(provider_name, response_time, True, agent_name)
+                breaker.record_success()
+                logger.info(f"Streamed {provider_name} response for {agent_name} in {response_time:.2f}s")
+                if cache_enabled and chunks:
+                    await self.response_cache.set(self._cache_key(provider_name, prompt), "".join(chunks).strip())
+                return
+
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release(probe)
+                raise
+
+            except Exception as e:
+                last_error = e
+                response_time = time.time() - provider_start_time
+                self._track_performance(provider_name, response_time, False, agent_name)
+                if isinstance(e, (ExecutorSaturatedError, RateLimitTimeout)):
+                    breaker.release(probe)
+                else:
+                    breaker.record_failure(e, rate_limited=_is_rate_limit_error(e))
+
+                logger.warning(f"Streaming from {provider_name} failed for {agent_name} in {response_time:.2f}s: {e}")
+
+                # Deltas already reached the caller, retrying elsewhere would duplicate output
+                if first_token_at is not None:
+                    raise
+
+                if provider_name == providers_to_try[-1]:
+                    break
+
+                # Wait a bit before trying next provider, unless it was rejected without a call
+                if not isinstance(e, (ExecutorSaturatedError, RateLimitTimeout)):
+                    await asyncio.sleep(1)
+
+        total_time = time.time() - start_time
+        error_msg = f"All LLM providers failed to stream for {agent_name} in {total_time:.2f}s. Last error: {last_error}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
+    def _pick_batch_provider(self, in_flight: Dict[str, int]) -> Optional[str]:
+        """Pick the provider with the most rate-limit headroom per in-flight batch item"""
+        candidates = self._get_providers_to_try()
+        if not candidates:
+            return None
+        return max(
+            candidates,
+            key=lambda p: (self.router.headroom(p) / (1 + in_flight.get(p, 0)), -candidates.index(p))
+        )
+
+    async def generate_batch_stream(
+        self,
+        prompts: List[str],
+        agent_name: str = "Batch",
+        concurrency: Optional[int] = None,
+        use_cache: bool = True,
+        priority: str = BACKGROUND
+    ) -> AsyncIterator[BatchItemResult]:
+        """
+        Run many prompts with bounded concurrency, yielding results as they complete.
+
+        Items are spread across providers by remaining rate-limit headroom; each item
+        still falls back to other providers on failure. A failed item is reported in
+        its BatchItemResult and never aborts the rest of the batch.
+        """
+        if concurrency is None:
+            from backend.dynamic_config import get_dynamic_config
+            concurrency = get_dynamic_config().get("LLM_BATCH_CONCURRENCY", 4, "integer")
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        in_flight: Dict[str, int] = {}
+
+        async def run_item(index: int, prompt: str) -> BatchItemResult:
+            async with semaphore:
+                provider = self._pick_batch_provider(in_flight)
+                if provider:
+                    in_flight[provider] = in_flight.get(provider, 0) + 1
+                item_start = time.time()
+                logger.debug(f"Batch item {index} for {agent_name} sent to {provider or 'default providers'}")
+                try:
+                    # Items share the caller's agent name, so latency series and output
+                    # budgets stay per agent rather than per item
+                    response = await self.generate_response(
+                        prompt, agent_name, preferred_provider=provider, use_cache=use_cache,
+                        priority=priority, session_id=agent_name
+                    )
+                    return BatchItemResult(index, prompt, True, response=response,
+                                           provider=provider, duration=time.time() - item_start)
+                except Exception as e:
+                    logger.warning(f"Batch item {index} for {agent_name} failed: {e}")
+                    return BatchItemResult(index, prompt, False, error=str(e),
+                                           provider=provider, duration=time.time() - item_start)
+                finally:
+                    if provider:
+                        in_flight[provider] -= 1
+
+        tasks = [asyncio.ensure_future(run_item(i, prompt)) for i, prompt in enumerate(prompts)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def generate_batch(
+        self,
+        prompts: List[str],
+        agent_name: str = "Batch",
+        concurrency: Optional[int] = None,
+        use_cache: bool = True,
+        priority: str = BACKGROUND
+    ) -> List[BatchItemResult]:
+        """Run many prompts with bounded concurrency and return results in input order"""
+        results = [None] * len(prompts)
+        async for item in self.generate_batch_stream(prompts, agent_name, concurrency, use_cache, priority):
+            results[item.index] = item
+
+        succeeded = sum(1 for item in results if item.success)
+        logger.info(f"Batch for {agent_name} finished: {succeeded}/{len(prompts)} succeeded")
+        return results
+
     def get_provider_status(self) -> dict:
         """Get comprehensive status of all providers with performance metrics"""
         status = {}
@@ -390,6 +1395,7 @@ class LLMService:
                 'uses_connection_pool': provider.get('uses_connection_pool', False),
                 'config': provider.get('config', {}),
                 'rate_limit_status': rate_limiter.get_status(name),
+                'circuit_breaker': self.circuit_breakers[name].get_status(),
                 'usage_count': self.performance_metrics['provider_usage'].get(name, 0)
             }
         return status
@@ -398,45 +1404,64 @@ class LLMService:
         """Get detailed performance metrics"""
         return {
             **self.performance_metrics,
+            'response_times': list(self.performance_metrics['response_times']),
+            'time_to_first_token': list(self.performance_metrics['time_to_first_token']),
             'connection_pool_stats': self.connection_pool.get_stats(),
+            'cache': self.response_cache.get_stats() if self.response_cache else {'enabled': False},
+            'single_flight': self.single_flight.get_stats(),
+            'hedging': dict(self.hedge_metrics),
+            'prompt_cache': self.get_prompt_cache_stats(),
+            'executors': get_executor_stats(),
+            'scheduler': self.scheduler.get_stats(),
+            'health_checks': self.health_checker.get_stats(),
+            'output_budget': self.output_budget.get_stats(),
+            'concurrency': {name: limiter.get_stats() for name, limiter in self.concurrency_limiters.items()},
             'success_rate': (
                 self.performance_metrics['successful_requests'] / 
                 max(self.performance_metrics['total_requests'], 1)
             ) * 100
         }
 
+    def get_model_limits(self) -> List[tuple]:
+        """(model, max_output_tokens) for every configured provider, used to size prompt context"""
+        return [
+            (provider['config'].get('model'), provider['config'].get('max_tokens', 0))
+            for provider in self.providers.values()
+        ]
+
+    def get_latency_report(self, group_by: List[str] = None, windowed: bool = True) -> dict:
+        """
+        Latency percentiles (p50/p90/p99/max) grouped by any of provider, model,
+        agent and outcome, over the sliding window or the process lifetime.
+        """
+        group_by = group_by or ['provider', 'model', 'outcome']
+        ttft_group_by = [label for label in group_by if label in self.ttft_histograms.labels]
+        return {
+            'window_seconds': self.latency_histograms.window_seconds if windowed else None,
+            'group_by': group_by,
+            'response_time': self.latency_histograms.summary(group_by, windowed=windowed),
+            'time_to_first_token': self.ttft_histograms.summary(ttft_group_by, windowed=windowed)
+        }
+
     def get_available_providers(self) -> list:
         """Get list of available provider names"""
         return [name for name, provider in self.providers.items() if provider['available']]
 
-    async def health_check(self) -> dict:
-        """Check health of all providers with connection pool validation"""
-        health = {}
-        
-        for provider_name in self.providers.keys():
-            try:
-                test_prompt = "Hello, respond with 'OK'"
-                start_time = time.time()
-                result = await self.generate_response(test_prompt, f"health_check_{provider_name}", provider_name)
-                response_time = time.time() - start_time
-                
-                health[provider_name] = {
-                    'status': 'healthy',
-                    'response_time': round(response_time, 3),
-                    'response_preview': result[:50] if result else "No response"
-                }
-            except Exception as e:
-                health[provider_name] = {
-                    'status': 'unhealthy',
-                    'error': str(e)
-                }
-        
-        return health
+    async def health_check(self, tier: str = PROBE, force: bool = False) -> dict:
+        """
+        Check health of all providers. tier is "passive" (recent traffic only),
+        "probe" (list-models metadata call, the default) or "full" (a pinned
+        generation request, which spends tokens). Probe and full results are
+        cached; force bypasses the cache.
+        """
+        return await self.health_checker.check(tier, force)
 
     async def cleanup(self):
         """Cleanup resources including connection pools"""
         try:
             await self.connection_pool.close_all()
+            if self.response_cache:
+                self.response_cache.close()
             logger.info("LLM service cleanup completed")
         except Exception as e:
             logger.error(f"Error during LLM service cleanup: {e}")
@@ -448,9 +1473,25 @@ class LLMService:
             'successful_requests': 0,
             'failed_requests': 0,
             'average_response_time': 0,
-            'response_times': [],
-            'provider_usage': {name: 0 for name in self.providers.keys()}
+            'response_times': deque(maxlen=100),
+            'provider_usage': {name: 0 for name in self.providers.keys()},
+            'streaming_requests': 0,
+            'average_time_to_first_token': 0,
+            'time_to_first_token': deque(maxlen=100)
         }
+        if self.response_cache:
+            self.response_cache.reset_metrics()
+        self.single_flight.reset_metrics()
+        self.scheduler.reset_metrics()
+        self.output_budget.reset_metrics()
+        for limiter in self.concurrency_limiters.values():
+            limiter.reset_metrics()
+        self.provider_response_times.clear()
+        self.prompt_cache_metrics.clear()
+        self.latency_histograms.clear()
+        self.ttft_histograms.clear()
+        for name in self.hedge_metrics:
+            self.hedge_metrics[name] = 0
         logger.info("Performance metrics reset")
 
 
@@ -0,0 +1,115 @@
+"""
+Adaptive max_tokens per agent from observed output lengths.
+
+Every provider is configured with max_tokens=4000, but most roles answer in a
+few hundred tokens. Generation time grows with the allowed budget on several
+providers and the rate limiter reserves tokens against it, so once an agent
+has enough history its requests are sent with the p99 of its recent output
+lengths plus headroom (never above the provider's configured max_tokens).
+
+A response cut off at the adaptive budget is retried with twice the budget,
+up to the provider maximum. A stream cut off that way has already reached
+the caller, so it is continued from the partial text with the larger budget.
+
+History is kept for the most recently active agents only, so per-item or
+otherwise unbounded agent names cannot grow it without limit.
+"""
+
+import logging
+import math
+from collections import OrderedDict, deque
+from typing import Deque, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADROOM = 0.25
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_FLOOR_TOKENS = 256
+BUDGET_PERCENTILE = 99.0
+
+# Recent output lengths kept per agent, and agents with history kept
+HISTORY_SIZE = 200
+MAX_AGENTS = 256
+
+
+class OutputBudgetPolicy:
+    """Tracks output token counts per agent and sizes max_tokens from them"""
+
+    def __init__(self, enabled: bool = True, headroom: float = DEFAULT_HEADROOM,
+                 min_samples: int = DEFAULT_MIN_SAMPLES, floor_tokens: int = DEFAULT_FLOOR_TOKENS,
+                 max_agents: int = MAX_AGENTS):
+        self.enabled = enabled
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floor_tokens = floor_tokens
+        self.max_agents = max_agents
+        # Least recently recorded agent first
+        self.output_tokens: "OrderedDict[str, Deque[int]]" = OrderedDict()
+        self.metrics = {
+            'adaptive_requests': 0,
+            'tokens_not_reserved': 0,
+            'truncations': 0,
+            'retries': 0,
+            'agents_evicted': 0
+        }
+
+    def record(self, agent_name: str, output_tokens: int):
+        """Record the length of a response that was not cut off."""
+        if output_tokens <= 0:
+            return
+        samples = self.output_tokens.get(agent_name)
+        if samples is None:
+            samples = self.output_tokens[agent_name] = deque(maxlen=HISTORY_SIZE)
+            if len(self.output_tokens) > self.max_agents:
+                self.output_tokens.popitem(last=False)
+                self.metrics['agents_evicted'] += 1
+        else:
+            self.output_tokens.move_to_end(agent_name)
+        samples.append(output_tokens)
+
+    def observed_percentile(self, agent_name: str, percentile: float = BUDGET_PERCENTILE) -> Optional[int]:
+        samples = self.output_tokens.get(agent_name)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)]
+
+    def max_tokens_for(self, agent_name: str, ceiling: int) -> int:
+        """max_tokens for the next request from agent_name; ceiling until there is enough history."""
+        samples = self.output_tokens.get(agent_name)
+        if not self.enabled or not samples or len(samples) < self.min_samples:
+            return ceiling
+
+        budget = math.ceil(self.observed_percentile(agent_name) * (1 + self.headroom))
+        budget = min(max(budget, self.floor_tokens), ceiling)
+        if budget < ceiling:
+            self.metrics['adaptive_requests'] += 1
+            self.metrics['tokens_not_reserved'] += ceiling - budget
+        return budget
+
+    def retry_budget(self, agent_name: str, budget: int, ceiling: int) -> Optional[int]:
+        """Budget to retry a truncated response with, or None if it already had the maximum."""
+        self.metrics['truncations'] += 1
+        if budget >= ceiling:
+            return None
+        self.metrics['retries'] += 1
+        retry = min(budget * 2, ceiling)
+        logger.info(f"Response for {agent_name} truncated at {budget} tokens, next attempt gets {retry}")
+        return retry
+
+    def get_stats(self) -> dict:
+        return {
+            **self.metrics,
+            'enabled': self.enabled,
+            'headroom': self.headroom,
+            'min_samples': self.min_samples,
+            'agents': len(self.output_tokens),
+            'by_agent': {
+                name: {'samples': len(samples), 'p99': self.observed_percentile(name)}
+                for name, samples in self.output_tokens.items()
+            }
+        }
+
+    def reset_metrics(self):
+        for name in self.metrics:
+            self.metrics[name] = 0
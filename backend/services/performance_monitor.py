@@ -12,6 +12,8 @@ from dataclasses import dataclass, field
 from collections import deque, defaultdict
 from contextlib import asynccontextmanager
 
+from backend.services.latency_histogram import HistogramRegistry
+
 # Try to import psutil, fall back to mock if not available
 try:
     import psutil
@@ -125,6 +127,8 @@ class PerformanceMonitor:
             "avg_duration": 0.0,
             "last_activity": None
         })
+        # Windowed task duration percentiles; averages above hide the tail
+        self.agent_latency = HistogramRegistry(("agent", "outcome"))
         
         # Performance tracking
         self.connection_manager = None
@@ -314,6 +318,7 @@ class PerformanceMonitor:
         agent_stats["total_tasks"] += 1
         agent_stats["total_duration"] += duration
         agent_stats["last_activity"] = time.time()
+        self.agent_latency.record(duration, agent=agent_name, outcome="success" if success else "error")
         
         if success:
             agent_stats["successful_tasks"] += 1
@@ -323,6 +328,14 @@ class PerformanceMonitor:
         # Update average duration
         agent_stats["avg_duration"] = agent_stats["total_duration"] / agent_stats["total_tasks"]
     
+    def get_agent_latency_percentiles(self, windowed: bool = True) -> Dict[str, Any]:
+        """Get p50/p90/p99/max task duration per agent, over the sliding window or lifetime."""
+        return {
+            "window_seconds": self.agent_latency.window_seconds if windowed else None,
+            "by_agent": self.agent_latency.summary(["agent"], windowed=windowed),
+            "by_agent_outcome": self.agent_latency.summary(["agent", "outcome"], windowed=windowed)
+        }
+    
     def get_performance_summary(self, hours: int = 1) -> Dict[str, Any]:
         """Get performance summary for the specified time period."""
         cutoff_time = time.time() - (hours * 3600)
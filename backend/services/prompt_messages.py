@@ -0,0 +1,107 @@
+"""
+Structured prompts for LLMService: a system prompt plus a list of messages.
+
+Sending the large, static role description as a separate system prompt ahead
+of the per-task user message gives every request for a role the same prefix,
+which lets providers cache it:
+
+- Anthropic: the system block is marked as an explicit cache breakpoint
+  (cache_control) and cache reads are reported as cache_read_input_tokens.
+- OpenAI: prompts with a long identical prefix are cached automatically and
+  reported as prompt_tokens_details.cached_tokens.
+- Google: the Gemini client has no per-request system field, so the system
+  prompt is sent as the leading part of the contents.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+VALID_ROLES = ("user", "assistant")
+
+
+@dataclass(frozen=True)
+class PromptMessages:
+    """A system prompt and a conversation, immutable so it can be shared and hashed"""
+    messages: Tuple[Tuple[str, str], ...]
+    system: Optional[str] = None
+    cache_system: bool = True
+
+    @classmethod
+    def build(cls, messages: Iterable[Dict[str, str]], system: Optional[str] = None,
+              cache_system: bool = True) -> "PromptMessages":
+        """Build from [{"role": ..., "content": ...}] dicts."""
+        pairs = []
+        for message in messages:
+            role = message.get("role")
+            if role not in VALID_ROLES:
+                raise ValueError(f"Unsupported message role '{role}', expected one of {VALID_ROLES}")
+            pairs.append((role, str(message.get("content", ""))))
+        if not pairs:
+            raise ValueError("At least one message is required")
+        return cls(tuple(pairs), system or None, cache_system)
+
+    @property
+    def text(self) -> str:
+        """Flattened text, used for token counting, cache keys and Gemini contents."""
+        parts = [self.system] if self.system else []
+        parts.extend(content for _, content in self.messages)
+        return "\n\n".join(parts)
+
+
+Prompt = Union[str, PromptMessages]
+
+
+def as_prompt_messages(prompt: Prompt) -> PromptMessages:
+    if isinstance(prompt, PromptMessages):
+        return prompt
+    return PromptMessages((("user", prompt),))
+
+
+def prompt_text(prompt: Prompt) -> str:
+    return prompt.text if isinstance(prompt, PromptMessages) else prompt
+
+
+def openai_messages(prompt: Prompt) -> List[dict]:
+    """Chat completion messages with the system prompt first, so the prefix is stable."""
+    prompt = as_prompt_messages(prompt)
+    messages = [{"role": "system", "content": prompt.system}] if prompt.system else []
+    messages.extend({"role": role, "content": content} for role, content in prompt.messages)
+    return messages
+
+
+def anthropic_request(prompt: Prompt) -> dict:
+    """Messages API arguments, with a cache breakpoint after the system prompt."""
+    prompt = as_prompt_messages(prompt)
+    request = {"messages": [{"role": role, "content": content} for role, content in prompt.messages]}
+    if prompt.system:
+        block = {"type": "text", "text": prompt.system}
+        if prompt.cache_system:
+            block["cache_control"] = {"type": "ephemeral"}
+        request["system"] = [block]
+    return request
+
+
+CONTINUE_INSTRUCTION = "Continue exactly where you stopped. Do not repeat anything you already wrote."
+
+
+def continuation_prompt(prompt: Prompt, partial: str) -> PromptMessages:
+    """
+    The conversation followed by a reply that was cut off at max_tokens and a
+    request to carry on, for streams whose first part already reached the caller.
+    """
+    prompt = as_prompt_messages(prompt)
+    messages = prompt.messages + (("assistant", partial), ("user", CONTINUE_INSTRUCTION))
+    return PromptMessages(messages, prompt.system, prompt.cache_system)
+
+
+@lru_cache(maxsize=256)
+def render_role_prefix(agent_name: str, instructions: str) -> str:
+    """
+    Render the static system prompt for a role once. Every executor for the
+    same role gets the identical string, so the provider-side prefix matches.
+    """
+    return f"""ROLE: {agent_name}
+
+INSTRUCTIONS:
+{instructions}"""
@@ -0,0 +1,188 @@
+"""
+Tiered LLM provider health checks.
+
+Generating text to check health costs tokens and rate-limit budget on every
+dashboard refresh, so health is reported in three tiers of increasing cost:
+
+- passive: derived from recent real traffic (windowed success/error counts
+  and circuit breaker state); no network calls
+- probe: an authenticated metadata call (list models) against the provider
+  or the local mock server, skipped for providers with recent successful
+  traffic; no tokens are spent
+- full: a pinned generation request per provider, run only on demand
+
+Probe and full results are cached per provider for LLM_HEALTH_CACHE_TTL_SECONDS.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, TYPE_CHECKING
+
+from backend.runtime_env import LazyModule
+from backend.services.bounded_executor import get_provider_executor
+from backend.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from backend.services.llm_scheduler import BACKGROUND
+
+if TYPE_CHECKING:
+    from backend.services.llm_service import LLMService
+
+genai = LazyModule("google.generativeai")
+
+logger = logging.getLogger(__name__)
+
+PASSIVE = "passive"
+PROBE = "probe"
+FULL = "full"
+TIERS = (PASSIVE, PROBE, FULL)
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+UNHEALTHY = "unhealthy"
+UNKNOWN = "unknown"
+
+# Share of errors in the window above which a provider is reported degraded
+DEGRADED_ERROR_RATIO = 0.5
+
+HEALTH_CHECK_PROMPT = "Hello, respond with 'OK'"
+
+
+class ProviderHealthChecker:
+    """Reports provider health from traffic, metadata probes or generation probes"""
+
+    def __init__(self, llm_service: "LLMService", cache_ttl_seconds: float = 30.0, probe_timeout_seconds: float = 5.0):
+        self.llm_service = llm_service
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.probe_timeout_seconds = probe_timeout_seconds
+        # (tier, provider) -> (expires_at, result)
+        self._cache: Dict[tuple, tuple] = {}
+        self.metrics = {
+            'cache_hits': 0,
+            'probes': 0,
+            'probes_skipped': 0,
+            'full_checks': 0
+        }
+
+    def passive(self, provider_name: str) -> dict:
+        """Health from windowed traffic outcomes and the circuit breaker, without network calls."""
+        breaker = self.llm_service.circuit_breakers[provider_name]
+        outcomes = self.llm_service.latency_histograms.summary(['outcome'], provider=provider_name)
+        successes = outcomes.get('success', {}).get('count', 0)
+        errors = outcomes.get('error', {}).get('count', 0)
+        total = successes + errors
+
+        if breaker.state == OPEN:
+            status = UNHEALTHY
+        elif breaker.state == HALF_OPEN:
+            status = DEGRADED
+        elif not total:
+            status = UNKNOWN
+        elif errors / total > DEGRADED_ERROR_RATIO:
+            status = DEGRADED
+        else:
+            status = HEALTHY
+
+        result = {
+            'status': status,
+            'tier': PASSIVE,
+            'recent_requests': total,
+            'recent_errors': errors,
+            'circuit_state': breaker.state
+        }
+        if successes:
+            result['p50_response_time'] = outcomes['success'].get('p50')
+        if breaker.last_error and status != HEALTHY:
+            result['error'] = breaker.last_error
+        return result
+
+    def _list_models(self, provider_name: str) -> Optional[Callable[[], Awaitable]]:
+        """The provider's list-models call, or None if its SDK has no models endpoint."""
+        client = self.llm_service._get_client(provider_name)
+        if self.llm_service.providers[provider_name]['type'] == 'google':
+            return lambda: get_provider_executor('google').run(lambda: next(iter(genai.list_models()), None))
+        models = getattr(client, 'models', None)
+        if models is None or not hasattr(models, 'list'):
+            return None
+        return models.list
+
+    async def probe(self, provider_name: str) -> dict:
+        """Authenticated metadata call; providers with recent successful traffic are not probed."""
+        passive = self.passive(provider_name)
+        if passive['status'] == HEALTHY and passive['circuit_state'] == CLOSED:
+            self.metrics['probes_skipped'] += 1
+            return {**passive, 'tier': PROBE, 'source': 'traffic'}
+
+        start_time = time.time()
+        try:
+            list_models = self._list_models(provider_name)
+            if list_models is None:
+                return {**passive, 'tier': PROBE, 'source': 'traffic',
+                        'probe_error': f"{provider_name} SDK has no models endpoint"}
+            self.metrics['probes'] += 1
+            await asyncio.wait_for(list_models(), timeout=self.probe_timeout_seconds)
+        except Exception as e:
+            return {
+                **passive,
+                'status': UNHEALTHY,
+                'tier': PROBE,
+                'source': 'metadata',
+                'error': str(e) or type(e).__name__
+            }
+        return {
+            **passive,
+            'status': HEALTHY if passive['status'] in (HEALTHY, UNKNOWN) else passive['status'],
+            'tier': PROBE,
+            'source': 'metadata',
+            'response_time': round(time.time() - start_time, 3)
+        }
+
+    async def full(self, provider_name: str) -> dict:
+        """Generate a short response from this provider only, with no fallback."""
+        self.metrics['full_checks'] += 1
+        start_time = time.time()
+        try:
+            async with self.llm_service.scheduler.slot(BACKGROUND, "health_check"):
+                result = await self.llm_service._attempt_provider(
+                    provider_name, HEALTH_CHECK_PROMPT, f"health_check_{provider_name}"
+                )
+        except Exception as e:
+            return {'status': UNHEALTHY, 'tier': FULL, 'error': str(e)}
+        return {
+            'status': HEALTHY,
+            'tier': FULL,
+            'response_time': round(time.time() - start_time, 3),
+            'response_preview': result[:50] if result else "No response"
+        }
+
+    async def check(self, tier: str = PROBE, force: bool = False) -> Dict[str, dict]:
+        """Health of every configured provider at the given tier."""
+        if tier not in TIERS:
+            raise ValueError(f"Unknown health check tier '{tier}', expected one of {list(TIERS)}")
+        providers = list(self.llm_service.providers)
+        if tier == PASSIVE:
+            return {name: self.passive(name) for name in providers}
+
+        now = time.monotonic()
+        health: Dict[str, Optional[dict]] = {}
+        stale = []
+        for name in providers:
+            cached = None if force else self._cache.get((tier, name))
+            if cached and cached[0] > now:
+                self.metrics['cache_hits'] += 1
+                health[name] = {**cached[1], 'cached': True}
+            else:
+                stale.append(name)
+
+        check = self.probe if tier == PROBE else self.full
+        results = await asyncio.gather(*(check(name) for name in stale))
+        expires_at = time.monotonic() + self.cache_ttl_seconds
+        for name, result in zip(stale, results):
+            self._cache[(tier, name)] = (expires_at, result)
+            health[name] = {**result, 'cached': False}
+        return {name: health[name] for name in providers}
+
+    def get_stats(self) -> dict:
+        return {**self.metrics, 'cache_ttl_seconds': self.cache_ttl_seconds, 'cached_results': len(self._cache)}
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,197 @@
+"""
+Adaptive provider routing for LLMService.
+
+Keeps per-provider EWMA latency and error rate, reads remaining rate-limit
+headroom from the RateLimiter and ranks providers for each request using a
+pluggable scoring policy.
+
+The smoothed stats decay toward the prior (no errors, average latency) with a
+half-life while a provider gets no traffic, so one bad stretch does not rank
+it last forever: it drifts back up, gets traffic again and is re-scored.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.rate_limiter import rate_limiter as default_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Approximate blended USD cost per 1K tokens for the configured models
+DEFAULT_COST_PER_1K_TOKENS = {
+    'google': 0.001,
+    'openai': 0.001,
+    'anthropic': 0.00075
+}
+
+# Below this fraction of remaining quota a provider is ranked last
+LOW_HEADROOM_THRESHOLD = 0.05
+
+# How long a provider's headroom is reused before the RateLimiter is asked again
+HEADROOM_TTL_SECONDS = 0.25
+
+# Half-life of a provider's smoothed stats while it gets no traffic
+STATS_HALF_LIFE_SECONDS = 300.0
+
+
+@dataclass
+class ProviderStats:
+    """Smoothed health signals for a single provider"""
+    ewma_latency: Optional[float] = None
+    error_rate: float = 0.0
+    samples: int = 0
+    updated_at: Optional[float] = None
+
+
+def parse_usage(value) -> Optional[float]:
+    """Return the remaining fraction for a RateLimiter "used/limit" status string."""
+    try:
+        used, limit = str(value).split("/")
+        used, limit = float(used), float(limit)
+    except (ValueError, AttributeError):
+        return None
+    if limit <= 0:
+        return None
+    return max(0.0, 1.0 - used / limit)
+
+
+class ProviderRouter:
+    """
+    Ranks providers per request.
+
+    Policies:
+        static          - keep the configured priority order
+        latency_first   - lowest expected latency, inflated by error rate
+        cost_first      - cheapest provider, inflated by error rate
+        quota_balancing - most remaining rate-limit headroom
+    Ties always keep the configured priority order.
+    """
+
+    def __init__(self, rate_limiter=None, alpha: float = 0.2, policy: str = "latency_first",
+                 cost_per_1k_tokens: Optional[Dict[str, float]] = None,
+                 half_life_seconds: float = STATS_HALF_LIFE_SECONDS):
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.alpha = alpha
+        self.half_life_seconds = half_life_seconds
+        self.stats: Dict[str, ProviderStats] = {}
+        self._headroom: Dict[str, Tuple[float, float]] = {}
+        self.cost_per_1k_tokens = dict(cost_per_1k_tokens or DEFAULT_COST_PER_1K_TOKENS)
+        self.policies: Dict[str, Callable[[str], float]] = {
+            'static': lambda provider: 0.0,
+            'latency_first': self._latency_score,
+            'cost_first': self._cost_score,
+            'quota_balancing': self._quota_score
+        }
+        self.policy = policy if policy in self.policies else "latency_first"
+
+    def register_policy(self, name: str, scorer: Callable[[str], float]):
+        """Add a custom scoring policy. Lower scores rank first."""
+        self.policies[name] = scorer
+
+    def record(self, provider: str, latency: float, success: bool):
+        """Feed the outcome of a provider call into the smoothed stats."""
+        stats = self.stats.setdefault(provider, ProviderStats())
+        now = time.monotonic()
+        stats.ewma_latency, stats.error_rate = self._decayed(provider, now)
+        stats.updated_at = now
+        if success:
+            if stats.ewma_latency is None:
+                stats.ewma_latency = latency
+            else:
+                stats.ewma_latency = self.alpha * latency + (1 - self.alpha) * stats.ewma_latency
+        stats.error_rate = self.alpha * (0.0 if success else 1.0) + (1 - self.alpha) * stats.error_rate
+        stats.samples += 1
+
+    def headroom(self, provider: str) -> float:
+        """
+        Remaining fraction of the tightest per-minute rate limit, 1.0 if unknown.
+        Cached for HEADROOM_TTL_SECONDS, as ranking asks for it several times.
+        """
+        now = time.monotonic()
+        cached = self._headroom.get(provider)
+        if cached is not None and now - cached[0] < HEADROOM_TTL_SECONDS:
+            return cached[1]
+
+        status = self.rate_limiter.get_status(provider)
+        fractions = [
+            parse_usage(status.get(key))
+            for key in ("requests_per_minute", "tokens_per_minute", "requests_per_hour", "tokens_per_hour")
+        ]
+        fractions = [f for f in fractions if f is not None]
+        headroom = min(fractions) if fractions else 1.0
+        self._headroom[provider] = (now, headroom)
+        return headroom
+
+    def _prior_latency(self, exclude: str = None) -> Optional[float]:
+        """Average latency of the known providers"""
+        known = [s.ewma_latency for name, s in self.stats.items() if name != exclude and s.ewma_latency is not None]
+        return sum(known) / len(known) if known else None
+
+    def _decayed(self, provider: str, now: float = None) -> Tuple[Optional[float], float]:
+        """(ewma_latency, error_rate) after decaying toward the prior for the time since the last sample"""
+        stats = self.stats.get(provider)
+        if stats is None:
+            return None, 0.0
+        if stats.updated_at is None or self.half_life_seconds <= 0:
+            return stats.ewma_latency, stats.error_rate
+        elapsed = (now if now is not None else time.monotonic()) - stats.updated_at
+        weight = 0.5 ** (max(elapsed, 0.0) / self.half_life_seconds)
+        latency = stats.ewma_latency
+        prior = self._prior_latency(exclude=provider)
+        if latency is not None and prior is not None:
+            latency = weight * latency + (1 - weight) * prior
+        return latency, weight * stats.error_rate
+
+    def _expected_latency(self, provider: str) -> float:
+        latency, _ = self._decayed(provider)
+        if latency is not None:
+            return latency
+        # Unknown providers are assumed to be as fast as the average known one
+        prior = self._prior_latency()
+        return prior if prior is not None else 0.0
+
+    def _error_penalty(self, provider: str) -> float:
+        _, error_rate = self._decayed(provider)
+        return 1.0 / max(1.0 - error_rate, 0.05)
+
+    def _latency_score(self, provider: str) -> float:
+        return self._expected_latency(provider) * self._error_penalty(provider)
+
+    def _cost_score(self, provider: str) -> float:
+        return self.cost_per_1k_tokens.get(provider, 0.0) * self._error_penalty(provider)
+
+    def _quota_score(self, provider: str) -> float:
+        return (1.0 - self.headroom(provider)) * self._error_penalty(provider)
+
+    def rank(self, providers: List[str], policy: Optional[str] = None) -> List[str]:
+        """Order providers for a request, keeping static order on ties."""
+        return [entry['provider'] for entry in self.explain(providers, policy)]
+
+    def explain(self, providers: List[str], policy: Optional[str] = None) -> List[dict]:
+        """Return the ranking along with the signals that produced it."""
+        policy = policy if policy in self.policies else self.policy
+        scorer = self.policies[policy]
+
+        entries = []
+        for index, provider in enumerate(providers):
+            stats = self.stats.get(provider, ProviderStats())
+            ewma_latency, error_rate = self._decayed(provider)
+            headroom = self.headroom(provider)
+            entries.append({
+                'provider': provider,
+                'policy': policy,
+                'score': round(scorer(provider), 6),
+                'ewma_latency': ewma_latency,
+                'error_rate': round(error_rate, 4),
+                'samples': stats.samples,
+                'headroom': round(headroom, 4),
+                'quota_exhausted': headroom < LOW_HEADROOM_THRESHOLD,
+                'static_position': index
+            })
+
+        entries.sort(key=lambda e: (e['quota_exhausted'], e['score'], e['static_position']))
+        for rank, entry in enumerate(entries):
+            entry['rank'] = rank
+        return entries
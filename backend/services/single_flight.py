@@ -0,0 +1,70 @@
+"""
+Single-flight coalescing for identical in-flight async calls.
+
+The first caller for a key runs the work; concurrent callers with the same
+key await the same task instead of issuing a duplicate request.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key.
+
+    The work runs in its own task so that a cancelled caller does not cancel
+    the request for everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.metrics = {
+            'executions': 0,
+            'coalesced': 0
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn() once for all concurrent callers of key.
+
+        Returns (result, coalesced) where coalesced is True if this caller
+        joined a call started by someone else.
+        """
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+
+        if coalesced:
+            self.metrics['coalesced'] += 1
+            logger.debug(f"Coalescing request onto in-flight call {key[:48]}")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            self.metrics['executions'] += 1
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        return await asyncio.shield(task), coalesced
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception retrieved if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._in_flight
+
+    def reset_metrics(self):
+        for name in self.metrics:
+            self.metrics[name] = 0
+
+    def get_stats(self) -> dict:
+        """Get coalescing statistics for performance metrics."""
+        return {
+            **self.metrics,
+            'in_flight': len(self._in_flight)
+        }
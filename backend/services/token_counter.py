@@ -0,0 +1,110 @@
+"""
+Per-provider token counting for rate limiting and usage accounting.
+
+Uses tiktoken when it is installed (encoders are cached per model) and falls
+back to a cheap character-based heuristic otherwise. If loading an encoder
+fails (tiktoken downloads encodings on first use, so e.g. offline), the
+heuristic is used for the rest of the process. Providers can register their
+own counter.
+"""
+
+import logging
+import math
+from typing import Callable, Dict, Optional
+
+from backend.runtime_env import LazyModule, module_available
+
+# Optional tokenizer support, imported on first count
+tiktoken = LazyModule("tiktoken")
+HAS_TIKTOKEN = module_available("tiktoken")
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token for English prose across the supported models
+CHARS_PER_TOKEN = 4
+
+# Fallback encoding for models tiktoken does not know about
+DEFAULT_ENCODING = "cl100k_base"
+
+
+def heuristic_token_count(text: str) -> int:
+    """Cheap token estimate used when no tokenizer is available."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class TokenCounter:
+    """
+    Counts tokens per provider.
+
+    openai and anthropic use tiktoken (cl100k is a close approximation for
+    Claude); google and unknown providers use the heuristic unless a custom
+    counter is registered.
+    """
+
+    TIKTOKEN_PROVIDERS = ('openai', 'anthropic')
+
+    def __init__(self):
+        self._encoders: Dict[str, object] = {}
+        self._counters: Dict[str, Callable[[str, Optional[str]], int]] = {}
+        self._tiktoken_failed = False
+
+    def register_counter(self, provider: str, counter: Callable[[str, Optional[str]], int]):
+        """Use counter(text, model) for a provider instead of the built-in strategy."""
+        self._counters[provider] = counter
+
+    def _get_encoder(self, model: Optional[str]):
+        key = model or DEFAULT_ENCODING
+        encoder = self._encoders.get(key)
+        if encoder is None:
+            try:
+                encoder = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+            except KeyError:
+                encoder = tiktoken.get_encoding(DEFAULT_ENCODING)
+            self._encoders[key] = encoder
+        return encoder
+
+    def count(self, provider: str, text: str, model: Optional[str] = None) -> int:
+        """Count tokens in text as the given provider would."""
+        if not text:
+            return 0
+
+        counter = self._counters.get(provider)
+        if counter is not None:
+            try:
+                return counter(text, model)
+            except Exception as e:
+                logger.warning(f"Custom token counter for {provider} failed, using heuristic: {e}")
+                return heuristic_token_count(text)
+
+        if HAS_TIKTOKEN and not self._tiktoken_failed and provider in self.TIKTOKEN_PROVIDERS:
+            try:
+                encoder = self._get_encoder(model if provider == 'openai' else None)
+            except Exception as e:
+                # Don't retry a blocking download on every count
+                self._tiktoken_failed = True
+                logger.warning(f"Could not load tiktoken encoder, using heuristic token counts from now on: {e}")
+            else:
+                try:
+                    return len(encoder.encode(text))
+                except Exception as e:
+                    logger.debug(f"tiktoken failed for {provider}, using heuristic: {e}")
+
+        return heuristic_token_count(text)
+
+    def estimate_request(self, provider: str, prompt: str, model: Optional[str] = None,
+                         expected_output_tokens: int = 1000) -> int:
+        """Estimate total tokens a request will consume: prompt plus expected completion."""
+        return self.count(provider, prompt, model) + expected_output_tokens
+
+
+# Global token counter instance
+_token_counter = None
+
+def get_token_counter() -> TokenCounter:
+    """Get the global token counter instance"""
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter()
+    return _token_counter
@@ -0,0 +1,84 @@
+"""
+Cold start timing for the backend.
+
+Import phases in backend/main.py and lazily loaded SDKs are timed so cold
+start regressions (for example an SDK creeping back into module import) show
+up in numbers. Recording is always on and costs a perf_counter call per
+phase; the report is logged at startup and served from
+/api/performance/startup only when STARTUP_TIMING_REPORT=true.
+"""
+
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Modules that should only be loaded on first use
+HEAVY_MODULES = (
+    "google.generativeai",
+    "openai",
+    "anthropic",
+    "aiohttp",
+    "tiktoken",
+    "controlflow",
+    "prefect",
+)
+
+
+def is_report_enabled() -> bool:
+    return os.getenv("STARTUP_TIMING_REPORT", "false").lower() == "true"
+
+
+class StartupTimer:
+    """Collects import phase and lazy import durations since process start"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.lazy_imports: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def record_lazy_import(self, name: str, seconds: float):
+        self.lazy_imports[name] = seconds
+        logger.debug(f"Lazily imported {name} in {seconds * 1000:.1f}ms")
+
+    def mark_ready(self):
+        """Call once the application has finished starting up."""
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter()
+
+    def report(self) -> dict:
+        def ms(seconds: float) -> float:
+            return round(seconds * 1000, 1)
+
+        return {
+            "phases_ms": {name: ms(seconds) for name, seconds in self.phases.items()},
+            "total_import_ms": ms(sum(self.phases.values())),
+            "time_to_ready_ms": ms(self.ready_at - self.started_at) if self.ready_at else None,
+            "lazy_imports_ms": {name: ms(seconds) for name, seconds in self.lazy_imports.items()},
+            "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in sys.modules]
+        }
+
+    def log_report(self):
+        report = self.report()
+        phases = ", ".join(f"{name}={value}ms" for name, value in report["phases_ms"].items())
+        logger.info(
+            f"Startup timing: ready in {report['time_to_ready_ms']}ms, imports {report['total_import_ms']}ms ({phases}); "
+            f"heavy modules loaded at startup: {report['heavy_modules_loaded'] or 'none'}"
+        )
+
+
+# Global startup timer instance
+startup_timer = StartupTimer()
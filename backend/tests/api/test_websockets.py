@@ -15,24 +15,27 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 # environment issue where imports fail during test collection.
 try:
     from backend.main import app
-    client = TestClient(app)
 except (ImportError, AttributeError) as e:
     # Catching AttributeError as well because app.state might not be available
     print(f"Could not import FastAPI app due to environment issue: {e}")
     app = None
-    client = None
 
-@pytest.mark.skipif(client is None, reason="FastAPI app could not be imported due to environment issues")
+@pytest.mark.skipif(app is None, reason="FastAPI app could not be imported due to environment issues")
 def test_websocket_ping_pong():
     """
     Tests the WebSocket endpoint by sending a ping command and expecting a pong response.
     """
-    with client.websocket_connect("/api/ws") as websocket:
-        # 1. Receive the initial welcome message
+    # The context manager runs the app's lifespan, which sets up app.state.manager
+    # Session-scoped replies only reach clients subscribed to the session
+    with TestClient(app) as client, client.websocket_connect("/api/ws?session_id=test_session_ws") as websocket:
+        # 1. Receive the initial welcome message and the System greeting
         welcome_data = websocket.receive_json()
         assert welcome_data["type"] == "system"
         assert welcome_data["event"] == "connected"
         assert "Welcome" in welcome_data["data"]["message"]
+        greeting = websocket.receive_json()
+        assert greeting["type"] == "agent_response"
+        assert greeting["session_id"] == "test_session_ws"
 
         # 2. Send a ping command
         ping_message = {
@@ -46,8 +49,8 @@ def test_websocket_ping_pong():
 
         # 3. Receive the pong response
         pong_data = websocket.receive_json()
-        assert pong_data["type"] == "agent-message"
-        assert pong_data["data"]["agent_name"] == "System"
-        assert "Backend connection successful!" in pong_data["data"]["content"]
+        assert pong_data["type"] == "agent_response"
+        assert pong_data["agent_name"] == "System"
+        assert "Backend connection successful!" in pong_data["content"]
 
         # 4. Connection closes cleanly when the 'with' block exits
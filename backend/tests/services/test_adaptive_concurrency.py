@@ -0,0 +1,86 @@
+"""
+Tests for the per-provider AIMD concurrency limiter.
+"""
+
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+try:
+    from backend.services.adaptive_concurrency import AdaptiveConcurrencyLimiter
+except ImportError as e:
+    print(f"Could not import AdaptiveConcurrencyLimiter due to environment issue: {e}")
+    AdaptiveConcurrencyLimiter = None
+
+
+@pytest.mark.skipif(AdaptiveConcurrencyLimiter is None, reason="AdaptiveConcurrencyLimiter could not be imported")
+@pytest.mark.asyncio
+async def test_limit_grows_while_saturated_and_latency_is_stable():
+    """
+    Tests that the limit grows by one per limit's worth of fast successes when
+    every slot is in use, and not when latency degrades or slots sit idle.
+    """
+    limiter = AdaptiveConcurrencyLimiter("openai", initial_limit=2, max_limit=3)
+    await limiter.acquire()
+    limiter.record_success(0.5)
+    assert limiter.get_stats()["limit"] == 2  # one slot idle
+
+    await limiter.acquire()
+    limiter.record_success(0.5)
+    limiter.record_success(1.5)  # more than twice the best latency
+    assert limiter.get_stats()["limit"] == 2
+    limiter.record_success(0.6)
+    assert limiter.get_stats()["limit"] == 2
+    limiter.record_success(0.6)
+    assert limiter.get_stats()["limit"] == 3
+
+    for _ in range(10):
+        limiter.record_success(0.5)
+    assert limiter.get_stats()["limit"] == 3
+    assert limiter.metrics["increases"] == 1
+
+
+@pytest.mark.skipif(AdaptiveConcurrencyLimiter is None, reason="AdaptiveConcurrencyLimiter could not be imported")
+@pytest.mark.asyncio
+async def test_overload_halves_limit_once_per_cooldown_and_queues_callers():
+    """
+    Tests that a burst of 429s halves the limit once, that callers over the
+    limit wait FIFO, and that released slots only admit up to the new limit.
+    """
+    limiter = AdaptiveConcurrencyLimiter("anthropic", initial_limit=4)
+    for _ in range(4):
+        await limiter.acquire()
+
+    limiter.record_overload()
+    limiter.record_overload()
+    assert limiter.get_stats()["limit"] == 2
+    assert limiter.metrics["decreases"] == 1
+
+    order = []
+
+    async def call(label):
+        async with limiter.slot():
+            order.append(label)
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.create_task(call(i)) for i in range(2)]
+    await asyncio.sleep(0)
+    assert limiter.get_stats()["waiting"] == 2
+
+    for _ in range(3):
+        limiter.release()
+    await asyncio.sleep(0)
+    assert order == [0]  # 4 in flight -> 1, then one waiter admitted up to the limit of 2
+
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == [0, 1]
+    assert limiter.in_flight == 0
+
+    limiter.record_overload(cooldown_seconds=0)
+    limiter.record_overload(cooldown_seconds=0)
+    assert limiter.get_stats()["limit"] == 1
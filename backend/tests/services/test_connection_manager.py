@@ -15,6 +15,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
 # environment issue where imports fail during test collection.
 try:
     from backend.connection_manager import EnhancedConnectionManager
+    from backend.client_outbox import CONTROL, STATUS, CONFLATE, DISCONNECT, conflation_key
+    from backend.agent_status_broadcaster import AgentStatusBroadcaster
 except ImportError as e:
     print(f"Could not import EnhancedConnectionManager due to environment issue: {e}")
     EnhancedConnectionManager = None
@@ -72,6 +74,7 @@ async def test_send_to_client():
 
     # Act
     await manager.send_to_client(client_id, message)
+    await manager.flush()
 
     # Assert
     # Called once on connect (welcome) and once on send_to_client
@@ -94,6 +97,7 @@ async def test_broadcast_to_all():
 
     # Act
     await manager.broadcast_to_all(message)
+    await manager.flush()
 
     # Assert
     # Check that send_text was called with the broadcast message on both clients
@@ -123,6 +127,7 @@ async def test_send_to_group():
 
     # Act
     await manager.send_to_group("group_a", message)
+    await manager.flush()
 
     # Assert
     # Group A clients should receive the message
@@ -131,3 +136,329 @@ async def test_send_to_group():
     # Group B client should not have been called with this message
     # It was called once on connect, so call_count should be 1.
     assert mock_ws_b1.send_text.call_count == 1
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_send_to_session_reaches_only_subscribers():
+    """
+    Tests that session messages go only to clients subscribed at connect or via
+    subscribe, and that unsubscribing and disconnecting maintain the index.
+    """
+    # Arrange
+    manager = EnhancedConnectionManager()
+    mock_ws_a = create_mock_websocket()
+    mock_ws_b = create_mock_websocket()
+    mock_ws_default = create_mock_websocket()
+
+    client_a = await manager.connect(mock_ws_a, session_id="session_a")
+    client_b = await manager.connect(mock_ws_b, session_id="session_b")
+    client_default = await manager.connect(mock_ws_default)
+    assert manager.subscribe(client_b, "session_a")
+    assert not manager.subscribe(client_b, "session_a")
+
+    # Act
+    sent = await manager.send_to_session("session_a", "Status for A")
+    manager.unsubscribe(client_b, "session_a")
+    await manager.send_to_session("session_a", "Result for A")
+    await manager.flush()
+
+    # Assert
+    assert sent == 2
+    mock_ws_a.send_text.assert_called_with("Result for A")
+    mock_ws_b.send_text.assert_called_with("Status for A")
+    assert mock_ws_default.send_text.call_count == 1  # Welcome only
+    assert manager.get_connection_diagnostics(client_default)["sessions"] == ["global_session"]
+    assert await manager.send_to_session("unknown", "Nobody listens") == 0
+
+    await manager.disconnect(client_a)
+    assert "session_a" not in manager.session_subscribers
+    assert client_a not in manager.client_sessions
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_slow_client_does_not_block_others_and_lanes_are_prioritised():
+    """
+    Tests that a broadcast returns while one client's socket is stalled, that
+    the other client still receives it, and that queued control and status
+    messages are written before bulk output.
+    """
+    # Arrange
+    manager = EnhancedConnectionManager()
+    fast_ws = create_mock_websocket()
+    slow_ws = create_mock_websocket()
+    fast_client = await manager.connect(fast_ws)
+    slow_client = await manager.connect(slow_ws)
+    stall = asyncio.Event()
+
+    async def stalled_send(text):
+        await stall.wait()
+    slow_ws.send_text.side_effect = stalled_send
+
+    # Act
+    await asyncio.wait_for(manager.broadcast_to_all("first"), timeout=1)
+    await manager.send_to_client(slow_client, "bulk output")
+    await manager.send_to_client(slow_client, "agent status", lane=STATUS)
+    await manager.send_to_client(slow_client, "heartbeat", lane=CONTROL)
+    await manager.flush(fast_client)
+
+    # Assert
+    fast_ws.send_text.assert_called_with("first")
+    diagnostics = manager.get_connection_diagnostics(slow_client)["outbox"]
+    assert diagnostics["depth"] == 3
+    assert diagnostics["depth_by_lane"] == {"control": 1, "status": 1, "bulk": 1}
+
+    stall.set()
+    slow_ws.send_text.side_effect = None
+    await manager.flush(slow_client)
+    sent = [call.args[0] for call in slow_ws.send_text.call_args_list[1:]]
+    assert sent == ["first", "heartbeat", "agent status", "bulk output"]
+    assert manager.get_connection_diagnostics(slow_client)["outbox"]["sent"] == 4
+
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_outbox_overflow_policies():
+    """
+    Tests that a full lane drops its oldest message by default, that a keyed
+    message replaces its pending predecessor, and that the disconnect policy
+    disconnects the client.
+    """
+    manager = EnhancedConnectionManager()
+    manager.config["outbox_lane_size"] = 3
+    stall = asyncio.Event()
+
+    async def stalled_send(text):
+        await stall.wait()
+
+    async def connect_stalled(policy):
+        manager.config["outbox_overflow_policy"] = policy
+        ws = create_mock_websocket()
+        client_id = await manager.connect(ws)
+        ws.send_text.side_effect = stalled_send
+        await manager.send_to_client(client_id, "in flight")
+        await asyncio.sleep(0)
+        return client_id, ws
+
+    dropping, _ = await connect_stalled("drop_oldest")
+    for i in range(4):
+        await manager.send_to_client(dropping, f"message {i}")
+    assert manager.outboxes[dropping].get_stats()["dropped"] == 1
+
+    conflating, _ = await connect_stalled(CONFLATE)
+    await manager.send_to_client(conflating, "Analyst working", key="Analyst")
+    await manager.send_to_client(conflating, "chat")
+    await manager.send_to_client(conflating, "Analyst done", key="Analyst")
+    await manager.send_to_client(conflating, "more chat")
+    assert manager.outboxes[conflating].get_stats()["conflated"] == 1
+    assert [frame.text for frame in manager.outboxes[conflating].pending()] == ["Analyst done", "chat", "more chat"]
+
+    disconnecting, disconnecting_ws = await connect_stalled(DISCONNECT)
+    for i in range(3):
+        assert await manager.send_to_client(disconnecting, f"message {i}")
+    assert not await manager.send_to_client(disconnecting, "one too many")
+    await asyncio.sleep(0.01)
+    assert disconnecting not in manager.active_connections
+    assert disconnecting not in manager.outboxes
+    stall.set()
+
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_broadcast_shares_one_encoded_frame():
+    """
+    Tests that a broadcast is serialized once and the same frame object is
+    queued for every client and kept for replay when a client drops.
+    """
+    manager = EnhancedConnectionManager()
+    stall = asyncio.Event()
+
+    async def stalled_send(text):
+        await stall.wait()
+
+    clients = []
+    for _ in range(2):
+        ws = create_mock_websocket()
+        client_id = await manager.connect(ws)
+        ws.send_text.side_effect = stalled_send
+        await manager.send_to_client(client_id, "in flight")
+        clients.append(client_id)
+    await asyncio.sleep(0)
+
+    await manager.broadcast_to_all('{"type": "system"}')
+    await manager.disconnect(clients[1])
+
+    first = manager.outboxes[clients[0]].pending()
+    replay = manager.message_queue[clients[1]]
+    assert len(first) == 1 and len(replay) == 1
+    assert first[0] is replay[0][0]
+    assert first[0].data == b'{"type": "system"}'
+
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_status_and_progress_conflate_per_agent_and_session():
+    """
+    Tests that a slow client keeps only the newest status and progress per
+    agent and session, in its outbox and in the replay queue, while chat and
+    completion messages keep their order, and that conflations are counted.
+    """
+    import json
+    manager = EnhancedConnectionManager()
+    broadcaster = AgentStatusBroadcaster(manager)
+    stall = asyncio.Event()
+
+    async def stalled_send(text):
+        await stall.wait()
+
+    ws = create_mock_websocket()
+    client_id = await manager.connect(ws)
+    ws.send_text.side_effect = stalled_send
+    await manager.send_to_client(client_id, "in flight")
+    await asyncio.sleep(0)
+
+    for stage in ("Initializing", "Validating input", "Querying LLM"):
+        await broadcaster.broadcast_agent_status("Analyst", "working", task=stage)
+        await broadcaster.broadcast_agent_progress("Analyst", stage, 1, 3)
+    await broadcaster.broadcast_agent_status("Architect", "thinking", task="Designing")
+    await manager.send_to_session("global_session", "chat 1")
+    await broadcaster.broadcast_agent_completed("Analyst", "Requirements done")
+    await manager.send_to_session("global_session", "chat 2")
+
+    def summary(frames):
+        summaries = []
+        for frame in frames:
+            if not frame.text.startswith("{"):
+                summaries.append(frame.text)
+                continue
+            data = json.loads(frame.text)["data"]
+            summaries.append((data["agent_name"], data.get("task") or data.get("stage") or data["status"]))
+        return summaries
+
+    outbox = manager.outboxes[client_id]
+    assert outbox.metrics["conflated"] == 4
+    assert outbox.depth == 6
+
+    await manager.disconnect(client_id)
+    await manager.send_to_client(client_id, "Analyst progress 3/3", key=conflation_key("global_session", "Analyst", "progress"))
+    # Newer values take the place of the ones they replace
+    assert summary(frame for frame, _ in manager.message_queue[client_id]) == [
+        ("Analyst", "Querying LLM"), "Analyst progress 3/3", ("Architect", "Designing"),
+        ("Analyst", "completed"), "chat 1", "chat 2"
+    ]
+    assert manager.get_conflation_counts() == {"outbox": 4, "replay": 1}
+
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_long_agent_stream_does_not_exhaust_client_rate_limit():
+    """
+    Tests that a long streamed response is coalesced into a few frames that
+    bypass the per-client message limit, so the agent's final status is still
+    delivered to the connected client.
+    """
+    import json
+    from backend.agent_status_broadcaster import AgentStreamForwarder
+    manager = EnhancedConnectionManager()
+    broadcaster = AgentStatusBroadcaster(manager)
+    ws = create_mock_websocket()
+    client_id = await manager.connect(ws)
+
+    forwarder = AgentStreamForwarder(broadcaster, "Analyst")
+    for _ in range(200):
+        await forwarder.on_delta("x" * 70)
+    await forwarder.close()
+    await broadcaster.broadcast_agent_completed("Analyst", "Requirements done")
+    await manager.flush(client_id)
+
+    sent = [json.loads(call.args[0]) for call in ws.send_text.call_args_list[1:]]
+    fragments = [message for message in sent if message["type"] == "agent_response"]
+    assert len(fragments) < 40
+    assert "".join(message["content"] for message in fragments) == "x" * 14000
+    assert [message["type"] for message in sent].count("agent_completed") == 1
+    assert client_id not in manager.message_queue
+
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_replay_queues_of_clients_that_never_reconnect_expire():
+    """
+    Tests that messages queued for a disconnected client are dropped once the
+    client has not reconnected within message_queue_ttl, while a connected
+    client's queue and a recently disconnected one's are kept.
+    """
+    manager = EnhancedConnectionManager()
+    manager.config["message_queue_ttl"] = 60.0
+    connected_id = await manager.connect(create_mock_websocket())
+
+    await manager.send_to_client("gone-client", "lost update")
+    await manager.send_to_client("recent-client", "fresh update")
+    manager._queue_message(connected_id, *manager.message_queue.get("gone-client")[0])
+    manager.message_queue_times["gone-client"] -= 120
+    manager.message_queue_times[connected_id] -= 120
+
+    manager._cleanup_expired_message_queues()
+
+    assert "gone-client" not in manager.message_queue
+    assert "gone-client" not in manager.message_queue_times
+    assert [frame.text for frame, _ in manager.message_queue["recent-client"]] == ["fresh update"]
+    assert connected_id in manager.message_queue
+    await manager.disconnect(connected_id)
+
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_replayed_messages_return_to_their_own_lanes():
+    """
+    Tests that messages queued while a client was away are replayed into the
+    lane they were sent on, so a backlog of bulk output stays behind control frames.
+    """
+    manager = EnhancedConnectionManager()
+    await manager.send_to_client("returning-client", "chat backlog 1")
+    await manager.send_to_client("returning-client", "chat backlog 2")
+    await manager.send_to_client("returning-client", "system notice", priority="high")
+    assert [lane for _, lane in manager.message_queue["returning-client"]] == ["bulk", "bulk", "control"]
+
+    ws = create_mock_websocket()
+    client_id = await manager.connect(ws, client_id="returning-client")
+    await manager.flush(client_id)
+
+    sent = [call.args[0] for call in ws.send_text.call_args_list]
+    assert sent.index("system notice") < sent.index("chat backlog 1") < sent.index("chat backlog 2")
+    await manager.disconnect(client_id)
+
+
+@pytest.mark.skipif(EnhancedConnectionManager is None, reason="Connection manager could not be imported")
+@pytest.mark.asyncio
+async def test_heartbeat_frame_is_shared_by_every_client():
+    """
+    Tests that one heartbeat round hands every client the same keyed frame,
+    and that a newer heartbeat replaces one still pending.
+    """
+    from backend.heartbeat_monitor import HeartbeatMonitor
+    manager = EnhancedConnectionManager()
+    stall = asyncio.Event()
+
+    async def stalled_send(text):
+        await stall.wait()
+
+    clients = []
+    for _ in range(2):
+        ws = create_mock_websocket()
+        client_id = await manager.connect(ws)
+        ws.send_text.side_effect = stalled_send
+        await manager.send_to_client(client_id, "in flight")
+        clients.append(client_id)
+    await asyncio.sleep(0)
+
+    monitor = HeartbeatMonitor(manager)
+    await monitor._send_heartbeat_to_all()
+    await monitor._send_heartbeat_to_all()
+
+    first, second = (manager.outboxes[client_id].pending() for client_id in clients)
+    assert len(first) == len(second) == 1
+    assert first[0] is second[0]
+    assert first[0].key == "heartbeat"
+    assert manager.outboxes[clients[0]].metrics["conflated"] == 1
+    stall.set()
+    for client_id in clients:
+        await manager.disconnect(client_id)
@@ -0,0 +1,113 @@
+"""
+Tests for the LLM response cache.
+"""
+
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+try:
+    from backend.services.llm_cache import LLMResponseCache, make_cache_key
+    from backend.services.prompt_messages import PromptMessages
+except ImportError as e:
+    print(f"Could not import LLMResponseCache due to environment issue: {e}")
+    LLMResponseCache = None
+
+
+@pytest.mark.skipif(LLMResponseCache is None, reason="LLMResponseCache could not be imported")
+def test_cache_key_normalizes_prompt_whitespace():
+    """
+    Tests that prompts differing only in line endings and trailing whitespace share a key,
+    while provider, model and temperature are part of the key.
+    """
+    base = make_cache_key("openai", "gpt-3.5-turbo", 0.7, "Build a todo app\nwith auth")
+    assert make_cache_key("openai", "gpt-3.5-turbo", 0.7, "  Build a todo app  \r\nwith auth\n") == base
+    assert make_cache_key("anthropic", "gpt-3.5-turbo", 0.7, "Build a todo app\nwith auth") != base
+    assert make_cache_key("openai", "gpt-4", 0.7, "Build a todo app\nwith auth") != base
+    assert make_cache_key("openai", "gpt-3.5-turbo", 0.0, "Build a todo app\nwith auth") != base
+
+
+@pytest.mark.skipif(LLMResponseCache is None, reason="LLMResponseCache could not be imported")
+def test_cache_key_hashes_structured_messages():
+    """
+    Tests that prompts with the same flattened text but a different split
+    between system prompt and messages get different keys.
+    """
+    def key(prompt):
+        return make_cache_key("openai", "gpt-3.5-turbo", 0.7, prompt)
+
+    split = PromptMessages.build([{"role": "user", "content": "Plan a todo app"}], system="You are the Analyst")
+    flattened = "You are the Analyst\n\nPlan a todo app"
+    as_user_turns = PromptMessages.build([
+        {"role": "user", "content": "You are the Analyst"}, {"role": "user", "content": "Plan a todo app"}
+    ])
+
+    assert split.text == flattened
+    assert len({key(split), key(flattened), key(as_user_turns)}) == 3
+    assert key(PromptMessages.build([{"role": "user", "content": flattened}])) == key(flattened)
+
+
+@pytest.mark.skipif(LLMResponseCache is None, reason="LLMResponseCache could not be imported")
+@pytest.mark.asyncio
+async def test_disk_tier_is_safe_under_concurrent_access(tmp_path):
+    """
+    Tests that many concurrent reads and writes through worker threads share
+    the sqlite connection without errors.
+    """
+    import asyncio
+    cache = LLMResponseCache(max_entries=1, db_path=str(tmp_path / "llm_cache.db"))
+
+    await asyncio.gather(*(cache.set(f"key {i}", f"response {i}") for i in range(50)))
+    results = await asyncio.gather(*(cache.get(f"key {i}") for i in range(50)))
+
+    assert results == [f"response {i}" for i in range(50)]
+    assert cache.get_stats()["disk_hits"] == 49
+    cache.close()
+
+
+@pytest.mark.skipif(LLMResponseCache is None, reason="LLMResponseCache could not be imported")
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used_and_expires_entries():
+    """
+    Tests LRU eviction at max_entries and TTL expiry, along with hit/miss metrics.
+    """
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=60)
+
+    await cache.set("a", "A")
+    await cache.set("b", "B")
+    assert await cache.get("a") == "A"  # "a" becomes most recently used
+    await cache.set("c", "C")           # evicts "b"
+
+    assert await cache.get("b") is None
+    assert await cache.get("c") == "C"
+
+    with patch("backend.services.llm_cache.time.time", return_value=10**12):
+        assert await cache.get("a") is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+
+
+@pytest.mark.skipif(LLMResponseCache is None, reason="LLMResponseCache could not be imported")
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restart(tmp_path):
+    """
+    Tests that entries written to the sqlite tier are served by a new cache instance.
+    """
+    db_path = str(tmp_path / "llm_cache.db")
+
+    first = LLMResponseCache(db_path=db_path)
+    await first.set("key", "persisted response")
+    first.close()
+
+    second = LLMResponseCache(db_path=db_path)
+    assert await second.get("key") == "persisted response"
+    assert second.get_stats()["disk_hits"] == 1
+    second.close()
@@ -0,0 +1,98 @@
+"""
+Tests for priority lanes and per-session fair queuing of LLM calls.
+"""
+
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+try:
+    from backend.services.llm_scheduler import LLMScheduler, INTERACTIVE, WORKFLOW, BACKGROUND
+except ImportError as e:
+    print(f"Could not import LLMScheduler due to environment issue: {e}")
+    LLMScheduler = None
+
+
+async def run_queued(scheduler: LLMScheduler, requests: list) -> list:
+    """Queue requests behind a held slot, then release it and record dispatch order."""
+    order = []
+
+    async def call(label, priority, session_id):
+        async with scheduler.slot(priority, session_id):
+            order.append(label)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire(WORKFLOW, "blocker")
+    tasks = []
+    for request in requests:
+        tasks.append(asyncio.ensure_future(call(*request)))
+        await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.skipif(LLMScheduler is None, reason="LLMScheduler could not be imported")
+@pytest.mark.asyncio
+async def test_interactive_request_overtakes_queued_workflow():
+    """
+    Tests that a chat request queued behind a long workflow runs before the
+    workflow's remaining calls.
+    """
+    scheduler = LLMScheduler(max_concurrent=1)
+    requests = [(f"wf{i}", WORKFLOW, "big-workflow") for i in range(5)]
+    requests.append(("chat", INTERACTIVE, "chat-user"))
+
+    order = await run_queued(scheduler, requests)
+
+    assert order.index("chat") <= 1
+    stats = scheduler.get_stats()
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["queued"][INTERACTIVE] == 1
+    assert stats["wait_time"]["interactive"]["count"] == 1
+
+
+@pytest.mark.skipif(LLMScheduler is None, reason="LLMScheduler could not be imported")
+@pytest.mark.asyncio
+async def test_sessions_in_same_lane_are_interleaved():
+    """
+    Tests that a session that queued many calls first does not delay a second
+    session in the same lane until all of its calls have run.
+    """
+    scheduler = LLMScheduler(max_concurrent=1)
+    requests = [(f"a{i}", WORKFLOW, "session-a") for i in range(4)]
+    requests += [(f"b{i}", WORKFLOW, "session-b") for i in range(2)]
+
+    order = await run_queued(scheduler, requests)
+
+    assert order[:4] == ["a0", "b0", "a1", "b1"]
+
+
+@pytest.mark.skipif(LLMScheduler is None, reason="LLMScheduler could not be imported")
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue_and_unknown_priority_rejected():
+    """
+    Tests that cancelling a queued call removes it from queue depth without
+    leaking a slot, and that unknown priorities are rejected.
+    """
+    scheduler = LLMScheduler(max_concurrent=1)
+    await scheduler.acquire(BACKGROUND)
+    waiter = asyncio.ensure_future(scheduler.acquire(BACKGROUND))
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 1
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    scheduler.release()
+
+    assert scheduler.queue_depth == 0
+    assert scheduler.get_stats()["in_flight"] == 0
+    assert scheduler.metrics["cancelled"] == 1
+    with pytest.raises(ValueError):
+        await scheduler.acquire("urgent")
@@ -141,3 +141,464 @@ async def test_generate_response_raises_error_if_all_providers_fail():
     mock_google_client.generate_content.assert_called_once()
     mock_openai_client.chat.completions.create.assert_called_once()
     mock_anthropic_client.messages.create.assert_called_once()
+    assert mock_anthropic_client.messages.create.call_args.kwargs["temperature"] == 0.7
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key"})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_generate_stream_falls_back_before_first_delta():
+    """
+    Tests that streaming falls back to the next provider if the first one fails
+    before producing output, and that deltas are forwarded via on_delta.
+    """
+    # Arrange
+    service = LLMService()
+    attempted = []
+
+    async def fake_stream(provider_name, prompt, *args):
+        attempted.append(provider_name)
+        if provider_name == "google":
+            raise Exception("Google API is down")
+        for delta in ["Hello", ", ", "world"]:
+            yield delta
+
+    received = []
+
+    async def on_delta(delta):
+        received.append(delta)
+
+    # Act
+    with patch.object(service, "_stream_provider", side_effect=fake_stream):
+        result = await service.generate_response("Stream prompt", "TestAgent", on_delta=on_delta)
+
+    # Assert
+    assert result == "Hello, world"
+    assert received == ["Hello", ", ", "world"]
+    assert attempted == ["google", "openai"]
+    assert service.performance_metrics["streaming_requests"] == 1
+    assert len(service.performance_metrics["time_to_first_token"]) == 1
+    latency = service.get_latency_report(["provider", "agent", "outcome"])
+    assert set(latency["response_time"]) == {"google/TestAgent/error", "openai/TestAgent/success"}
+    assert latency["time_to_first_token"]["openai/TestAgent"]["count"] == 1
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key"})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_generate_stream_fails_over_when_google_executor_is_saturated():
+    """
+    Tests that a Google stream rejected by a saturated executor surfaces the
+    rejection at once and falls back, instead of waiting for chunks that never come.
+    """
+    import asyncio
+    import time
+    from backend.services.bounded_executor import ExecutorSaturatedError
+
+    # Arrange
+    service = LLMService()
+    saturated = MagicMock()
+    saturated.run = AsyncMock(side_effect=ExecutorSaturatedError("google executor saturated (40/40 calls in flight)"))
+
+    async def fake_openai_stream(client, prompt, *args, **kwargs):
+        yield "OpenAI stream"
+
+    # Act
+    started = time.monotonic()
+    with patch('backend.services.llm_service.get_provider_executor', return_value=saturated), \
+            patch.object(service, "_stream_openai", side_effect=fake_openai_stream):
+        result = await asyncio.wait_for(
+            service.generate_response("Saturated prompt", "TestAgent", on_delta=AsyncMock(), use_cache=False),
+            timeout=5
+        )
+
+    # Assert
+    assert result == "OpenAI stream"
+    assert time.monotonic() - started < 1
+    assert service.circuit_breakers["google"].consecutive_failures == 0
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key"})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_calls_waiting_for_a_concurrency_slot_hold_no_rate_budget():
+    """
+    Tests that a call queued behind a full concurrency limit reserves rate
+    limit budget only once it gets a slot.
+    """
+    import asyncio
+    from backend.rate_limiter import rate_limiter
+
+    # Arrange
+    service = LLMService()
+    limiter = service._concurrency_limiter("openai")
+    limiter.limit = 1.0
+    reserve = AsyncMock(side_effect=lambda *args, **kwargs: MagicMock())
+
+    # Act
+    with patch.object(rate_limiter, "reserve", reserve), \
+            patch.object(service, "_call_openai", AsyncMock(return_value={"text": "ok"})):
+        await limiter.acquire()
+        call = asyncio.create_task(service._generate_with_openai("Queued prompt"))
+        await asyncio.sleep(0.05)
+        reserved_while_queued = reserve.await_count
+        limiter.release()
+        result = await asyncio.wait_for(call, timeout=5)
+
+    # Assert
+    assert reserved_while_queued == 0
+    assert reserve.await_count == 1
+    assert result == {"text": "ok"}
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key"})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_generate_stream_does_not_fall_back_after_first_delta():
+    """
+    Tests that a provider failing mid-stream raises instead of retrying another
+    provider, which would duplicate output already sent to the caller.
+    """
+    # Arrange
+    service = LLMService()
+    attempted = []
+
+    async def fake_stream(provider_name, prompt, *args):
+        attempted.append(provider_name)
+        yield "partial"
+        raise Exception("Connection reset")
+
+    # Act & Assert
+    with patch.object(service, "_stream_provider", side_effect=fake_stream):
+        with pytest.raises(Exception, match="Connection reset"):
+            async for _ in service.generate_stream("Stream prompt", "TestAgent"):
+                pass
+
+    assert attempted == ["google"]
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key"})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_generate_response_serves_repeated_prompt_from_cache():
+    """
+    Tests that an identical prompt is answered from the response cache, and that
+    use_cache=False bypasses it.
+    """
+    # Arrange
+    mock_openai_client.chat.completions.create.reset_mock()
+    mock_openai_client.chat.completions.create.side_effect = None
+    service = LLMService()
+    prompt = "Cached prompt"
+
+    # Act
+    first = await service.generate_response(prompt, "TestAgent", preferred_provider="openai")
+    second = await service.generate_response(prompt, "TestAgent", preferred_provider="openai")
+    await service.generate_response(prompt, "TestAgent", preferred_provider="openai", use_cache=False)
+
+    # Assert
+    assert first == second == "OpenAI response"
+    assert mock_openai_client.chat.completions.create.call_count == 2
+    cache_stats = service.get_performance_metrics()["cache"]
+    assert cache_stats["hits"] == 1
+    assert cache_stats["misses"] == 1  # one per lookup, not one per provider probed
+    assert cache_stats["bypassed"] == 1
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key"})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_are_coalesced():
+    """
+    Tests that concurrent identical prompts share a single provider call, unless
+    the caller bypasses the cache or runs at a different scheduler priority.
+    """
+    import asyncio
+
+    # Arrange
+    service = LLMService()
+    calls = []
+
+    async def slow_openai(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return "Shared response"
+
+    # Act
+    with patch.object(service, "_generate_with_openai", side_effect=slow_openai):
+        results = await asyncio.gather(*[
+            service.generate_response("Same prompt", f"Agent{i}", preferred_provider="openai")
+            for i in range(3)
+        ], service.generate_response("Same prompt", "Fresh", preferred_provider="openai", use_cache=False),
+            service.generate_response("Same prompt", "Urgent", preferred_provider="openai", priority="interactive"))
+
+    # Assert
+    assert results == ["Shared response"] * 5
+    assert len(calls) == 3
+    stats = service.get_performance_metrics()["single_flight"]
+    assert stats["coalesced"] == 2
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {
+    "OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key",
+    "LLM_HEDGING_ENABLED": "true", "LLM_HEDGE_MIN_SAMPLES": "5", "LLM_HEDGE_BUDGET_PERCENT": "100"
+})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_with_next_provider():
+    """
+    Tests that a primary slower than its latency percentile is raced against the
+    next provider, the faster answer wins, and the slow call is cancelled.
+    """
+    import asyncio
+
+    # Arrange
+    service = LLMService()
+    for _ in range(5):
+        service._track_performance("google", 0.01, True)
+
+    primary_cancelled = asyncio.Event()
+
+    async def slow_google(prompt):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            primary_cancelled.set()
+            raise
+        return "Google response"
+
+    async def fast_openai(prompt):
+        return "OpenAI response"
+
+    # Act
+    with patch.object(service, "_generate_with_google", side_effect=slow_google), \
+         patch.object(service, "_generate_with_openai", side_effect=fast_openai):
+        result = await service.generate_response("Hedge prompt", "TestAgent", use_cache=False)
+        await asyncio.sleep(0)
+
+    # Assert
+    assert result == "OpenAI response"
+    assert primary_cancelled.is_set()
+    hedging = service.get_performance_metrics()["hedging"]
+    assert hedging["hedges_fired"] == 1
+    assert hedging["hedge_wins"] == 1
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {
+    "OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key",
+    "LLM_HEDGING_ENABLED": "true", "LLM_HEDGE_MIN_SAMPLES": "5"
+})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_orphan_the_primary_call():
+    """
+    Tests that cancelling the caller while it waits out the hedge delay cancels
+    the primary provider call instead of leaving it running.
+    """
+    import asyncio
+
+    # Arrange
+    service = LLMService()
+    primary_started = asyncio.Event()
+    primary_cancelled = asyncio.Event()
+
+    async def slow_google(prompt):
+        primary_started.set()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            primary_cancelled.set()
+            raise
+        return "Google response"
+
+    # Act
+    with patch.object(service, "_generate_with_google", side_effect=slow_google):
+        caller = asyncio.create_task(service._attempt_with_hedge("google", ["openai"], "Hedge prompt", "TestAgent", 5.0))
+        await primary_started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+    # Assert
+    assert primary_cancelled.is_set()
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {"OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key"})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_hedge_budget_only_accrues_while_hedging_is_possible():
+    """
+    Tests that requests made with hedging disabled, or with a single provider,
+    do not build up hedge budget.
+    """
+    # Arrange
+    service = LLMService()
+
+    async def working_google(prompt):
+        return "Google response"
+
+    # Act
+    with patch.object(service, "_generate_with_google", side_effect=working_google):
+        await service.generate_response("First prompt", "TestAgent", use_cache=False)
+        with patch.dict(os.environ, {"LLM_HEDGING_ENABLED": "true"}):
+            await service._generate_with_fallback("Second prompt", "TestAgent", ["google"], False, 0.0)
+
+    # Assert
+    assert service.hedge_metrics["eligible_requests"] == 0
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {
+    "OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key",
+    "LLM_BREAKER_FAILURE_THRESHOLD": "1", "LLM_ROUTING_POLICY": "static"
+})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_open_circuit_skips_failing_provider():
+    """
+    Tests that once a provider's circuit opens, later requests and the routing
+    explanation skip it entirely, and its state is reported in get_provider_status().
+    """
+    # Arrange
+    service = LLMService()
+    google_calls = []
+
+    async def failing_google(prompt):
+        google_calls.append(prompt)
+        raise Exception("Google API is down")
+
+    async def working_openai(prompt):
+        return "OpenAI response"
+
+    # Act
+    with patch.object(service, "_generate_with_google", side_effect=failing_google), \
+         patch.object(service, "_generate_with_openai", side_effect=working_openai):
+        first = await service.generate_response("First prompt", "TestAgent", use_cache=False)
+        second = await service.generate_response("Second prompt", "TestAgent", use_cache=False)
+
+    # Assert
+    assert first == second == "OpenAI response"
+    assert len(google_calls) == 1
+    assert service.get_provider_status()["google"]["circuit_breaker"]["state"] == "open"
+    assert [entry["provider"] for entry in service.explain_routing()["ranking"]] == ["openai", "anthropic"]
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {
+    "OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key",
+    "LLM_BREAKER_FAILURE_THRESHOLD": "100", "LLM_ROUTING_POLICY": "static"
+})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_local_rate_limit_timeout_does_not_trip_circuit():
+    """
+    Tests that timing out on the local rate limiter leaves the provider's circuit
+    alone, while a provider's 429 response trips it.
+    """
+    from backend.rate_limiter import RateLimitTimeout
+
+    # Arrange
+    service = LLMService()
+
+    class ProviderRateLimitError(Exception):
+        status_code = 429
+
+    async def working_openai(prompt):
+        return "OpenAI response"
+
+    # Act / Assert
+    with patch.object(service, "_generate_with_google", side_effect=RateLimitTimeout("Rate limit exceeded for google")), \
+         patch.object(service, "_generate_with_openai", side_effect=working_openai):
+        assert await service.generate_response("First prompt", "TestAgent", use_cache=False) == "OpenAI response"
+    breaker = service.circuit_breakers["google"].get_status()
+    assert breaker["state"] == "closed"
+    assert breaker["consecutive_failures"] == 0
+
+    with patch.object(service, "_generate_with_google", side_effect=ProviderRateLimitError("Too many requests")), \
+         patch.object(service, "_generate_with_openai", side_effect=working_openai):
+        assert await service.generate_response("Second prompt", "TestAgent", use_cache=False) == "OpenAI response"
+    assert service.circuit_breakers["google"].state == "open"
+
+
+@pytest.mark.skipif(LLMService is None, reason="LLMService could not be imported")
+@patch.dict(os.environ, {
+    "OPENAI_API_KEY": "fake_key", "ANTHROPIC_API_KEY": "fake_key", "GOOGLE_AI_API_KEY": "fake_key",
+    "LLM_BREAKER_FAILURE_THRESHOLD": "100"
+})
+@patch('backend.services.llm_service.openai', mock_openai)
+@patch('backend.services.llm_service.anthropic', mock_anthropic)
+@patch('backend.services.llm_service.genai', mock_google)
+@pytest.mark.asyncio
+async def test_generate_batch_keeps_order_and_reports_item_failures():
+    """
+    Tests that generate_batch bounds concurrency, spreads items across providers,
+    returns results in input order and reports failed items without aborting.
+    """
+    import asyncio
+
+    # Arrange
+    service = LLMService()
+    active = 0
+    max_active = 0
+    providers_used = set()
+    agent_names = set()
+
+    async def fake_generate(prompt, agent_name, preferred_provider=None, use_cache=True, **kwargs):
+        nonlocal active, max_active
+        agent_names.add(agent_name)
+        active += 1
+        max_active = max(max_active, active)
+        providers_used.add(preferred_provider)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if prompt == "bad":
+            raise Exception("All LLM providers failed")
+        return prompt.upper()
+
+    prompts = ["a", "b", "bad", "c", "d", "e"]
+
+    # Act
+    with patch.object(service, "generate_response", side_effect=fake_generate):
+        results = await service.generate_batch(prompts, concurrency=2)
+
+    # Assert
+    assert [r.index for r in results] == list(range(len(prompts)))
+    assert [r.response for r in results if r.success] == ["A", "B", "C", "D", "E"]
+    assert results[2].success is False and "failed" in results[2].error
+    assert max_active <= 2
+    assert len(providers_used) > 1
+    assert agent_names == {"Batch"}
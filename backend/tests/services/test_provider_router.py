@@ -0,0 +1,105 @@
+"""
+Tests for adaptive LLM provider routing.
+"""
+
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+try:
+    from backend.services.provider_router import ProviderRouter, parse_usage
+except ImportError as e:
+    print(f"Could not import ProviderRouter due to environment issue: {e}")
+    ProviderRouter = None
+
+
+def make_rate_limiter(usage_by_provider=None):
+    """Build a fake rate limiter reporting "used/limit" strings per provider."""
+    usage_by_provider = usage_by_provider or {}
+    limiter = MagicMock()
+    limiter.get_status.side_effect = lambda provider: {
+        "requests_per_minute": usage_by_provider.get(provider, "0/60"),
+        "tokens_per_minute": "0/90000",
+    }
+    return limiter
+
+
+@pytest.mark.skipif(ProviderRouter is None, reason="ProviderRouter could not be imported")
+def test_ties_keep_static_order():
+    """
+    Tests that providers without history keep the configured priority order.
+    """
+    router = ProviderRouter(rate_limiter=make_rate_limiter())
+    assert router.rank(["google", "openai", "anthropic"]) == ["google", "openai", "anthropic"]
+
+
+@pytest.mark.skipif(ProviderRouter is None, reason="ProviderRouter could not be imported")
+def test_latency_first_prefers_fast_healthy_provider():
+    """
+    Tests that latency_first ranks by EWMA latency and penalizes error rate.
+    """
+    router = ProviderRouter(rate_limiter=make_rate_limiter(), policy="latency_first")
+    for _ in range(5):
+        router.record("google", 4.0, True)
+        router.record("openai", 1.0, True)
+        router.record("anthropic", 0.5, False)
+
+    assert router.rank(["google", "openai", "anthropic"]) == ["openai", "google", "anthropic"]
+
+
+@pytest.mark.skipif(ProviderRouter is None, reason="ProviderRouter could not be imported")
+def test_quota_balancing_and_exhausted_quota():
+    """
+    Tests that quota_balancing prefers the most headroom and exhausted providers rank last
+    under every policy.
+    """
+    limiter = make_rate_limiter({"google": "59/60", "openai": "30/60", "anthropic": "6/60"})
+    router = ProviderRouter(rate_limiter=limiter, policy="quota_balancing")
+
+    assert router.rank(["google", "openai", "anthropic"]) == ["anthropic", "openai", "google"]
+    assert router.rank(["google", "openai", "anthropic"], policy="static")[-1] == "google"
+
+    explanation = router.explain(["google"])[0]
+    assert explanation["quota_exhausted"] is True
+    assert parse_usage("30/60") == 0.5
+
+
+@pytest.mark.skipif(ProviderRouter is None, reason="ProviderRouter could not be imported")
+def test_headroom_is_read_once_per_ranking():
+    """
+    Tests that ranking reads each provider's rate limit status once rather than
+    once per signal that needs headroom.
+    """
+    limiter = make_rate_limiter({"google": "59/60", "openai": "30/60"})
+    router = ProviderRouter(rate_limiter=limiter, policy="quota_balancing")
+
+    assert router.rank(["google", "openai"]) == ["openai", "google"]
+    assert limiter.get_status.call_count == 2
+
+
+@pytest.mark.skipif(ProviderRouter is None, reason="ProviderRouter could not be imported")
+def test_idle_provider_stats_decay_back_toward_prior():
+    """
+    Tests that a provider ranked last after a bad stretch drifts back toward the
+    average while it gets no traffic, instead of keeping its poor score forever.
+    """
+    router = ProviderRouter(rate_limiter=make_rate_limiter(), policy="latency_first", half_life_seconds=60)
+    for _ in range(5):
+        router.record("google", 8.0, True)
+        router.record("google", 8.0, False)
+        router.record("openai", 1.0, True)
+        router.record("anthropic", 2.0, True)
+    providers = ["google", "openai", "anthropic"]
+    assert router.rank(providers) == ["openai", "anthropic", "google"]
+
+    # Ten half-lives without google traffic
+    router.stats["google"].updated_at -= 600
+
+    explanation = {entry["provider"]: entry for entry in router.explain(providers)}
+    assert explanation["google"]["error_rate"] < 0.01
+    assert explanation["google"]["ewma_latency"] == pytest.approx(1.5, abs=0.01)
+    assert router.rank(providers) == ["openai", "google", "anthropic"]
@@ -0,0 +1,84 @@
+"""
+Tests for token counting and rate-limiter usage reconciliation.
+"""
+
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+try:
+    from backend.services.token_counter import TokenCounter, heuristic_token_count
+    from backend.rate_limiter import rate_limiter, rate_limited, RateLimitConfig
+except ImportError as e:
+    print(f"Could not import TokenCounter due to environment issue: {e}")
+    TokenCounter = None
+
+
+@pytest.mark.skipif(TokenCounter is None, reason="TokenCounter could not be imported")
+def test_counts_scale_with_prompt_size():
+    """
+    Tests that token counts grow with the prompt instead of being a fixed estimate.
+    """
+    counter = TokenCounter()
+    short = counter.count("google", "Build a todo app")
+    long = counter.count("google", "Build a todo app " * 200)
+
+    assert short == heuristic_token_count("Build a todo app")
+    assert long > short * 100
+    assert counter.estimate_request("google", "Build a todo app", expected_output_tokens=50) == short + 50
+
+
+@pytest.mark.skipif(TokenCounter is None, reason="TokenCounter could not be imported")
+def test_registered_counter_overrides_builtin_strategy():
+    """
+    Tests that a provider-specific counter is used, falling back to the heuristic on error.
+    """
+    counter = TokenCounter()
+    counter.register_counter("google", lambda text, model: 7)
+    counter.register_counter("anthropic", lambda text, model: 1 / 0)
+
+    assert counter.count("google", "anything") == 7
+    assert counter.count("anthropic", "abcdefgh") == heuristic_token_count("abcdefgh")
+
+
+@pytest.mark.skipif(TokenCounter is None, reason="TokenCounter could not be imported")
+def test_encoder_load_failure_is_not_retried():
+    """
+    Tests that once a tiktoken encoder fails to load (e.g. offline download),
+    later counts use the heuristic without trying to load it again.
+    """
+    counter = TokenCounter()
+    offline = MagicMock()
+    offline.encoding_for_model.side_effect = OSError("network unreachable")
+
+    with patch("backend.services.token_counter.HAS_TIKTOKEN", True), \
+            patch("backend.services.token_counter.tiktoken", offline):
+        first = counter.count("openai", "abcdefgh", "gpt-4")
+        second = counter.count("openai", "abcdefgh" * 3, "gpt-4")
+
+    assert first == heuristic_token_count("abcdefgh")
+    assert second == heuristic_token_count("abcdefgh" * 3)
+    assert offline.encoding_for_model.call_count == 1
+
+
+@pytest.mark.skipif(TokenCounter is None, reason="TokenCounter could not be imported")
+@pytest.mark.asyncio
+async def test_rate_limited_reserves_estimate_and_reconciles_usage():
+    """
+    Tests that the decorator reserves the estimator's size and then records the
+    provider-reported usage on the same request record.
+    """
+    rate_limiter.add_provider_config("token_test", RateLimitConfig(burst_limit=5))
+
+    @rate_limited("token_test", estimator=lambda prompt: len(prompt))
+    async def call(prompt):
+        record = rate_limiter.last_record("token_test")
+        assert record.tokens == len(prompt)
+        return {"text": "ok", "usage": {"total_tokens": 42}}
+
+    await call("x" * 300)
+    assert rate_limiter.last_record("token_test").tokens == 42
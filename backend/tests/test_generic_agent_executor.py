@@ -476,9 +476,10 @@ class TestIntegration:
             mock_llm_service.generate_response.assert_called_once()
             call_args = mock_llm_service.generate_response.call_args
             prompt = call_args[1]['prompt']
+            system_prompt = call_args[1]['system_prompt']
             
-            assert "ROLE: IntegrationTestAgent" in prompt
-            assert "INSTRUCTIONS:" in prompt
+            assert "ROLE: IntegrationTestAgent" in system_prompt
+            assert "INSTRUCTIONS:" in system_prompt
             assert "USER TASK:" in prompt
             assert "Stay in character" in prompt
             assert "integration test" in prompt.lower()
@@ -497,5 +498,43 @@ class TestIntegration:
             assert "Processing response" in stages
 
 
+
+@pytest.mark.asyncio
+@patch('backend.agents.generic_agent_executor.get_dynamic_config')
+@patch('backend.agents.generic_agent_executor.get_llm_service')
+async def test_stream_is_closed_when_provider_fails_mid_stream(mock_get_llm_service, mock_get_config):
+    """Test that clients that already got deltas get the closing frame when the provider fails"""
+    mock_config = MagicMock()
+    mock_config.is_agent_test_mode.return_value = False
+    mock_config.is_role_test_mode.return_value = False
+    mock_get_config.return_value = mock_config
+
+    broadcaster = MagicMock()
+    broadcaster.broadcast_agent_progress = AsyncMock()
+    broadcaster.broadcast_agent_response = AsyncMock()
+    broadcaster.broadcast_agent_stream_delta = AsyncMock()
+
+    async def failing_stream(**kwargs):
+        await kwargs['on_delta']("Partial ")
+        await kwargs['on_delta']("answer")
+        raise Exception("provider dropped the stream")
+
+    mock_llm_service = MagicMock()
+    mock_llm_service.generate_response = AsyncMock(side_effect=failing_stream)
+    mock_get_llm_service.return_value = mock_llm_service
+    executor = GenericAgentExecutor({
+        "name": "TestAnalyst",
+        "description": "You are a test analyst agent responsible for analyzing requirements.",
+        "stage_involvement": ["Analyze"]
+    }, broadcaster)
+    executor.llm_service = mock_llm_service
+
+    result = await executor.execute_task("Analyze this project", "test_session")
+
+    assert "encountered an unexpected issue" in result
+    frames = broadcaster.broadcast_agent_stream_delta.call_args_list
+    assert "".join(call.kwargs['delta'] for call in frames) == "Partial answer"
+    assert frames[-1].kwargs['done'] is True
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
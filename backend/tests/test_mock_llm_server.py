@@ -0,0 +1,242 @@
+"""
+Tests for the local mock LLM provider server and LLMService running against it.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+try:
+    import httpx
+    from backend.mock_llm_server import create_app, MockServerConfig
+    from backend.services.llm_service import LLMService
+    from backend.services.output_budget import OutputBudgetPolicy
+except ImportError as e:
+    print(f"Could not import mock LLM server dependencies: {e}")
+    create_app = None
+
+
+def make_client(app) -> "httpx.AsyncClient":
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mock")
+
+
+@pytest.mark.skipif(create_app is None, reason="Mock LLM server dependencies could not be imported")
+@pytest.mark.asyncio
+async def test_outputs_are_deterministic_and_errors_injectable():
+    """
+    Tests that the same prompt yields the same completion and that forced errors
+    come back in the provider's error format.
+    """
+    app = create_app(MockServerConfig(latency_ms=0, tokens_per_second=0, output_tokens=12))
+    body = {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "Design a blog"}]}
+
+    async with make_client(app) as client:
+        first = (await client.post("/v1/chat/completions", json=body)).json()
+        second = (await client.post("/v1/chat/completions", json=body)).json()
+        limited = await client.post("/v1/messages", json={**body, "max_tokens": 10},
+                                    headers={"x-mock-error": "429"})
+
+    assert first["choices"][0]["message"]["content"] == second["choices"][0]["message"]["content"]
+    assert first["usage"]["completion_tokens"] == 12
+    assert limited.status_code == 429
+    assert limited.json()["error"]["type"] == "rate_limit_error"
+    assert "retry-after" in limited.headers
+
+
+@pytest.fixture
+def mock_server_url():
+    """Serve the mock app on a free local port for the duration of a test."""
+    import socket
+    import threading
+    import time
+    import uvicorn
+
+    app = create_app(MockServerConfig(latency_ms=0, tokens_per_second=0, output_tokens=8))
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    yield f"http://127.0.0.1:{port}", app
+
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.mark.skipif(create_app is None, reason="Mock LLM server dependencies could not be imported")
+@pytest.mark.asyncio
+async def test_llm_service_runs_real_provider_paths_against_mock_server(mock_server_url):
+    """
+    Tests that LLMService configured for the mock server bypasses the TEST_MODE stub
+    and completes both buffered and streamed requests through the SDK clients.
+    """
+    url, app = mock_server_url
+    with patch.dict(os.environ, {"LLM_MOCK_SERVER_URL": url, "TEST_MODE": "true", "LLM_CACHE_ENABLED": "false"}):
+        service = LLMService()
+        assert set(service.providers) == {"openai", "anthropic"}
+
+        buffered = await service.generate_response("Plan a todo app", "TestAgent", preferred_provider="anthropic")
+        deltas = [d async for d in service.generate_stream("Plan a todo app", "TestAgent", preferred_provider="openai")]
+
+    assert not buffered.startswith("Mocked LLM Result")
+    assert len(buffered.split()) == 8
+    assert len(deltas) == 8
+    assert app.state.server.stats["streamed"] == 1
+
+
+@pytest.mark.skipif(create_app is None, reason="Mock LLM server dependencies could not be imported")
+@pytest.mark.asyncio
+async def test_repeated_system_prompt_is_reported_as_cached_tokens(mock_server_url):
+    """
+    Tests that the system prompt is sent separately (with a cache breakpoint for
+    Anthropic) and that cache reads on repeat requests are counted per provider.
+    """
+    url, app = mock_server_url
+    system_prompt = "ROLE: Analyst\n\nINSTRUCTIONS:\n" + "Write precise requirements. " * 40
+    with patch.dict(os.environ, {"LLM_MOCK_SERVER_URL": url, "TEST_MODE": "true", "LLM_CACHE_ENABLED": "false"}):
+        service = LLMService()
+        for task in ("Plan a todo app", "Plan a blog"):
+            for provider in ("anthropic", "openai"):
+                await service.generate_messages(
+                    [{"role": "user", "content": task}], "Analyst",
+                    system_prompt=system_prompt, preferred_provider=provider, use_cache=False
+                )
+
+    stats = service.get_prompt_cache_stats()
+    assert stats["by_provider"]["anthropic"]["cache_write_tokens"] > 0
+    assert stats["by_provider"]["anthropic"]["cache_hits"] == 1
+    assert stats["by_provider"]["openai"]["cache_hits"] == 1
+    assert stats["cached_tokens"] == app.state.server.stats["cached_tokens"]
+
+
+@pytest.mark.skipif(create_app is None, reason="Mock LLM server dependencies could not be imported")
+@pytest.mark.asyncio
+async def test_health_probes_spend_no_tokens_and_are_cached(mock_server_url):
+    """
+    Tests that the default health check uses metadata probes without generating,
+    caches the result, and that passive health reflects real traffic.
+    """
+    url, app = mock_server_url
+    with patch.dict(os.environ, {"LLM_MOCK_SERVER_URL": url, "TEST_MODE": "true", "LLM_CACHE_ENABLED": "false"}):
+        service = LLMService()
+        passive = await service.health_check("passive")
+        probed = await service.health_check()
+        cached = await service.health_check()
+
+        assert {result["status"] for result in passive.values()} == {"unknown"}
+        assert {result["status"] for result in probed.values()} == {"healthy"}
+        assert {result["source"] for result in probed.values()} == {"metadata"}
+        assert all(result["cached"] for result in cached.values())
+        assert app.state.server.stats["requests"] == 0
+
+        # An SDK without a models endpoint falls back to traffic-based health
+        client = service._get_client("anthropic")
+        service.providers["anthropic"]["client"] = MagicMock(spec=[])
+        no_listing = await service.health_checker.probe("anthropic")
+        service.providers["anthropic"]["client"] = client
+        assert no_listing["source"] == "traffic"
+        assert no_listing["status"] == "unknown"
+        assert "no models endpoint" in no_listing["probe_error"]
+
+        await service.generate_response("Plan a todo app", "TestAgent", preferred_provider="openai")
+        assert service.health_checker.passive("openai")["status"] == "healthy"
+
+        full = await service.health_check("full", force=True)
+        assert {result["status"] for result in full.values()} == {"healthy"}
+        assert app.state.server.stats["requests"] == 1 + len(service.providers)
+
+        with pytest.raises(ValueError):
+            await service.health_check("deep")
+
+
+@pytest.mark.skipif(create_app is None, reason="Mock LLM server dependencies could not be imported")
+@pytest.mark.asyncio
+async def test_truncated_response_is_retried_with_larger_budget(mock_server_url):
+    """
+    Tests that an agent with short output history gets a small max_tokens, and
+    that a response cut off at that budget is retried with a larger one.
+    """
+    url, app = mock_server_url
+    with patch.dict(os.environ, {"LLM_MOCK_SERVER_URL": url, "TEST_MODE": "true", "LLM_CACHE_ENABLED": "false"}):
+        service = LLMService()
+        service.output_budget = OutputBudgetPolicy(headroom=0.0, min_samples=3, floor_tokens=1)
+        for _ in range(3):
+            service.output_budget.record("Analyst", 4)
+
+        result = await service.generate_response("Plan a todo app", "Analyst", preferred_provider="openai")
+
+    assert len(result.split()) == 8
+    assert app.state.server.stats["requests"] == 2
+    assert service.output_budget.metrics["retries"] == 1
+    assert service.output_budget.observed_percentile("Analyst") == 8
+
+
+@pytest.mark.skipif(create_app is None, reason="Mock LLM server dependencies could not be imported")
+@pytest.mark.asyncio
+async def test_truncated_stream_is_continued_with_larger_budget(mock_server_url):
+    """
+    Tests that streams get the adaptive max_tokens too, that a stream cut off at
+    that budget is continued rather than restarted, and that the full output
+    length is recorded from the provider's usage.
+    """
+    url, app = mock_server_url
+    with patch.dict(os.environ, {"LLM_MOCK_SERVER_URL": url, "TEST_MODE": "true", "LLM_CACHE_ENABLED": "false"}):
+        service = LLMService()
+        service.output_budget = OutputBudgetPolicy(headroom=0.0, min_samples=3, floor_tokens=1)
+        for _ in range(3):
+            service.output_budget.record("Analyst", 4)
+
+        deltas = [delta async for delta in service.generate_stream("Plan a todo app", "Analyst", preferred_provider="openai")]
+
+    assert len("".join(deltas).split()) == 12
+    assert app.state.server.stats["streamed"] == 2
+    assert service.output_budget.metrics["retries"] == 1
+    assert service.output_budget.observed_percentile("Analyst") == 12
+
+
+@pytest.mark.skipif(create_app is None, reason="Mock LLM server dependencies could not be imported")
+@pytest.mark.asyncio
+async def test_quota_headers_and_429s_feed_the_limiters(mock_server_url):
+    """
+    Tests that quota headers on buffered and streamed responses set the rate
+    limiter's per-minute limit, and that a 429 pauses the provider for retry-after and halves its
+    concurrency limit.
+    """
+    from backend.rate_limiter import rate_limiter
+
+    url, app = mock_server_url
+    app.state.server.config.quota_requests_per_minute = 750
+    app.state.server.config.retry_after_seconds = 5
+    original = dict(rate_limiter.configs)
+    try:
+        with patch.dict(os.environ, {"LLM_MOCK_SERVER_URL": url, "TEST_MODE": "true", "LLM_CACHE_ENABLED": "false"}):
+            service = LLMService()
+            await service.generate_response("Plan a todo app", "TestAgent", preferred_provider="openai")
+            assert rate_limiter.configs["openai"].requests_per_minute == 750
+            assert rate_limiter.get_status("openai")["provider_quota"]["requests_remaining"] == 749
+            [delta async for delta in service.generate_stream("Plan a chat app", "TestAgent", preferred_provider="openai")]
+            assert rate_limiter.get_status("openai")["provider_quota"]["requests_remaining"] == 748
+
+            app.state.server.config.error_429_rate = 1.0
+            with pytest.raises(Exception):
+                await service.generate_response("Plan a blog", "TestAgent", preferred_provider="openai")
+
+        assert 3 < rate_limiter.get_status("openai")["paused_for"] <= 5
+        concurrency = service.get_performance_metrics()["concurrency"]["openai"]
+        assert concurrency["decreases"] == 1
+        assert concurrency["limit"] == 2
+        assert concurrency["in_flight"] == 0
+    finally:
+        for provider, config in original.items():
+            rate_limiter.add_provider_config(provider, config)
+        rate_limiter._paused_until.clear()
@@ -0,0 +1,350 @@
+"""
+Tests for the sliding-window counters behind RateLimiter.
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+try:
+    from backend.rate_limiter import RateLimiter, RateLimitConfig, SlidingWindowCounter
+except ImportError as e:
+    print(f"Could not import rate_limiter due to environment issue: {e}")
+    SlidingWindowCounter = None
+
+try:
+    from backend.rate_limit_store import FileLockRateLimitStore, MemoryRateLimitStore, RedisRateLimitStore
+except ImportError as e:
+    print(f"Could not import rate_limit_store due to environment issue: {e}")
+    FileLockRateLimitStore = None
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+PROJECT_ROOT = str(Path(__file__).parent.parent.parent)
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+def test_window_totals_expire_by_minute_and_hour():
+    """
+    Tests that requests and tokens leave the minute totals after 60 seconds and
+    the hour totals after 3600 seconds, including after long idle gaps.
+    """
+    window = SlidingWindowCounter()
+    start = 1_000_000.0
+    window.add(start, 100)
+    window.add(start + 30.5, 50)
+
+    assert window.totals(start + 31) == (2, 2, 150, 150)
+    assert window.totals(start + 60) == (1, 2, 50, 150)
+    assert window.totals(start + 91) == (0, 2, 0, 150)
+    assert window.totals(start + 3600) == (0, 1, 0, 50)
+    assert window.totals(start + 3631) == (0, 0, 0, 0)
+
+    window.add(start + 10 * 3600, 10)
+    assert window.totals(start + 10 * 3600) == (1, 1, 10, 10)
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+def test_adjust_tokens_updates_the_request_bucket():
+    """
+    Tests that reconciling a request's actual usage corrects both totals while it
+    is in the minute window, only the hour total afterwards, and nothing once expired.
+    """
+    window = SlidingWindowCounter()
+    start = 2_000_000.0
+    window.add(start, 1000)
+
+    window.adjust_tokens(start, -958, start + 1)
+    assert window.totals(start + 1) == (1, 1, 42, 42)
+
+    window.adjust_tokens(start, 8, start + 120)
+    assert window.totals(start + 120) == (0, 1, 0, 50)
+
+    window.adjust_tokens(start, 100, start + 4000)
+    assert window.totals(start + 4000) == (0, 0, 0, 0)
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+@pytest.mark.asyncio
+async def test_acquire_enforces_per_minute_limits_from_window():
+    """
+    Tests that acquire denies requests over the per-minute request and token
+    limits and admits them again once the minute has passed.
+    """
+    limiter = RateLimiter()
+    limiter.add_provider_config("window_test", RateLimitConfig(
+        requests_per_minute=3, requests_per_hour=100, tokens_per_minute=2500, tokens_per_hour=10000, burst_limit=100
+    ))
+    now = time.time()
+
+    with patch("backend.rate_limiter.time.time", return_value=now):
+        assert await limiter.acquire("window_test", 1000)
+        assert await limiter.acquire("window_test", 1000)
+        assert not await limiter.acquire("window_test", 1000)
+        assert await limiter.acquire("window_test", 100)
+        assert not await limiter.acquire("window_test", 1)
+        assert limiter.get_status("window_test")["requests_per_minute"] == "3/3"
+
+    with patch("backend.rate_limiter.time.time", return_value=now + 61):
+        assert await limiter.acquire("window_test", 1000)
+        assert limiter.get_status("window_test")["tokens_per_hour"] == "3100/10000"
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_in_order_when_capacity_frees():
+    """
+    Tests that queued callers are admitted FIFO as soon as the burst bucket
+    refills, instead of after a 1s+ backoff, and that wait stats are reported.
+    """
+    limiter = RateLimiter()
+    # One burst slot refilled every 50ms
+    limiter.add_provider_config("wait_test", RateLimitConfig(
+        requests_per_minute=1200, requests_per_hour=10000, tokens_per_minute=10 ** 6, tokens_per_hour=10 ** 7, burst_limit=1
+    ))
+    order = []
+
+    async def call(label):
+        assert await limiter.wait_if_needed("wait_test", 10, max_wait=5)
+        order.append(label)
+
+    start = time.monotonic()
+    await asyncio.gather(*(call(i) for i in range(4)))
+    elapsed = time.monotonic() - start
+
+    assert order == [0, 1, 2, 3]
+    assert 0.14 <= elapsed < 0.5
+    waiters = limiter.get_status("wait_test")["waiters"]
+    assert waiters["immediate"] == 1
+    assert waiters["admitted"] == 3
+    assert waiters["waiting"] == 0
+    assert waiters["max_waiters"] == 3
+    assert 0 < waiters["max_wait_time"] < 0.5
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+@pytest.mark.asyncio
+async def test_max_wait_is_a_deadline_and_oversized_requests_fail_fast():
+    """
+    Tests that a waiter gives up at max_wait rather than after the next backoff
+    step, and that a request larger than the token limit is rejected at once.
+    """
+    limiter = RateLimiter()
+    limiter.add_provider_config("deadline_test", RateLimitConfig(
+        requests_per_minute=1, requests_per_hour=100, tokens_per_minute=1000, tokens_per_hour=10000, burst_limit=5
+    ))
+    assert await limiter.wait_if_needed("deadline_test", 10)
+
+    start = time.monotonic()
+    assert not await limiter.wait_if_needed("deadline_test", 10, max_wait=0.1)
+    assert time.monotonic() - start < 0.5
+
+    start = time.monotonic()
+    assert not await limiter.wait_if_needed("deadline_test", 5000, max_wait=10)
+    assert time.monotonic() - start < 0.1
+    assert limiter.get_wait_stats("deadline_test")["timed_out"] == 2
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+@pytest.mark.asyncio
+async def test_waiters_admitted_together_reconcile_their_own_records():
+    """
+    Tests that when one wakeup admits several waiters, each gets the record of
+    its own reservation, so reconciling usage corrects the right request.
+    """
+    limiter = RateLimiter()
+    limiter.add_provider_config("record_test", RateLimitConfig(
+        requests_per_minute=100, requests_per_hour=1000, tokens_per_minute=10 ** 6, tokens_per_hour=10 ** 7, burst_limit=100
+    ))
+    limiter.pause("record_test", 0.05)
+
+    async def call(tokens):
+        record = await limiter.reserve("record_test", tokens, max_wait=5)
+        await asyncio.sleep(0)
+        limiter.update_actual_usage("record_test", tokens // 10, record)
+        return record
+
+    records = await asyncio.gather(*(call(tokens) for tokens in (1000, 2000, 3000)))
+
+    assert [record.tokens for record in records] == [100, 200, 300]
+    assert limiter.get_status("record_test")["tokens_per_minute"] == f"600/{10 ** 6}"
+    assert limiter.get_wait_stats("record_test")["admitted"] == 3
+
+
+@pytest.mark.skipif(FileLockRateLimitStore is None, reason="rate_limit_store could not be imported")
+@pytest.mark.asyncio
+async def test_file_store_shares_windows_between_limiters(tmp_path):
+    """
+    Tests that two limiters (as in two workers) on the same file store draw on
+    one quota, and that usage reconciled by one is seen by the other.
+    """
+    config = RateLimitConfig(
+        requests_per_minute=3, requests_per_hour=100, tokens_per_minute=10000, tokens_per_hour=100000, burst_limit=100
+    )
+    first = RateLimiter(FileLockRateLimitStore(str(tmp_path)))
+    second = RateLimiter(FileLockRateLimitStore(str(tmp_path)))
+    first.add_provider_config("shared", config)
+    second.add_provider_config("shared", config)
+
+    assert await first.acquire("shared", 1000)
+    assert await second.acquire("shared", 1000)
+    first.update_actual_usage("shared", 400)
+    assert await first.acquire("shared", 1000)
+    assert not await second.acquire("shared", 1000)
+    assert second.get_status("shared")["tokens_per_minute"] == "2400/10000"
+
+    first.store.close()
+    second.store.close()
+
+
+_ADMIT_SCRIPT = """
+import sys, time
+from backend.rate_limit_store import FileLockRateLimitStore
+store = FileLockRateLimitStore(sys.argv[1])
+admitted = sum(store.admit("shared", time.time(), 10, (25, 1000, 10 ** 6, 10 ** 7))[0] == 0.0 for _ in range(20))
+print(admitted)
+"""
+
+
+@pytest.mark.skipif(FileLockRateLimitStore is None, reason="rate_limit_store could not be imported")
+def test_file_store_admission_is_atomic_across_processes(tmp_path):
+    """
+    Tests that concurrent worker processes admitting against one file store
+    never admit more requests than the per-minute limit between them.
+    """
+    workers = [
+        subprocess.Popen([sys.executable, "-c", _ADMIT_SCRIPT, str(tmp_path)],
+                         cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True)
+        for _ in range(4)
+    ]
+    admitted = [int(worker.communicate(timeout=30)[0]) for worker in workers]
+
+    assert sum(admitted) == 25
+    store = FileLockRateLimitStore(str(tmp_path))
+    assert store.totals("shared", time.time())[0] == 25
+    store.close()
+
+
+@pytest.mark.skipif(FileLockRateLimitStore is None or fakeredis is None, reason="fakeredis is not installed")
+@pytest.mark.asyncio
+async def test_redis_store_admits_and_reports_release_delay():
+    """
+    Tests the Redis script: requests are admitted up to the minute limit, the
+    next one gets the delay until the oldest leaves the window, token
+    corrections show up in the running totals, and seconds expire from the
+    minute and hour totals.
+    """
+    store = RedisRateLimitStore(fakeredis.FakeAsyncRedis())
+    limits = (2, 100, 10000, 100000)
+    now = float(int(time.time()))
+
+    assert (await store.admit_async("redis_test", now, 100, limits))[0] == 0.0
+    assert (await store.admit_async("redis_test", now + 10, 100, limits))[0] == 0.0
+    delay, totals = await store.admit_async("redis_test", now + 20, 100, limits)
+    assert delay == pytest.approx(40.0)
+    assert totals == (2, 2, 200, 200)
+    assert (await store.admit_async("redis_test", now, 20000, limits))[0] == float("inf")
+
+    await store.adjust_tokens_async("redis_test", now, 50, now + 20)
+    assert await store.totals_async("redis_test", now + 20) == (2, 2, 250, 250)
+    assert store.totals("redis_test", now + 20) == (2, 2, 250, 250)
+    assert await store.totals_async("redis_test", now + 65) == (1, 2, 100, 250)
+    assert await store.totals_async("redis_test", now + 3605) == (0, 1, 0, 100)
+    assert await store.totals_async("redis_test", now + 3611) == (0, 0, 0, 0)
+    assert await store.client.hlen("botarmy:ratelimit:{redis_test}:requests") == 0
+
+
+class _UnreachableScript:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        raise ConnectionError("Connection refused")
+
+
+@pytest.mark.skipif(FileLockRateLimitStore is None, reason="rate_limit_store could not be imported")
+@pytest.mark.asyncio
+async def test_redis_store_falls_back_to_local_windows_when_unreachable():
+    """
+    Tests that a Redis outage at runtime neither escapes admission nor strands
+    waiters: the store switches to per-process windows and backs off from Redis.
+    """
+    script = _UnreachableScript()
+    client = MagicMock()
+    client.register_script.return_value = script
+    limiter = RateLimiter(RedisRateLimitStore(client))
+    # One burst slot refilled every 50ms, so the second caller queues
+    limiter.add_provider_config("redis_down", RateLimitConfig(
+        requests_per_minute=1200, requests_per_hour=10000, tokens_per_minute=10 ** 6, tokens_per_hour=10 ** 7, burst_limit=1
+    ))
+
+    assert await limiter.acquire("redis_down", 10)
+    assert await asyncio.wait_for(limiter.wait_if_needed("redis_down", 10, max_wait=5), timeout=1)
+    assert limiter.get_status("redis_down")["requests_per_minute"] == "2/1200"
+    assert script.calls == 1
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+@pytest.mark.asyncio
+async def test_waiters_fail_fast_when_the_store_errors():
+    """
+    Tests that an error from the store while admitting queued waiters is raised
+    to them instead of leaving them waiting until their deadline.
+    """
+    store = MemoryRateLimitStore()
+    limiter = RateLimiter(store)
+    limiter.add_provider_config("store_error", RateLimitConfig(
+        requests_per_minute=1200, requests_per_hour=10000, tokens_per_minute=10 ** 6, tokens_per_hour=10 ** 7, burst_limit=1
+    ))
+    assert await limiter.acquire("store_error", 10)
+
+    with patch.object(store, "admit_async", side_effect=RuntimeError("store offline")):
+        with pytest.raises(RuntimeError, match="store offline"):
+            await asyncio.wait_for(limiter.wait_if_needed("store_error", 10, max_wait=5), timeout=1)
+
+
+@pytest.mark.skipif(SlidingWindowCounter is None, reason="rate_limiter could not be imported")
+@pytest.mark.asyncio
+async def test_provider_quota_headers_set_limits_and_pause():
+    """
+    Tests that per-minute limits from quota headers replace the configured ones,
+    and that retry-after or an exhausted quota pauses admission until reset.
+    """
+    limiter = RateLimiter()
+    limiter.add_provider_config("quota_test", RateLimitConfig(
+        requests_per_minute=10, requests_per_hour=1000, tokens_per_minute=1000, tokens_per_hour=100000, burst_limit=5
+    ))
+    limiter.sync_quota("quota_test", {
+        "x-ratelimit-limit-requests": "600",
+        "x-ratelimit-limit-tokens": "150000",
+        "x-ratelimit-remaining-requests": "599",
+        "x-ratelimit-reset-requests": "100ms"
+    })
+    assert limiter.configs["quota_test"].requests_per_minute == 600
+    assert limiter.configs["quota_test"].tokens_per_minute == 150000
+    assert limiter.token_buckets["quota_test"].refill_rate == 10.0
+    assert await limiter.acquire("quota_test", 5000)
+
+    limiter.sync_quota("quota_test", {"Retry-After": "0.2"})
+    assert not await limiter.acquire("quota_test", 10)
+    start = time.monotonic()
+    assert await limiter.wait_if_needed("quota_test", 10, max_wait=5)
+    assert 0.1 < time.monotonic() - start < 0.5
+
+    limiter.sync_quota("quota_test", {
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "1m30s"
+    })
+    assert 85 < limiter.get_status("quota_test")["paused_for"] <= 90
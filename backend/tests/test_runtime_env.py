@@ -0,0 +1,62 @@
+"""
+Tests for the lazy import helpers in runtime_env.
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add project root to path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+try:
+    from backend import runtime_env
+    from backend.runtime_env import LazyModule, lazy_flow, module_available
+except ImportError as e:
+    print(f"Could not import runtime_env due to environment issue: {e}")
+    runtime_env = None
+
+
+@pytest.mark.skipif(runtime_env is None, reason="runtime_env could not be imported")
+def test_lazy_module_imports_on_first_attribute_access():
+    """
+    Tests that a LazyModule does not import until an attribute is used.
+    """
+    module = LazyModule("json")
+    assert not module.is_loaded
+
+    assert module.dumps({"a": 1}) == '{"a": 1}'
+    assert module.is_loaded
+    assert module_available("json")
+    assert not module_available("definitely_not_a_real_module_xyz")
+
+
+@pytest.mark.skipif(runtime_env is None, reason="runtime_env could not be imported")
+@pytest.mark.asyncio
+async def test_lazy_flow_resolves_prefect_on_first_run_only():
+    """
+    Tests that decorating with lazy_flow does not touch Prefect, and that the
+    real decorator is applied once, on the first call.
+    """
+    applied = []
+
+    def fake_flow(**kwargs):
+        def decorator(func):
+            applied.append(kwargs)
+            return func
+        return decorator
+
+    fake_prefect = MagicMock(flow=fake_flow)
+    with patch.object(runtime_env, "get_prefect", return_value=fake_prefect) as get_prefect:
+        @lazy_flow(name="Test Flow")
+        async def my_flow(x):
+            return x * 2
+
+        assert get_prefect.call_count == 0
+        assert await my_flow(2) == 4
+        assert await my_flow(3) == 6
+
+    assert applied == [{"name": "Test Flow"}]
+    assert my_flow.__name__ == "my_flow"
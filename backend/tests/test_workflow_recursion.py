@@ -12,17 +12,24 @@ import sys
 import traceback
 from unittest.mock import Mock, AsyncMock
 
-# Set up logging to capture recursion details
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('recursion_test.log')
-    ]
-)
+import pytest
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 logger = logging.getLogger(__name__)
 
+
+@pytest.fixture(autouse=True)
+def recursion_log(tmp_path):
+    """Capture recursion details in a log file under the test's tmp_path"""
+    log_path = tmp_path / "recursion_test.log"
+    handler = logging.FileHandler(log_path)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield log_path
+    logger.removeHandler(handler)
+    handler.close()
+
 def track_recursion():
     """Track recursion depth to detect infinite loops"""
     frame = sys._getframe()
@@ -208,4 +215,12 @@ async def main():
     logger.info("=" * 60)
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('recursion_test.log')
+        ]
+    )
     asyncio.run(main())
\ No newline at end of file
@@ -2,15 +2,16 @@ import logging
 from typing import Dict, Any
 import asyncio
 
-from backend.runtime_env import get_prefect
+from backend.runtime_env import lazy_flow
 from backend.services.process_config_loader import get_process_config_loader
-from backend.agents.generic_agent_executor import GenericAgentExecutor
+from backend.services.context_assembler import get_context_assembler
+from backend.services.llm_service import get_llm_service
+from backend.agents.generic_agent_executor import GenericAgentExecutor, InputSanitizer
 from backend.agent_status_broadcaster import AgentStatusBroadcaster
 
-prefect = get_prefect()
 logger = logging.getLogger(__name__)
 
-@prefect.flow(name="Generic BotArmy Workflow", persist_result=False, validate_parameters=False)
+@lazy_flow(name="Generic BotArmy Workflow", persist_result=False, validate_parameters=False)
 async def generic_workflow(
     config_name: str,
     initial_input: str,
@@ -50,6 +51,11 @@ async def generic_workflow(
     artifacts = {"Project Brief": initial_input}
     results = {}
 
+    context_assembler = get_context_assembler()
+    context_budget = context_assembler.budget_for_models(
+        get_llm_service().get_model_limits(), InputSanitizer.MAX_CONTEXT_LENGTH
+    )
+
     # 2. Iterate through the defined stages in order
     # The order of stages is fixed for now, as in the original workflow.
     stage_order = ["Analyze", "Design", "Build", "Validate", "Launch"]
@@ -79,11 +85,14 @@ async def generic_workflow(
             # 3. Instantiate the Generic Agent Executor
             agent_executor = GenericAgentExecutor(role_details, status_broadcaster)
 
-            # 4. Prepare the context for the agent
-            # This is a simplified context preparation. A real implementation would
-            # load the content of all input_artifacts.
+            # 4. Prepare the context for the agent, fitting the input artifacts
+            # (highest priority first) into the model's context budget
             input_artifacts = task_config.get('input_artifacts', [])
-            context = "\n".join([artifacts.get(art, "") for art in input_artifacts])
+            context = context_assembler.assemble(
+                [(art, artifacts.get(art, "")) for art in input_artifacts],
+                budget=context_budget,
+                max_chars=InputSanitizer.MAX_CONTEXT_LENGTH
+            ).text
 
             if not context:
                  logger.warning(f"Task '{task_name}' has no input context. The initial input will be used if it is the first task.")
@@ -16,6 +16,8 @@ export interface WebSocketMessage {
   agent_name?: string;
   content?: string;
   payload?: any;
+  // Streamed agent output: { partial, stream_id, sequence, done }
+  metadata?: any;
   timestamp: string
 }
 
@@ -62,6 +64,8 @@ class EnhancedWebSocketService {
   private heartbeatTimer: NodeJS.Timeout | null = null
   private latencyTimer: NodeJS.Timeout | null = null
   private pingStartTime: number = 0
+  // Chat message being built from each in-progress agent output stream
+  private agentStreams = new Map<string, { messageId: string; content: string }>()
   
   // Connection metrics
   private metrics: ConnectionMetrics = {
@@ -324,7 +328,11 @@ class EnhancedWebSocketService {
         break;
 
       case 'agent_response':
-        log();
+        if (message.metadata?.stream_id) {
+          this.handleStreamFragment(message);
+        } else {
+          log();
+        }
         break;
 
       case 'workflow_status':
@@ -403,6 +411,30 @@ class EnhancedWebSocketService {
     }
   }
 
+  private handleStreamFragment(message: WebSocketMessage) {
+    // Fragments sharing a stream_id arrive in sequence order; grow one chat
+    // message from them and log the full response once the stream is done.
+    const { stream_id, done } = message.metadata;
+    const agent = message.agent_name || "System";
+    const conversation = useConversationStore.getState();
+    let stream = this.agentStreams.get(stream_id);
+
+    if (!stream) {
+      if (!message.content && done) return;
+      conversation.addMessage({ type: 'agent', agent, content: message.content || "" });
+      stream = { messageId: conversation.getLastMessage()?.id || "", content: message.content || "" };
+      this.agentStreams.set(stream_id, stream);
+    } else if (message.content) {
+      stream.content += message.content;
+      useConversationStore.getState().updateMessage(stream.messageId, { content: stream.content });
+    }
+
+    if (done) {
+      this.agentStreams.delete(stream_id);
+      useLogStore.getState().addLog({ agent, level: 'info', message: stream.content });
+    }
+  }
+
   private startHeartbeat() {
     if (this.heartbeatTimer) {
       clearInterval(this.heartbeatTimer)